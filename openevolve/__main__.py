@@ -1,3 +1,5 @@
+import asyncio
+import collections
 import json
 import logging
 import os
@@ -12,6 +14,8 @@ from openai import OpenAI
 from dotenv import load_dotenv
 from typing import List
 from openevolve.test_case import TestCase
+from openevolve.evaluation_cache import EvaluationCache, project_fingerprint
+from openevolve.prescreen import Prescreener
 
 import tempfile
 
@@ -63,13 +67,65 @@ def main(ctx):
 @click.option(
     "--load_backup",
     default=None,
-    type=click.File("rb"),
-    help="Use existing program database",
+    type=click.Path(exists=True),
+    help="Use existing program database: a checkpoint directory, or a saved database file",
 )
 @click.option(
     "--iterations", default=-1, type=click.INT, help="Max iterations per sampler"
 )
 @click.option("--samplers", default=15, type=click.INT, help="Samplers")
+@click.option(
+    "--containers",
+    default=1,
+    type=click.INT,
+    help="Number of sandbox containers (or worker processes) evaluating in parallel",
+)
+@click.option(
+    "--sandbox",
+    "sandbox_backend",
+    default="container",
+    type=click.Choice(["container", "process"]),
+    help="Run evaluations in containers, or in local processes without a container engine",
+)
+@click.option(
+    "--memory_limit",
+    default=None,
+    type=click.INT,
+    help="Maximum memory in bytes of each container, and address space of each run; runs past it are reported as out of memory",
+)
+@click.option(
+    "--cpus",
+    default=None,
+    type=click.FLOAT,
+    help="Maximum number of CPUs each container can use (container sandbox only)",
+)
+@click.option(
+    "--pids_limit",
+    default=None,
+    type=click.INT,
+    help="Maximum number of processes in each container (container sandbox only)",
+)
+@click.option(
+    "--evaluation_cache/--no_evaluation_cache",
+    default=True,
+    help=(
+        "Reuse the scores of programs already evaluated on the same tests, across runs sharing "
+        "the output path. Scores are recomputed when the tests, the setup script or any Python "
+        "file of the project (including the eval file) change, but not when other files, such "
+        "as data read by the eval file, do: use --no_evaluation_cache or another output path then"
+    ),
+)
+@click.option(
+    "--cascade/--no_cascade",
+    default=False,
+    help="Run the tests one after the other, in order, and abandon programs as soon as they fall behind their island",
+)
+@click.option(
+    "--cascade_margin",
+    default=0.0,
+    type=click.FLOAT,
+    help="How far below the best program of its island a program may score on a test, as a fraction of that score",
+)
 def run(
     project_root,
     setup_file,
@@ -81,6 +137,14 @@ def run(
     load_backup,
     iterations,
     samplers,
+    containers,
+    sandbox_backend,
+    memory_limit,
+    cpus,
+    pids_limit,
+    evaluation_cache,
+    cascade,
+    cascade_margin,
 ):
     timestamp = str(int(time.time()))
     log_path: HostAbsPath = pathlib.Path(output_path) / timestamp
@@ -117,28 +181,71 @@ def run(
     template = code_manipulation.structured_output_to_prog_meta(
         initial_program, program_meta
     )
+    # Hashed before the decorators are added to the project
+    project_digest = project_fingerprint(project_root, [setup_file])
     ex.add_decorators(program_meta)
+
+    evaluator.ImplementationsManager.set_workspace_root(project_root)
+    evaluator.ImplementationsManager.set_implementations_root(pathlib.Path(imps_path))
+    evaluator.ImplementationsManager.set_program_meta(program_meta)
+
     try:
-        conf = config.Config(num_evaluators=1)
+        # Every container (or worker process) evaluates a sample at a time
+        conf = config.Config(num_evaluators=1, evaluation_workers=containers)
         database = programs_database.ProgramsDatabase(
             conf.programs_database, template, identifier=timestamp
         )
         if load_backup:
             database.load(load_backup)
 
-        sbox = sandbox.ContainerSandbox(
-            project_root, imps_path, eval_file, setup_file=setup_file
+        if sandbox_backend == "process":
+            if cpus is not None or pids_limit is not None:
+                logging.warning("The process sandbox only enforces --memory_limit.")
+
+            sbox = sandbox.ProcessSandbox(
+                project_root,
+                pathlib.Path(imps_path),
+                eval_file,
+                num_workers=containers,
+                memory_limit=memory_limit,
+            )
+        else:
+            sbox = sandbox.ContainerSandbox(
+                project_root,
+                imps_path,
+                eval_file,
+                setup_relpath=setup_file,
+                num_containers=containers,
+                resource_limits=sandbox.ResourceLimits(
+                    memory=memory_limit, cpus=cpus, pids=pids_limit
+                ),
+            )
+        cache = (
+            EvaluationCache(
+                pathlib.Path(output_path) / "evaluation_cache.jsonl",
+                context=project_digest,
+            )
+            if evaluation_cache
+            else None
         )
         evaluators = [
             evaluator.AsyncEvaluator(
                 database,
                 sbox,
                 tests,
+                max_concurrency=containers,
+                cache=cache,
+                cascade=cascade,
+                cascade_margin=cascade_margin,
             )
             for _ in range(conf.num_evaluators)
         ]
         # We send the initial implementation to be analysed by one of the evaluators.
-        evaluators[0].analyse(initial_program, island_id=None, implementation_id="-1")
+        asyncio.run(
+            evaluators[0].analyse(
+                initial_program, island_id=None, implementation_id="-1"
+            )
+        )
         assert len(database._islands[0]._clusters) > 0, (
             "Initial analysis failed. Make sure that Sandbox works! "
             "See e.g. the error files under sandbox data."
@@ -151,11 +258,31 @@ def run(
             log_path=log_path,
         )
 
+        prescreener = Prescreener(project_root, program_meta)
+
+        evaluation_queue = evaluator.EvaluationQueue(
+            evaluators,
+            maxsize=conf.evaluation_queue_size,
+            num_workers=conf.evaluation_workers,
+            prescreener=prescreener,
+        )
+
         samplers = [
-            sampler.Sampler(database, evaluators, lm, uid=i) for i in range(samplers)
+            sampler.Sampler(
+                database, evaluators, lm, uid=i, evaluation_queue=evaluation_queue
+            )
+            for i in range(samplers)
         ]
 
-        core.run(samplers, database, iterations)
+        core.run(samplers, database, iterations, evaluation_queue=evaluation_queue)
+        logging.info(
+            f"Prescreening: {prescreener.accepted} accepted, rejected {dict(prescreener.counts)}"
+        )
+        if cascade:
+            cascade_exits = collections.Counter()
+            for async_evaluator in evaluators:
+                cascade_exits.update(async_evaluator.cascade_exits)
+            logging.info(f"Cascade: programs abandoned after each batch {dict(cascade_exits)}")
     finally:
         ex.remove_decorators(program_meta)
 
@@ -0,0 +1,250 @@
+"""
+Incremental checkpoints of the programs database: an append-only event log plus periodic snapshots.
+
+Every change to an island is appended to the current segment of the log as
+a pickled event, tagged with the island it changed and the version of the
+island after the change. Once in a while, the log is rotated to a new
+segment and a snapshot of the database is written to a directory named
+after that segment, after which the older segments and snapshots are
+deleted. Restoring loads the snapshot, and replays the events of the
+remaining segments that are newer than the snapshot of their island.
+
+Events and snapshots are written by a background thread, so the threads
+changing the database only pay for putting an event on a queue. An event or
+snapshot that fails to be written is logged and skipped, and the thread
+carries on with the next one.
+"""
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any
+
+import threading
+import logging
+import shutil
+import pickle
+import queue
+import os
+
+SNAPSHOT_PREFIX = "snapshot_"
+SEGMENT_PREFIX = "events_"
+SEGMENT_SUFFIX = ".log"
+
+# An event is (island ID, island version, kind, *payload)
+Event = tuple[Any, ...]
+
+def _segment_path(directory: Path, segment: int) -> Path:
+    return directory / f"{SEGMENT_PREFIX}{segment:06d}{SEGMENT_SUFFIX}"
+
+def _snapshot_path(directory: Path, segment: int) -> Path:
+    return directory / f"{SNAPSHOT_PREFIX}{segment:06d}"
+
+def _segments(directory: Path) -> list[int]:
+    """Returns the numbers of the segments of the log, in order."""
+    return sorted(
+        int(path.name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+        for path in directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}")
+    )
+
+def _snapshots(directory: Path) -> list[int]:
+    """Returns the segments the complete snapshots were started at, in order."""
+    return sorted(
+        int(path.name[len(SNAPSHOT_PREFIX):])
+        for path in directory.glob(f"{SNAPSHOT_PREFIX}*")
+        if path.name[len(SNAPSHOT_PREFIX):].isdigit()
+    )
+
+def read_checkpoint(directory: Path) -> tuple[Path | None, Iterator[Event]]:
+    """
+    Reads a checkpoint.
+
+    Args:
+        directory (Path): The checkpoint directory.
+
+    Returns:
+        tuple[Path | None, Iterator[Event]]: The directory of the last snapshot, if any,
+            and the events logged since the snapshot was started, in order.
+    """
+    snapshots = _snapshots(directory)
+    first_segment = snapshots[-1] if snapshots else 0
+    snapshot = _snapshot_path(directory, first_segment) if snapshots else None
+
+    def events() -> Iterator[Event]:
+        for segment in _segments(directory):
+            if segment < first_segment:
+                continue
+
+            with open(_segment_path(directory, segment), "rb") as file:
+                while True:
+                    try:
+                        yield pickle.load(file)
+                    except EOFError:
+                        break
+                    except pickle.UnpicklingError:
+                        # An event cut short when the run was killed
+                        logging.warning(f"Skipping the truncated end of segment {segment} in {directory}.")
+                        break
+
+    return snapshot, events()
+
+class Checkpointer:
+    """Writes the event log and snapshots of a database in a background thread."""
+
+    _SNAPSHOT = object()
+    _SENTINEL = object()
+
+    # Seconds between checks that the thread is still running, while waiting for a snapshot
+    _WAIT_INTERVAL = 1.0
+
+    def __init__(self, directory: Path, snapshot: Callable[[Path], None]):
+        """
+        Initializes the checkpointer. Nothing is written until the first event or snapshot.
+
+        Args:
+            directory (Path): The checkpoint directory.
+            snapshot (Callable[[Path], None]): Writes the state of the database to a directory, with
+                the version of each island, so that events older than the snapshot are skipped.
+        """
+        self.directory = directory
+        self._snapshot = snapshot
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._segment: int | None = None
+        self._file = None
+
+    def append(self, event: Event):
+        """Queues an event to be appended to the log."""
+        self._start()
+        self._queue.put(event)
+
+    def snapshot(self, wait: bool = False):
+        """
+        Queues a snapshot of the database, which also compacts the log.
+
+        Args:
+            wait (bool): Whether to block until the snapshot and the events before it are written.
+
+        Raises:
+            RuntimeError: If waiting, and the snapshot failed or the background thread stopped.
+        """
+        thread = self._start()
+        done = threading.Event()
+        errors: list[Exception] = []
+        self._queue.put((self._SNAPSHOT, done, errors))
+
+        if not wait:
+            return
+
+        while not done.wait(self._WAIT_INTERVAL):
+            if not thread.is_alive():
+                raise RuntimeError(f"Checkpointing to {self.directory} stopped before the snapshot was written.")
+
+        if errors:
+            raise RuntimeError(f"Failed to write a snapshot to {self.directory}.") from errors[0]
+
+    def close(self):
+        """Writes the queued events and stops the background thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+
+        if thread is not None:
+            self._queue.put(self._SENTINEL)
+            thread.join()
+
+    def _start(self) -> threading.Thread:
+        """Starts the background thread, or restarts it if it stopped, and returns it."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._work, name="checkpointer", daemon=True)
+                self._thread.start()
+
+            return self._thread
+
+    def _work(self):
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            segments = _segments(self.directory)
+            self._open_segment(segments[-1] + 1 if segments else 0)
+        except OSError:
+            logging.exception(f"Failed to open the checkpoint in {self.directory}.")
+            return
+
+        try:
+            while True:
+                item = self._queue.get()
+
+                if item is self._SENTINEL:
+                    break
+
+                if isinstance(item, tuple) and item and item[0] is self._SNAPSHOT:
+                    _, done, errors = item
+
+                    try:
+                        self._write_snapshot()
+                    except Exception as e:
+                        logging.exception(f"Failed to write a snapshot to {self.directory}.")
+                        errors.append(e)
+                    finally:
+                        done.set()
+                else:
+                    self._write_event(item)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def _write_event(self, event: Event):
+        try:
+            data = pickle.dumps(event)
+        except Exception:
+            logging.exception(f"Skipping an event that cannot be pickled: {event[:3]}.")
+            return
+
+        position = self._file.tell()
+
+        try:
+            written = self._file.write(data)
+
+            if written != len(data):
+                raise OSError(f"Wrote {written} of the {len(data)} bytes of the event.")
+        except OSError:
+            logging.exception(f"Failed to append an event to {self._file.name}.")
+
+            # Drop the part of the event that made it to the file, so that the events after it can be read
+            try:
+                self._file.truncate(position)
+            except OSError:
+                pass
+
+    def _open_segment(self, segment: int):
+        # The new segment is opened first, so that the current one is kept if it cannot be.
+        # Events are written unbuffered, each with a single write, so that a failed
+        # write can be cut off without losing the events before it.
+        file = open(_segment_path(self.directory, segment), "ab", buffering=0)
+
+        if self._file is not None:
+            self._file.close()
+
+        self._segment = segment
+        self._file = file
+
+    def _write_snapshot(self):
+        # The events queued from now on go to a new segment. The ones before are all
+        # included in the snapshot, which is captured after the rotation.
+        self._open_segment(self._segment + 1)
+
+        snapshot_path = _snapshot_path(self.directory, self._segment)
+        temp_path = snapshot_path.with_suffix(".tmp")
+
+        shutil.rmtree(temp_path, ignore_errors=True)
+        self._snapshot(temp_path)
+        os.rename(temp_path, snapshot_path)
+
+        for segment in _snapshots(self.directory):
+            if segment < self._segment:
+                shutil.rmtree(_snapshot_path(self.directory, segment))
+
+        for segment in _segments(self.directory):
+            if segment < self._segment:
+                _segment_path(self.directory, segment).unlink()
+
+        logging.info(f"Saved a snapshot of the database to {snapshot_path}.")
@@ -1,8 +1,9 @@
 import textwrap
+import builtins
 import ast
 
 from typing import Dict, Iterable, List
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 
 from openevolve.structured_outputs import ProgramImplementation
@@ -34,6 +35,14 @@ class Decorator(Enum):
     STATICMETHOD = "staticmethod"
     PROPERTY = "property"
 
+    @classmethod
+    def of(cls, obj: object) -> "Decorator":
+        """Return the decorator an object was created with, e.g. CLASSMETHOD for a classmethod."""
+        for decorator in (cls.CLASSMETHOD, cls.STATICMETHOD, cls.PROPERTY):
+            if isinstance(obj, getattr(builtins, decorator.value)):
+                return decorator
+        return cls.NONE
+
 @dataclass
 class Function:
     """A parsed Python function."""
@@ -78,13 +87,49 @@ class Function:
 
 @dataclass(frozen=True)
 class Program:
-    """A parsed Python program."""
+    """A parsed Python program.
+
+    Programs are not modified once they are registered in the database, so
+    their renderings in prompts are cached, by version.
+    """
 
     functions: list[Function]
+    _renderings: dict[int, str] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
 
     def __str__(self) -> str:
         return "\n\n".join(str(f) for f in self.functions)
 
+    def to_prompt(self, version: int) -> str:
+        """Return the program as it is shown in prompts, as version *version*.
+        The rendering is computed once per version, and then reused.
+        """
+        rendering = self._renderings.get(version)
+        if rendering is None:
+            rendering = f"# Start of Program  Version {version} (*_v{version})\n"
+            if version >= 1:
+                rendering += f"# This is an improved version of the previous program (*_v{version - 1})\n\n"
+
+            for function in self.functions:
+                func_loc_comment = f"#{function.path}: {function.qualname} ({function.decorator if function.decorator else ''}\n)"
+                rendering += f"{func_loc_comment}\n{function.to_str(version=version)}\n\n"
+
+            rendering += f"# End of Program Version {version}\n\n"
+            self._renderings[version] = rendering
+        return rendering
+
+    def __getstate__(self):
+        # Renderings are cheap to recompute, so they are not persisted
+        state = dict(self.__dict__)
+        state["_renderings"] = {}
+        return state
+
+    def __setstate__(self, state):
+        # Programs pickled before renderings were cached
+        state.setdefault("_renderings", {})
+        self.__dict__.update(state)
+
     def to_str(self, version: int | None = None) -> str:
         """Return the function as a string.
         The function name in the header forall functions is suffixed with
@@ -28,17 +28,34 @@ class ProgramsDatabaseConfig:
     cluster_sampling_temperature_init: Initial temperature for softmax sampling
         of clusters within an island.
     cluster_sampling_temperature_period: Period of linear decay of the cluster
-        sampling temperature.
-    backup_period: Number of iterations before backing up the program database on disk
-    backup_folder: Path for automatic backups
+        sampling temperature, which decays in `TEMPERATURE_STEPS` steps.
+    backup_period: Number of registered programs between snapshots of the
+        program database. Every registration is also appended to an event log,
+        so snapshots only bound the length of the log to replay on load.
+    backup_folder: Path for automatic backups, which holds a checkpoint
+        directory per run.
+    max_programs_per_cluster: Maximum number of programs kept in a cluster, or
+        None for no limit.
+    program_eviction_policy: Which program leaves a full cluster: 'longest',
+        'oldest' or 'reservoir' (a uniform sample of the programs registered).
+    max_clusters_per_island: Maximum number of clusters kept in an island, or
+        None for no limit. The best cluster of an island is never evicted.
+    cluster_eviction_policy: Which cluster leaves a full island: 'oldest',
+        'lowest_novelty' (the one whose signature is closest to another
+        cluster's, where differing in which tests pass outweighs any
+        difference of scores) or 'reservoir'.
   """
   functions_per_prompt: int = 2
   num_islands: int = 10
   reset_period: int = 4 * 60 * 60
   cluster_sampling_temperature_init: float = 0.1
   cluster_sampling_temperature_period: int = 30_000
-  backup_period: int = 30
+  backup_period: int = 1000
   backup_folder: str = './data/backups'
+  max_programs_per_cluster: int | None = None
+  program_eviction_policy: str = 'longest'
+  max_clusters_per_island: int | None = None
+  cluster_eviction_policy: str = 'lowest_novelty'
 
 
 @dataclasses.dataclass(frozen=True)
@@ -55,9 +72,17 @@ class Config:
         can execute in parallel as part of a distributed system.
     samples_per_prompt: How many independently sampled program continuations to
         obtain for each prompt.
+    evaluation_queue_size: Maximum number of samples waiting between the
+        Samplers and the Evaluators before Samplers block.
+    evaluation_workers: Number of samples evaluated at once, by threads that
+        feed the queued samples to the Evaluators. Each sample is one sandbox
+        round-trip, so this should match the number of sandbox containers.
+        Defaults to one per Evaluator.
   """
   programs_database: ProgramsDatabaseConfig = dataclasses.field(
       default_factory=ProgramsDatabaseConfig)
   num_samplers: int = 15
   num_evaluators: int = 140
   samples_per_prompt: int = 4
+  evaluation_queue_size: int = 64
+  evaluation_workers: int | None = None
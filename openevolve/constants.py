@@ -4,6 +4,11 @@ from pathlib import Path
 
 HOTSWAP_ENVVAR = "OPENEVOLE_HOTSWAP_IMP"
 
+# Override where hotswapped functions look for the workspace and the implementations,
+# for sandboxes that run the project outside of a container
+WORKSPACE_ROOT_ENVVAR = "OPENEVOLVE_WORKSPACE_ROOT"
+IMPS_ROOT_ENVVAR = "OPENEVOLVE_IMPS_ROOT"
+
 # Absolute paths in the container file system
 WORKSPACE_ROOT: ContainerAbsPath = Path("/home/workspace")
 CONTAINER_IMPS_PATH: ContainerAbsPath = Path("/home/imps")
@@ -17,4 +22,6 @@ CONTAINER_PYTHONPATH: ContainerAbsPath = Path("/usr/local/bin/python3")
 
 # Container constants
 SANDBOX_IMAGE_NAME = "openevolve_image"
-SANDBOX_CONTAINER_NAME = "openevolve_sandbox"
\ No newline at end of file
+SANDBOX_CONTAINER_NAME = "openevolve_sandbox"
+# Label of the image with the digest of the OpenEvolve sources installed in it
+SANDBOX_IMAGE_DIGEST_LABEL = "openevolve.digest"
\ No newline at end of file
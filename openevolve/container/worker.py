@@ -0,0 +1,377 @@
+"""
+Long-lived evaluation worker that runs inside the sandbox.
+
+The worker imports the evaluation script, and with it the whole project, once.
+It then serves requests read line by line from stdin: every request forks a
+child from the preloaded interpreter, which selects the implementation to
+hotswap, runs the `@openevolve.run` function on the test case and pickles an
+`EvalResult` to the outputs directory. A test therefore only pays for running
+the program, not for starting Python and importing the project.
+
+The same worker also runs outside of containers (see `ProcessSandbox`), where
+each child can be given its own scratch working directory so that programs
+do not write into the project.
+
+Once the project is loaded, the worker announces itself with `{"ready": true}`.
+Requests and responses are then JSON objects, one per line:
+
+    -> {"implementation_id": "0_1", "test_id": 3, "timeout": 30.0}
+    <- {"implementation_id": "0_1", "test_id": 3, "output_path": "/home/outputs/0_1/output_3.pickle", "exitcode": 0, "status": "ok"}
+
+A request can also carry a batch of tests, which are run one after the other,
+each with its own timeout, and answered with a single response. The
+implementation is compiled once before the batch, so that every child
+inherits it:
+
+    -> {"implementation_id": "0_1", "test_ids": [0, 1], "timeout": 30.0}
+    <- {"implementation_id": "0_1", "results": [{"test_id": 0, ...}, {"test_id": 1, ...}]}
+
+The compiled implementation is dropped from the worker once its batch is
+answered, so that the worker does not grow with every implementation served.
+"""
+from openevolve.constants import (
+    HOTSWAP_ENVVAR,
+    CONTAINER_EVAL_PATH,
+    CONTAINER_LOGS_PATH,
+    CONTAINER_INPUTS_PATH,
+    CONTAINER_OUTPUTS_PATH,
+    WORKSPACE_ROOT,
+)
+
+from openevolve.eval_result import EvalResult, EvalStatus
+from openevolve.hotswap import activate, preload, reload
+
+from pathlib import Path
+from typing import Any, Callable, TextIO
+
+import cloudpickle as pickle
+import traceback
+import argparse
+import builtins
+import resource
+import math
+import signal
+import select
+import shutil
+import json
+import time
+import sys
+import os
+
+def load_run_function(eval_path: Path) -> Callable[..., Any]:
+    """
+    Executes the evaluation script once and returns its `@openevolve.run` function.
+
+    Args:
+        eval_path (Path): The path to the evaluation script.
+
+    Returns:
+        Callable: The first function decorated with `@openevolve.run`.
+    """
+    # The @openevolve.run storage is registered in builtins when openevolve is imported
+    builtins._dbg_storage["fns_to_run"].clear()
+
+    code = compile(eval_path.read_text(), filename=str(eval_path), mode="exec")
+    exec(code, {"__name__": "__openevolve_eval__", "__file__": str(eval_path)})
+
+    run_functions = builtins._dbg_storage["fns_to_run"]
+
+    if not run_functions:
+        raise ValueError(f"No function decorated with @openevolve.run in {eval_path}.")
+
+    return run_functions[0]
+
+def _write_result(output_path: Path, eval_result: EvalResult):
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(output_path, "wb") as file:
+        pickle.dump(eval_result, file)
+
+# Exit code of a child whose run raised a MemoryError
+OOM_EXITCODE = 3
+
+def _set_limits(timeout: float, memory_limit: int | None):
+    """Limits the resources of the current process."""
+    # The CPU time limit backs up the wall-clock timeout enforced by the parent
+    cpu_limit = math.ceil(timeout) + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit + 1))
+
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+def _status(exitcode: int | None) -> EvalStatus:
+    """Classifies how a child that did not write its result ended."""
+    if exitcode is None or exitcode == -signal.SIGXCPU:
+        return EvalStatus.TIMEOUT
+
+    # A child killed without being asked to was most likely taken by the OOM killer
+    if exitcode == -signal.SIGKILL:
+        return EvalStatus.OOM
+
+    return EvalStatus.ERROR
+
+def _run_child(
+    run_function: Callable[..., Any],
+    implementation_id: str,
+    input_path: Path,
+    output_path: Path,
+    log_dir: Path,
+    timeout: float,
+    memory_limit: int | None = None,
+    scratch_dir: Path | None = None,
+):
+    """Runs a single test case. Only ever called in a forked child, never returns."""
+    exitcode = 0
+
+    try:
+        _set_limits(timeout, memory_limit)
+        log_dir.mkdir(parents=True, exist_ok=True)
+
+        if scratch_dir is not None:
+            scratch_dir.mkdir(parents=True, exist_ok=True)
+            os.chdir(scratch_dir)
+
+        # Redirect the program's output to the log files of this test case
+        with open(log_dir / "stdout.txt", "wb") as stdout:
+            os.dup2(stdout.fileno(), 1)
+        with open(log_dir / "stderr.txt", "wb") as stderr:
+            os.dup2(stderr.fileno(), 2)
+
+        # The environment variable is also seen by subprocesses of the program
+        activate(implementation_id)
+        os.environ[HOTSWAP_ENVVAR] = implementation_id
+
+        with open(input_path, "rb") as file:
+            test_case = pickle.load(file)
+
+        try:
+            output = run_function(*test_case["args"], **test_case["kwargs"])
+            eval_result = EvalResult(success=True, output=output)
+        except MemoryError:
+            traceback.print_exc()
+            eval_result = EvalResult(success=False, output=None, status=EvalStatus.OOM)
+            exitcode = OOM_EXITCODE
+        except Exception:
+            traceback.print_exc()
+            eval_result = EvalResult(success=False, output=None)
+            exitcode = 1
+
+        _write_result(output_path, eval_result)
+    except BaseException:
+        traceback.print_exc()
+        exitcode = 2
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(exitcode)
+
+def _wait(pid: int, timeout: float) -> int | None:
+    """Waits for a child to exit, killing it after `timeout` seconds. Returns None on timeout."""
+    deadline = time.monotonic() + timeout
+
+    try:
+        pidfd = os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        pidfd = None
+
+    try:
+        while True:
+            waited_pid, status = os.waitpid(pid, os.WNOHANG)
+
+            if waited_pid != 0:
+                return os.waitstatus_to_exitcode(status)
+
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                return None
+
+            if pidfd is not None:
+                select.select([pidfd], [], [], remaining)
+            else:
+                time.sleep(min(remaining, 0.005))
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
+class Worker:
+    """Serves evaluation requests from a preloaded interpreter."""
+
+    def __init__(
+        self,
+        eval_path: Path = CONTAINER_EVAL_PATH,
+        inputs_root: Path = CONTAINER_INPUTS_PATH,
+        outputs_root: Path = CONTAINER_OUTPUTS_PATH,
+        logs_root: Path = CONTAINER_LOGS_PATH,
+        memory_limit: int | None = None,
+        scratch_root: Path | None = None,
+    ):
+        """
+        Initializes the worker and preloads the evaluation script.
+
+        Args:
+            eval_path (Path): The path to the evaluation script.
+            inputs_root (Path): The directory containing the pickled test cases.
+            outputs_root (Path): The directory to write the pickled results to.
+            logs_root (Path): The directory to write the stdout/stderr logs to.
+            memory_limit (int | None): If provided, the maximum address space in bytes of each run.
+            scratch_root (Path | None): If provided, each run gets a fresh working directory under it,
+                which is deleted once the run is over.
+        """
+        self.inputs_root = inputs_root
+        self.outputs_root = outputs_root
+        self.logs_root = logs_root
+        self.memory_limit = memory_limit
+        self.scratch_root = scratch_root
+        self.run_function = load_run_function(eval_path)
+
+    def handle(self, implementation_id: str, test_id: int, timeout: float) -> dict[str, Any]:
+        """
+        Runs one test case of one implementation in a forked child.
+
+        Returns:
+            dict[str, Any]: The response to send back to the host.
+        """
+        input_path = self.inputs_root / f"{test_id}.pickle"
+        output_path = self.outputs_root / implementation_id / f"output_{test_id}.pickle"
+        log_dir = self.logs_root / implementation_id / f"test_{test_id}"
+        scratch_dir = None
+
+        if self.scratch_root is not None:
+            scratch_dir = self.scratch_root / implementation_id / f"test_{test_id}"
+
+        # Make sure buffered output is not duplicated into the child
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        pid = os.fork()
+
+        if pid == 0:
+            _run_child(
+                self.run_function,
+                implementation_id,
+                input_path,
+                output_path,
+                log_dir,
+                timeout,
+                self.memory_limit,
+                scratch_dir,
+            )
+
+        exitcode = _wait(pid, timeout)
+
+        if scratch_dir is not None:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+        if exitcode is None or not output_path.exists():
+            status = _status(exitcode)
+            _write_result(output_path, EvalResult(success=False, output=None, status=status))
+        elif exitcode == OOM_EXITCODE:
+            status = EvalStatus.OOM
+        else:
+            status = EvalStatus.OK if exitcode == 0 else EvalStatus.ERROR
+
+        return {
+            "implementation_id": implementation_id,
+            "test_id": test_id,
+            "output_path": str(output_path),
+            "exitcode": exitcode,
+            "status": status.value,
+        }
+
+    def handle_batch(
+        self,
+        implementation_id: str,
+        test_ids: list[int],
+        timeout: float,
+    ) -> dict[str, Any]:
+        """
+        Runs several test cases of one implementation, each with its own timeout.
+
+        Returns:
+            dict[str, Any]: The response to send back to the host.
+        """
+        preload(implementation_id)
+
+        try:
+            results = [
+                self.handle(implementation_id, test_id, timeout)
+                for test_id in test_ids
+            ]
+        finally:
+            # Only keep the implementations of the batch being served
+            reload(implementation_id)
+
+        return {
+            "implementation_id": implementation_id,
+            "results": results,
+        }
+
+    def serve(self, requests: TextIO, responses: TextIO):
+        """Answers the requests until the input stream is closed."""
+        for line in requests:
+            if not line.strip():
+                continue
+
+            request = json.loads(line)
+
+            try:
+                if "test_ids" in request:
+                    response = self.handle_batch(
+                        request["implementation_id"],
+                        [int(test_id) for test_id in request["test_ids"]],
+                        float(request["timeout"]),
+                    )
+                else:
+                    response = self.handle(
+                        request["implementation_id"],
+                        int(request["test_id"]),
+                        float(request["timeout"]),
+                    )
+            except Exception as e:
+                response = {**request, "error": repr(e)}
+
+            responses.write(json.dumps(response) + "\n")
+            responses.flush()
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--eval", type=Path, default=CONTAINER_EVAL_PATH)
+    parser.add_argument("--inputs", type=Path, default=CONTAINER_INPUTS_PATH)
+    parser.add_argument("--outputs", type=Path, default=CONTAINER_OUTPUTS_PATH)
+    parser.add_argument("--logs", type=Path, default=CONTAINER_LOGS_PATH)
+    parser.add_argument("--workspace", type=Path, default=WORKSPACE_ROOT)
+    parser.add_argument("--memory-limit", type=int, default=None)
+    parser.add_argument("--scratch", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    # Keep the original stdout for the protocol, and send anything the project
+    # prints while it is imported or run to stderr instead.
+    responses = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+
+    # The outputs and logs may be bind-mounted from the host, where they are
+    # read and cleaned up by a different user than the one running the worker.
+    os.umask(0)
+
+    os.chdir(args.workspace)
+    sys.path.insert(0, str(args.workspace))
+
+    worker = Worker(
+        args.eval,
+        args.inputs,
+        args.outputs,
+        args.logs,
+        args.memory_limit,
+        args.scratch,
+    )
+
+    responses.write(json.dumps({"ready": True}) + "\n")
+    responses.flush()
+
+    worker.serve(sys.stdin, responses)
+
+if __name__ == "__main__":
+    main()
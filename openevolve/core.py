@@ -13,45 +13,89 @@
 # limitations under the License.
 # ==============================================================================
 
-"""A single-threaded implementation of the FunSearch pipeline."""
-from concurrent.futures import ThreadPoolExecutor
+"""A pipelined implementation of the FunSearch pipeline."""
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 
 import logging
 import time
 
-def run(samplers, database, iterations: int = -1):
+def run(
+    samplers,
+    database,
+    iterations: int = -1,
+    max_in_flight: int | None = None,
+    evaluation_queue=None,
+):
     """Launches a FunSearch experiment.
 
+    Every sampler runs independently: as soon as one of its `.sample()` calls
+    finishes, the next one is scheduled, so a slow LLM call or sandbox run only
+    delays the sampler it belongs to instead of the whole population.
+
     Args:
         samplers: List of sampler objects, each with a .sample() method.
         database: Database object with a .backup() method.
-        iterations: Number of iterations to run. If -1, runs indefinitely.
+        iterations: Number of iterations to run per sampler. If -1, runs indefinitely.
+        max_in_flight: Maximum number of `.sample()` calls running at once.
+            Defaults to one per sampler.
+        evaluation_queue: Optional queue the samplers hand their samples to. It
+            is drained before the final backup.
     """
+    if max_in_flight is None:
+        max_in_flight = len(samplers)
+    max_in_flight = max(1, min(max_in_flight, len(samplers)))
+
+    remaining = {id(s): iterations for s in samplers}
+    ready = list(samplers)
+    in_flight: dict[Future, tuple[object, float]] = {}
     counter = 0
+    start_time = time.time()
+
+    executor = ThreadPoolExecutor(max_workers=max_in_flight)
+
+    def submit_ready():
+        while ready and len(in_flight) < max_in_flight:
+            s = ready.pop(0)
+            if remaining[id(s)] == 0:
+                continue
+            in_flight[executor.submit(s.sample)] = (s, time.time())
 
     try:
-        with ThreadPoolExecutor(max_workers=len(samplers)) as executor:
-            while iterations != 0:
-                t0 = time.time()
+        submit_ready()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
 
-                futures = [
-                    executor.submit(s.sample)
-                    for s in samplers
-                ]
+            for future in done:
+                s, t0 = in_flight.pop(future)
+                t1 = time.time()
 
-                for future in futures:
+                try:
                     future.result()
+                except Exception:
+                    logging.exception(f"Sampler {getattr(s, 'uid', '?')} failed.")
 
-                t1 = time.time()
                 logging.info(
-                    f"Iteration: {counter}, Time taken: {t1 - t0:.3f} seconds"
+                    f"Iteration: {counter}, "
+                    f"Sampler: {getattr(s, 'uid', '?')}, "
+                    f"Time taken: {t1 - t0:.3f} seconds, "
+                    f"Samples/hour: {3600 * (counter + 1) / (t1 - start_time):.1f}"
                 )
                 counter += 1
 
-                if iterations > 0:
-                    iterations -= 1
+                if remaining[id(s)] > 0:
+                    remaining[id(s)] -= 1
+                ready.append(s)
+
+            submit_ready()
 
     except KeyboardInterrupt:
         logging.info("Keyboard interrupt. Stopping.")
 
-    database.backup()
\ No newline at end of file
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+        if evaluation_queue is not None:
+            evaluation_queue.close()
+            logging.info(f"Evaluation queue: {evaluation_queue.metrics()}")
+
+    database.backup()
@@ -0,0 +1,146 @@
+"""Clients that run container engine (Podman/Docker) commands for the sandboxes."""
+from dataclasses import dataclass
+from abc import ABC, abstractmethod
+
+import subprocess
+import threading
+import logging
+import shlex
+
+@dataclass
+class CommandResult:
+    """
+    The result of a container engine command.
+
+    Attributes:
+        args (list[str]): The full command line, including the executable.
+        returncode (int | None): The exit code of the command, or None if it timed out.
+        stdout (str): The captured standard output.
+        stderr (str): The captured standard error output.
+    """
+    args: list[str]
+    returncode: int | None
+    stdout: str = ""
+    stderr: str = ""
+
+    @property
+    def timed_out(self) -> bool:
+        """Whether the command was killed because it timed out."""
+        return self.returncode is None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the command exited successfully."""
+        return self.returncode == 0
+
+class EngineError(RuntimeError):
+    """Raised when a container engine command that must succeed fails."""
+
+    def __init__(self, result: CommandResult):
+        self.result = result
+        reason = "timed out" if result.timed_out else f"exited with code {result.returncode}"
+        super().__init__(
+            f"Command '{shlex.join(result.args)}' {reason}: {result.stderr.strip()}"
+        )
+
+class EngineClient(ABC):
+    """
+    Base class for container engine clients.
+
+    Commands are given as argument lists without the engine executable, e.g.
+    `["exec", "my_container", "true"]`, so no shell is involved on the host.
+    Subclasses implement `_run` and `popen`; tests can plug in a fake client
+    instead of talking to a real engine.
+    """
+
+    def __init__(self, executable: str, max_concurrency: int | None = None):
+        """
+        Initializes the client.
+
+        Args:
+            executable (str): The container engine executable (e.g. "docker").
+            max_concurrency (int | None): If provided, the maximum number of commands running at once.
+        """
+        self.executable = executable
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+
+    def command(self, args: list[str]) -> list[str]:
+        """Returns the full command line for the engine arguments."""
+        return [self.executable, *map(str, args)]
+
+    def run(
+        self,
+        args: list[str],
+        timeout: float | None = None,
+        check: bool = False,
+        capture_output: bool = True,
+    ) -> CommandResult:
+        """
+        Runs an engine command and waits for it to finish.
+
+        Args:
+            args (list[str]): The arguments to the engine executable.
+            timeout (float | None): If provided, the command is killed after this many seconds.
+            check (bool): If True, raises an EngineError if the command fails or times out.
+            capture_output (bool): If False, the output goes to the host's stdout/stderr instead.
+
+        Returns:
+            CommandResult: The result of the command.
+        """
+        if self._slots is not None:
+            self._slots.acquire()
+
+        try:
+            logging.debug(f"Executing: {shlex.join(self.command(args))}")
+            result = self._run(self.command(args), timeout, capture_output)
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+        if check and not result.ok:
+            raise EngineError(result)
+
+        return result
+
+    @abstractmethod
+    def popen(self, args: list[str], **kwargs) -> subprocess.Popen:
+        """Starts a long-lived engine command, such as a worker attached over `exec -i`."""
+
+    @abstractmethod
+    def _run(self, cmd: list[str], timeout: float | None, capture_output: bool) -> CommandResult:
+        """Runs a full command line and waits for it to finish."""
+
+class SubprocessEngineClient(EngineClient):
+    """Runs the engine's command-line executable in subprocesses."""
+
+    def popen(self, args: list[str], **kwargs) -> subprocess.Popen:
+        cmd = self.command(args)
+        logging.debug(f"Starting: {shlex.join(cmd)}")
+        return subprocess.Popen(cmd, **kwargs)
+
+    def _run(self, cmd: list[str], timeout: float | None, capture_output: bool) -> CommandResult:
+        try:
+            completed = subprocess.run(
+                cmd,
+                capture_output=capture_output,
+                text=True,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired as e:
+            # subprocess.run kills the process before raising
+            return CommandResult(cmd, None, _decode(e.stdout), _decode(e.stderr))
+        except FileNotFoundError:
+            return _not_found(cmd)
+
+        return CommandResult(cmd, completed.returncode, completed.stdout or "", completed.stderr or "")
+
+def _not_found(cmd: list[str]) -> CommandResult:
+    # Mirror the exit code a shell reports for a missing executable
+    return CommandResult(cmd, 127, stderr=f"{cmd[0]}: command not found")
+
+def _decode(output: bytes | str | None) -> str:
+    if output is None:
+        return ""
+    if isinstance(output, bytes):
+        return output.decode(errors="replace")
+    return output
@@ -1,8 +1,21 @@
 from dataclasses import dataclass
+from enum import StrEnum
 from typing import Any
 
+class EvalStatus(StrEnum):
+    """Enum for how an evaluation ended."""
+    OK = "ok"
+    ERROR = "error"
+    TIMEOUT = "timeout"
+    OOM = "oom"
+
 @dataclass
 class EvalResult:
     """A class to represent the result of an evaluation."""
     success: bool
-    output: Any
\ No newline at end of file
+    output: Any
+    status: EvalStatus | None = None
+
+    def __post_init__(self):
+        if self.status is None:
+            self.status = EvalStatus.OK if self.success else EvalStatus.ERROR
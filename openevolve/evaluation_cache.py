@@ -0,0 +1,164 @@
+"""Content-addressed cache of evaluation results, so that identical programs are only evaluated once."""
+from openevolve.code_manipulation import Program
+from openevolve.test_case import TestCase
+
+from collections.abc import Sequence
+from pathlib import Path
+
+import cloudpickle as pickle
+import threading
+import hashlib
+import logging
+import json
+import ast
+
+def program_fingerprint(program: Program) -> str:
+    """
+    Hashes a program so that programs that only differ in formatting or comments hash the same.
+
+    Args:
+        program (Program): The program to hash.
+
+    Returns:
+        str: The hex digest of the normalized program.
+    """
+    digest = hashlib.sha256()
+
+    for function in sorted(program.functions, key=lambda function: (str(function.path), function.qualname)):
+        try:
+            body = ast.dump(ast.parse(function.body))
+        except SyntaxError:
+            body = function.body
+
+        for part in (str(function.path), function.qualname, str(function.header), body):
+            digest.update(part.encode())
+            digest.update(b"\0")
+
+    return digest.hexdigest()
+
+def tests_fingerprint(tests: Sequence[TestCase]) -> str:
+    """
+    Hashes a test suite, so that cached results are only reused for the same tests.
+
+    Args:
+        tests (Sequence[TestCase]): The test cases.
+
+    Returns:
+        str: The hex digest of the test suite.
+    """
+    return hashlib.sha256(pickle.dumps([(test.args, test.kwargs) for test in tests])).hexdigest()
+
+def project_fingerprint(project_root: Path, files: Sequence[Path] = ()) -> str:
+    """
+    Hashes the sources of a project, so that cached results are not reused once the project changes.
+
+    Every Python file of the project is hashed, including the evaluation script, except for
+    those in hidden directories (e.g. `.git`, `.venv`) and `__pycache__`. Other files, such as
+    data read by the evaluation, are only hashed if listed in `files`.
+
+    Args:
+        project_root (Path): The root of the project.
+        files (Sequence[Path]): Other files to hash, relative to the project root (e.g. the setup script).
+
+    Returns:
+        str: The hex digest of the project.
+    """
+    digest = hashlib.sha256()
+    sources = [
+        path.relative_to(project_root) for path in project_root.rglob("*.py")
+        if not any(part.startswith(".") or part == "__pycache__" for part in path.relative_to(project_root).parts)
+    ]
+
+    for path in sorted({*sources, *map(Path, files)}):
+        digest.update(str(path).encode() + b"\0")
+        digest.update((project_root / path).read_bytes())
+        digest.update(b"\0")
+
+    return digest.hexdigest()
+
+class EvaluationCache:
+    """
+    Scores per test of evaluated programs, by the fingerprint of the program and of the test suite.
+
+    Entries are appended to a JSON-lines file as they are added, and read back
+    when the cache is opened, so that the cache persists across runs. Scores also
+    depend on what the programs are evaluated with, such as the evaluation script
+    and the rest of the project, so entries are only reused under the same `context`.
+    """
+
+    def __init__(self, path: Path | None = None, context: str = ""):
+        """
+        Opens the cache.
+
+        Args:
+            path (Path | None): The file the cache is persisted to. If None, the cache only lives in memory.
+            context (str): A fingerprint of everything else the scores depend on, e.g. from
+                `project_fingerprint`. Entries cached under another context are not reused.
+        """
+        self.path = path
+        self.context = context
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: dict[str, dict[int, float]] = {}
+        self._lock = threading.Lock()
+
+        if path is not None and path.exists():
+            with open(path) as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short when a previous run was killed
+                        continue
+
+                    self._entries[entry["key"]] = {
+                        int(test_id): score for test_id, score in entry["scores"].items()
+                    }
+
+            logging.info(f"Loaded {len(self._entries)} cached evaluations from {path}.")
+
+    def key(self, program: Program, tests: Sequence[TestCase] | str) -> str:
+        """
+        Returns the cache key of a program evaluated on a test suite, in the context of the cache.
+
+        Args:
+            program (Program): The program.
+            tests (Sequence[TestCase] | str): The test suite, or its fingerprint.
+        """
+        if not isinstance(tests, str):
+            tests = tests_fingerprint(tests)
+
+        key = f"{program_fingerprint(program)}:{tests}"
+
+        if self.context:
+            key += f":{self.context}"
+
+        return key
+
+    def get(self, key: str) -> dict[int, float] | None:
+        """Returns the cached scores per test, or None if the program was not evaluated yet."""
+        with self._lock:
+            scores = self._entries.get(key)
+
+            if scores is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+            return scores
+
+    def put(self, key: str, scores: dict[int, float]):
+        """Caches the scores per test of a program, and persists them if the cache has a file."""
+        with self._lock:
+            self._entries[key] = dict(scores)
+
+            if self.path is not None:
+                with open(self.path, "a") as file:
+                    file.write(json.dumps({"key": key, "scores": scores}) + "\n")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
@@ -1,6 +1,5 @@
 """Class for evaluating programs proposed by the Sampler."""
 from openevolve.code_manipulation import (
-    Function,
     Program,
     structured_output_to_prog_meta
 )
@@ -11,9 +10,23 @@ from openevolve import programs_database
 from openevolve import sandbox
 
 from openevolve.structured_outputs import ProgramImplementation
+from openevolve.implementation_store import ImplementationStore
+from openevolve.evaluation_cache import EvaluationCache, tests_fingerprint
+from openevolve.prescreen import Prescreener
+from openevolve.eval_result import EvalResult, EvalStatus
 from openevolve.test_case import TestCase
 
-import os
+from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Sequence
+
+import collections
+import dataclasses
+import threading
+import inspect
+import asyncio
+import logging
+import queue
+import time
 
 class ImplementationsManager:
     """Class that manages implementations of programs."""
@@ -24,6 +37,9 @@ class ImplementationsManager:
     # Directory where implementations are saved
     implementations_root: HostAbsPath
 
+    # Pack file of implementations in the implementations directory
+    store: ImplementationStore
+
     # This is a mapping from function full names to their metadata
     program_meta: dict[FullName, FuncMeta]
 
@@ -46,6 +62,7 @@ class ImplementationsManager:
             root (HostAbsPath): The root directory where implementations will be saved on the host.
         """
         cls.implementations_root = root
+        cls.store = ImplementationStore(root)
     
     @classmethod
     def set_program_meta(cls, program_meta: dict[FullName, FuncMeta]):
@@ -58,32 +75,63 @@ class ImplementationsManager:
         cls.program_meta = program_meta
     
     @classmethod
-    def _save_function(cls, function: Function, id: str):
+    def parse_implementation(cls, implementation: ProgramImplementation) -> Program:
+        """Parses the implementation into a Program object, checking it against the program metadata."""
+        return structured_output_to_prog_meta(implementation, cls.program_meta)
+
+    @classmethod
+    def save_program(cls, program: Program, id: str):
         """
-        Saves a single function to the implementation directory.
-        
+        Saves the functions of a program to the implementation store.
+
         Args:
-            function (Function): The function to save.
+            program (Program): The parsed implementation.
             id (str): The unique identifier for the implementation.
         """
-        func_file_path = cls.implementations_root / function.path
-        func_code_path = func_file_path / (function.qualname + ' ' + id)
-
-        os.makedirs(func_file_path, exist_ok=True)
-
-        with open(func_code_path, "w") as file:
-            file.write(function.body)
+        # All functions of the implementation are appended to the store at once
+        cls.store.put(id, {
+            f"{function.path} {function.qualname}": function.body
+            for function in program.functions
+        })
 
     @classmethod
     def save_implementation(cls, implementation: ProgramImplementation, id: str) -> Program:
-        """Saves the implementation to the filesystem and returns a Program object."""
-        parsed_prog = structured_output_to_prog_meta(implementation, cls.program_meta)
-
-        for function in parsed_prog.functions:
-            cls._save_function(function, id)
-        
+        """Saves the implementation to the implementation store and returns a Program object."""
+        parsed_prog = cls.parse_implementation(implementation)
+        cls.save_program(parsed_prog, id)
         return parsed_prog
 
+    @classmethod
+    def discard_implementation(cls, id: str):
+        """
+        Marks an implementation as evaluated, so that the store can drop it.
+
+        Args:
+            id (str): The unique identifier for the implementation.
+        """
+        cls.store.discard(id)
+
+# Number of abandoned programs whose partial scores are kept
+ABANDONED_HISTORY = 1000
+
+@dataclasses.dataclass
+class AbandonedProgram:
+    """A program abandoned by the cascade, with the scores of the tests it ran."""
+    implementation_id: str
+    island_id: int
+    exit_batch: int
+    scores: dict[int, float]
+
+def _score(eval_result: EvalResult) -> float | None:
+    """Returns the score of a test, or None if the test failed."""
+    if not eval_result.success or eval_result.output is None:
+        return None
+
+    if not isinstance(eval_result.output, (int, float)):
+        raise ValueError("@run did not return an int/float score.")
+
+    return eval_result.output
+
 class AsyncEvaluator:
     """Class that analyses functions generated by LLMs."""
 
@@ -93,6 +141,12 @@ class AsyncEvaluator:
         sandbox: sandbox.ContainerSandbox,
         tests: list[TestCase],
         timeout: float = 30.0,
+        max_concurrency: int = 8,
+        timeout_grace: float = 10.0,
+        batch_size: int | None = None,
+        cache: EvaluationCache | None = None,
+        cascade: bool = False,
+        cascade_margin: float = 0.0,
     ):
         """
         Initializes the evaluator with the necessary components.
@@ -102,14 +156,118 @@ class AsyncEvaluator:
             sandbox (DummySandbox): The sandbox for running implementations.
             tests (list[TestCase]): Test cases to run against the implementations.
             timeout (float): Timeout for each test case execution in seconds.
+            max_concurrency (int): Maximum number of sandbox runs in flight at once,
+                shared by every implementation analysed by this evaluator.
+            timeout_grace (float): Extra seconds the host waits for a sandbox run on
+                top of `timeout` before giving up on it.
+            batch_size (int | None): Number of test cases sent to the sandbox in a single
+                round-trip. Defaults to the whole test suite, or to a single test in cascade mode.
+            cache (EvaluationCache | None): If provided, programs that were already evaluated on
+                these tests are registered with their cached scores instead of being run again.
+            cascade (bool): If True, the batches of tests are run one after the other, from the
+                fastest to the slowest test as timed on the initial program (the one analysed without
+                an island), or in the order of `tests` until it is analysed. A program is abandoned
+                as soon as it fails a test, or scores below the best program of its island on a test.
+            cascade_margin (float): How far below the best program of the island a program may
+                score on a test before it is abandoned, as a fraction of the best program's score.
         """
         self.database = database
         self.tests = tests
         self.timeout = timeout
+        self.timeout_grace = timeout_grace
+        self.batch_size = batch_size or (1 if cascade else len(tests))
         self.sandbox = sandbox
+        self.cache = cache
+        self.cascade = cascade
+        self.cascade_margin = cascade_margin
+        self._tests_fingerprint = tests_fingerprint(tests) if cache is not None else None
+
+        # Sandbox runs block, so they are dispatched to a bounded thread pool.
+        # A thread pool rather than an asyncio.Semaphore keeps the limit valid
+        # when several event loops (e.g. EvaluationQueue workers) share this evaluator.
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix="sandbox-run",
+        )
+
+        # How the sandbox runs ended, e.g. how many timed out or ran out of memory
+        self.status_counts: collections.Counter[EvalStatus] = collections.Counter()
+        self._status_lock = threading.Lock()
+
+        # The order in which the cascade runs the tests, and the run time of each test on the
+        # initial program, which the order is sorted by
+        self.test_order = list(range(len(tests)))
+        self.test_durations: dict[int, float] = {}
+
+        # How many programs were abandoned after each batch of the cascade, and the most
+        # recently abandoned ones with their partial scores
+        self.cascade_exits: collections.Counter[int] = collections.Counter()
+        self.abandoned: collections.deque[AbandonedProgram] = collections.deque(
+            maxlen=ABANDONED_HISTORY
+        )
 
         sandbox.upload_test_cases(tests)
 
+    def shutdown(self):
+        """Stops the thread pool used to dispatch sandbox runs."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    async def _run_tests(
+        self,
+        implementation_id: str,
+        test_ids: list[int],
+        durations: dict[int, float] | None = None,
+    ) -> list[EvalResult]:
+        """
+        Runs a batch of test cases in the sandbox without blocking the event loop.
+
+        Args:
+            implementation_id (str): The identifier of the implementation to run.
+            test_ids (list[int]): The indices of the test cases to run.
+            durations (dict[int, float] | None): If provided, the run time of each test case
+                is recorded in it, as its share of the run time of the batch.
+        """
+        loop = asyncio.get_running_loop()
+
+        def run():
+            # Timed in the pool, so that the time spent waiting for a free thread is left out
+            t0 = time.perf_counter()
+            results = self.sandbox.run_batch(
+                implementation_id=implementation_id,
+                test_ids=test_ids,
+                timeout=self.timeout,
+            )
+
+            if durations is not None:
+                duration = (time.perf_counter() - t0) / len(test_ids)
+                durations.update((test_id, duration) for test_id in test_ids)
+
+            return results
+
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(self._executor, run),
+                timeout=self.timeout * len(test_ids) + self.timeout_grace,
+            )
+        except asyncio.TimeoutError:
+            logging.warning(
+                f"Implementation {implementation_id} timed out on tests {test_ids}."
+            )
+
+            if durations is not None:
+                durations.update((test_id, self.timeout) for test_id in test_ids)
+
+            return [
+                EvalResult(success=False, output=None, status=EvalStatus.TIMEOUT)
+                for _ in test_ids
+            ]
+        except Exception:
+            logging.exception(
+                f"Sandbox failed to run implementation {implementation_id} on tests {test_ids}."
+            )
+
+        return [EvalResult(success=False, output=None) for _ in test_ids]
+
     async def analyse(
         self,
         implementation: ProgramImplementation,
@@ -117,26 +275,302 @@ class AsyncEvaluator:
         implementation_id: str
     ):
         """Compiles the sample into a program and executes it on test inputs."""
-        program = ImplementationsManager.save_implementation(implementation, implementation_id)
+        program = ImplementationsManager.parse_implementation(implementation)
+        cache_key = None
 
-        # Evaluate on the test cases and get the test scores
+        if self.cache is not None:
+            cache_key = self.cache.key(program, self._tests_fingerprint)
+            cached_scores = self.cache.get(cache_key)
+
+            # The same program was already evaluated, so the sandbox is skipped
+            if cached_scores is not None:
+                if cached_scores:
+                    self.database.register_program(program, island_id, cached_scores)
+                return
+
+        ImplementationsManager.save_program(program, implementation_id)
+
+        test_ids = self.test_order
+        batches = [
+            test_ids[i:i + self.batch_size]
+            for i in range(0, len(test_ids), self.batch_size)
+        ]
+
+        try:
+            # The initial program is not compared to anything, so it runs every test
+            if self.cascade and island_id is not None:
+                eval_results, exit_batch = await self._run_cascade(implementation_id, island_id, batches)
+            elif self.cascade:
+                durations = {}
+                eval_results, exit_batch = await self._run_all(implementation_id, batches, durations), None
+                self._order_tests(durations)
+            else:
+                eval_results, exit_batch = await self._run_all(implementation_id, batches), None
+        finally:
+            # The sandbox does not need the implementation anymore
+            ImplementationsManager.discard_implementation(implementation_id)
+
+        with self._status_lock:
+            self.status_counts.update(eval_result.status for eval_result in eval_results.values())
+
+        # Get the test scores, keyed by the index of the test case
         test_scores = {}
 
-        for test_id in range(len(self._tests)):
-            eval_result = self.sandbox.run(
-                implementation_id = implementation_id,
-                test_id = test_id,
-                timeout = self.timeout,
+        for test_id, eval_result in sorted(eval_results.items()):
+            score = _score(eval_result)
+
+            if score is not None:
+                test_scores[test_id] = score
+
+        if exit_batch is not None:
+            logging.info(
+                f"Abandoned implementation {implementation_id} of island {island_id} after batch "
+                f"{exit_batch}, with partial scores {test_scores}."
             )
 
-            runs_ok = eval_result.success
-            test_output = eval_result.output
+            with self._status_lock:
+                self.cascade_exits[exit_batch] += 1
+                self.abandoned.append(
+                    AbandonedProgram(implementation_id, island_id, exit_batch, test_scores)
+                )
 
-            if runs_ok and test_output is not None:
-                if not isinstance(test_output, (int, float)):
-                    raise ValueError("@run did not return an int/float score.")
+            # Whether a program is abandoned depends on the island, so it is not cached either
+            return
 
-                test_scores[self.tests[test_id]] = test_output
+        # Timeouts may be down to a busy host rather than the program, so they are not cached
+        if cache_key is not None and not any(
+            eval_result.status == EvalStatus.TIMEOUT for eval_result in eval_results.values()
+        ):
+            self.cache.put(cache_key, test_scores)
 
         if test_scores:
-            self.database.register_program(program, island_id, test_scores)
\ No newline at end of file
+            self.database.register_program(program, island_id, test_scores)
+
+    async def _run_all(
+        self,
+        implementation_id: str,
+        batches: list[list[int]],
+        durations: dict[int, float] | None = None,
+    ) -> dict[int, EvalResult]:
+        """
+        Runs all batches of test cases concurrently. If the analysis gets
+        cancelled, the pending runs are cancelled with it.
+        """
+        tasks = [
+            asyncio.ensure_future(self._run_tests(implementation_id, batch, durations))
+            for batch in batches
+        ]
+
+        try:
+            batch_results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        return {
+            test_id: eval_result
+            for batch, results in zip(batches, batch_results)
+            for test_id, eval_result in zip(batch, results)
+        }
+
+    def _order_tests(self, durations: dict[int, float]):
+        """
+        Sorts the tests of the cascade from the fastest to the slowest.
+
+        Args:
+            durations (dict[int, float]): The run time of each test. Tests that were not timed,
+                e.g. because the sandbox failed, go last.
+        """
+        self.test_durations = durations
+        self.test_order = sorted(
+            range(len(self.tests)),
+            key=lambda test_id: durations.get(test_id, float("inf")),
+        )
+
+        logging.info(f"Cascade test order: {self.test_order}.")
+
+    async def _run_cascade(
+        self,
+        implementation_id: str,
+        island_id: int,
+        batches: list[list[int]],
+    ) -> tuple[dict[int, EvalResult], int | None]:
+        """
+        Runs the batches of test cases one after the other, until the program falls behind.
+
+        Returns:
+            tuple[dict[int, EvalResult], int | None]: The results of the tests that were run,
+                and the index of the batch after which the program was abandoned, if it was.
+        """
+        best_scores = self.database.get_best_scores_per_test(island_id) or {}
+        eval_results = {}
+
+        for index, batch in enumerate(batches):
+            results = await self._run_tests(implementation_id, batch)
+
+            for test_id, eval_result in zip(batch, results):
+                eval_results[test_id] = eval_result
+                score = _score(eval_result)
+                best_score = best_scores.get(test_id)
+
+                if score is None or (
+                    best_score is not None
+                    and score < best_score - self.cascade_margin * abs(best_score)
+                ):
+                    return eval_results, index
+
+        return eval_results, None
+
+@dataclasses.dataclass
+class QueueMetrics:
+    """Counters describing the state of an EvaluationQueue."""
+    enqueued: int = 0
+    rejected: int = 0
+    processed: int = 0
+    failed: int = 0
+    max_depth: int = 0
+    producer_wait_time: float = 0.0
+
+
+class EvaluationQueue:
+    """
+    Bounded producer/consumer stage between Samplers and AsyncEvaluators.
+
+    Samplers `put` samples and return immediately to the LLM, while a pool of
+    worker threads, sized independently of the number of samplers, feeds them
+    to the evaluators. When the queue is full, `put` blocks, which applies
+    backpressure to the samplers instead of letting the backlog grow unbounded.
+    """
+
+    _SENTINEL = object()
+
+    def __init__(
+        self,
+        evaluators: Sequence[AsyncEvaluator],
+        maxsize: int = 64,
+        num_workers: int | None = None,
+        prescreener: Prescreener | None = None,
+    ):
+        """
+        Initializes the queue and starts its workers.
+
+        Args:
+            evaluators (Sequence[AsyncEvaluator]): Evaluators that consume the queued samples.
+            maxsize (int): Maximum number of samples waiting for evaluation.
+            num_workers (int | None): Number of worker threads. Defaults to one per evaluator.
+            prescreener (Prescreener | None): Static checks that samples must pass to be enqueued.
+        """
+        if not evaluators:
+            raise ValueError("EvaluationQueue requires at least one evaluator.")
+
+        self._evaluators = list(evaluators)
+        self._prescreener = prescreener
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._metrics = QueueMetrics()
+        self._lock = threading.Lock()
+
+        num_workers = num_workers or len(self._evaluators)
+        self._workers = [
+            threading.Thread(
+                target=self._work,
+                args=(self._evaluators[i % len(self._evaluators)],),
+                name=f"evaluation-worker-{i}",
+                daemon=True,
+            )
+            for i in range(num_workers)
+        ]
+
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def depth(self) -> int:
+        """Number of samples currently waiting for an evaluator."""
+        return self._queue.qsize()
+
+    def metrics(self) -> QueueMetrics:
+        """Returns a snapshot of the queue metrics."""
+        with self._lock:
+            return dataclasses.replace(self._metrics)
+
+    def put(
+        self,
+        implementation: ProgramImplementation | None,
+        island_id: int | None,
+        implementation_id: str,
+        parents: Sequence[Program] = (),
+    ) -> bool:
+        """
+        Enqueues a sample for evaluation, blocking while the queue is full.
+
+        Args:
+            implementation (ProgramImplementation | None): The sample, or None if the LLM response could not be parsed.
+            island_id (int | None): The island the sample is registered in.
+            implementation_id (str): The identifier of the sample.
+            parents (Sequence[Program]): The programs in the prompt the sample was drawn from.
+
+        Returns:
+            bool: Whether the sample was enqueued, rather than rejected by the prescreener.
+        """
+        if self._prescreener is not None:
+            rejection = self._prescreener.screen(implementation, parents)
+
+            if rejection is not None:
+                logging.debug(f"Rejected implementation {implementation_id}: {rejection}.")
+
+                with self._lock:
+                    self._metrics.rejected += 1
+
+                return False
+
+        t0 = time.time()
+        self._queue.put((implementation, island_id, implementation_id))
+        t1 = time.time()
+
+        with self._lock:
+            self._metrics.enqueued += 1
+            self._metrics.producer_wait_time += t1 - t0
+            self._metrics.max_depth = max(self._metrics.max_depth, self._queue.qsize())
+
+        return True
+
+    def join(self):
+        """Blocks until every enqueued sample has been evaluated."""
+        self._queue.join()
+
+    def close(self):
+        """Evaluates the remaining samples and stops the workers."""
+        for _ in self._workers:
+            self._queue.put(self._SENTINEL)
+
+        for worker in self._workers:
+            worker.join()
+
+    def _work(self, evaluator: AsyncEvaluator):
+        loop = asyncio.new_event_loop()
+
+        try:
+            while True:
+                item = self._queue.get()
+
+                try:
+                    if item is self._SENTINEL:
+                        return
+
+                    result = evaluator.analyse(*item)
+
+                    if inspect.isawaitable(result):
+                        loop.run_until_complete(result)
+
+                    with self._lock:
+                        self._metrics.processed += 1
+                except Exception:
+                    logging.exception(f"Failed to evaluate implementation {item[2]}.")
+
+                    with self._lock:
+                        self._metrics.failed += 1
+                finally:
+                    self._queue.task_done()
+        finally:
+            loop.close()
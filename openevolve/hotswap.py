@@ -1,55 +1,351 @@
-from openevolve.constants import HOTSWAP_ENVVAR, WORKSPACE_ROOT, CONTAINER_IMPS_PATH
+from openevolve.implementation_store import ImplementationStore
+from openevolve.code_manipulation import Decorator
+from openevolve.constants import (
+    HOTSWAP_ENVVAR,
+    WORKSPACE_ROOT_ENVVAR,
+    IMPS_ROOT_ENVVAR,
+    WORKSPACE_ROOT,
+    CONTAINER_IMPS_PATH,
+)
 
-from types import FunctionType
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from collections.abc import Iterator
+from types import CellType, CodeType, FunctionType
 
+import functools
+import linecache
+import textwrap
+import threading
+import hashlib
 import inspect
 import os
 
+# Maximum number of compiled implementations kept by `compile_implementation`
+CODE_CACHE_SIZE = 1024
+
+# Compiled implementations, by the hash of their source, from the least to the
+# most recently used. The source of each is registered in `linecache` under the
+# filename of its code object for as long as it is cached.
+_code_cache: OrderedDict[str, CodeType] = OrderedDict()
+_code_cache_lock = threading.Lock()
+
+# The implementation IDs each cached code object was compiled for, and the other
+# way around, so that `reload` can evict the code objects of an implementation
+# that no other implementation shares
+_code_users: dict[str, set[str]] = {}
+_implementation_keys: dict[str, set[str]] = {}
+
+# The implementation store of each implementations directory
+_stores: dict[str, ImplementationStore] = {}
+
+# Every hotswapped function, with its cache of compiled implementations by ID
+_registry: list[tuple[FunctionType, dict[str, FunctionType | None]]] = []
+
+# The implementation selected for the current thread (see `use_implementation`),
+# and for the whole process (see `activate`). Both take precedence over the
+# environment variable, which is only read when neither is set.
+_context = threading.local()
+_active: str | None = None
+
 class NoImplementationSpecified(Exception):
     pass
 
 def get_relative_path(func: FunctionType, root: str) -> str:
     """Get the file path of the provided function relative to the project root."""
     absolute_path = inspect.getfile(func)
-    relative_path = absolute_path.rsplit(root, 1)[-1].lstrip('/')
+    relative_path = absolute_path.rsplit(str(root), 1)[-1].lstrip('/')
     return relative_path
 
-def get_implementation(func: FunctionType) -> str:
-    """Get the implementation of the function as a string."""
-    filepath = get_relative_path(func, WORKSPACE_ROOT)
-    qualname = func.__qualname__
-    implementation_id = os.environ.get(HOTSWAP_ENVVAR)
+def activate(implementation_id: str | None):
+    """Selects the implementation used by the whole process. None falls back to the environment variable."""
+    global _active
+    _active = implementation_id
+
+@contextmanager
+def use_implementation(implementation_id: str | None) -> Iterator[None]:
+    """Selects the implementation used by the current thread for the duration of the context."""
+    previous = getattr(_context, "implementation_id", None)
+    _context.implementation_id = implementation_id
+
+    try:
+        yield
+    finally:
+        _context.implementation_id = previous
+
+def get_implementation_id() -> str:
+    """Get the ID of the implementation that should currently be used."""
+    implementation_id = (
+        getattr(_context, "implementation_id", None)
+        or _active
+        or os.environ.get(HOTSWAP_ENVVAR)
+    )
 
     if implementation_id == "-1" or implementation_id is None:
         raise NoImplementationSpecified(
-            "Environment variable 'OPENEVOLE_HOTSWAP_IMP' is not set or is set to '-1'. "
+            "No implementation is selected, or it is '-1'. "
             "Using the original function definition instead."
         )
-        
+
+    return implementation_id
+
+def get_implementation(func: FunctionType, implementation_id: str | None = None) -> str:
+    """Get the implementation of the function as a string."""
+    workspace_root = os.environ.get(WORKSPACE_ROOT_ENVVAR) or WORKSPACE_ROOT
+    imps_root = os.environ.get(IMPS_ROOT_ENVVAR) or CONTAINER_IMPS_PATH
+
+    filepath = get_relative_path(func, workspace_root)
+    qualname = func.__qualname__
+
+    if implementation_id is None:
+        implementation_id = get_implementation_id()
+
+    # Implementations are looked up in the store of the implementations
+    # directory first, then in one file per function
+    store = _stores.get(str(imps_root))
+
+    if store is None:
+        store = _stores[str(imps_root)] = ImplementationStore(Path(imps_root))
+
+    implementation = store.get(implementation_id, f"{filepath} {qualname}")
+
+    if implementation is not None:
+        return implementation
+
     imp_name = qualname + " " + implementation_id
-    imp_path = os.path.join(CONTAINER_IMPS_PATH, filepath, imp_name)
+    imp_path = os.path.join(imps_root, filepath, imp_name)
 
     try:
-        return open(imp_path, 'r').read() 
+        return open(imp_path, 'r').read()
     except FileNotFoundError:
         raise NoImplementationSpecified(
             f"No implementation found for function '{func.__name__}'. "
             "Using the original definition."
         )
 
-def hotswap(func: FunctionType):
-    implementation = get_implementation(func)
+def _parameters(func: FunctionType) -> str:
+    """Returns the parameter list of a function, without its defaults and annotations."""
+    signature = inspect.signature(func)
+    parameters = [
+        parameter.replace(default=inspect.Parameter.empty, annotation=inspect.Parameter.empty)
+        for parameter in signature.parameters.values()
+    ]
+    return str(signature.replace(parameters=parameters, return_annotation=inspect.Signature.empty))
+
+def _owner(func: FunctionType) -> str | None:
+    """Returns the name of the class a function is defined in, if any."""
+    *path, _ = func.__qualname__.split(".")
+
+    if not path or path[-1] == "<locals>":
+        return None
+
+    return path[-1]
+
+def _find_code(code: CodeType, name: str) -> CodeType:
+    """Finds the code object of the function called `name` nested in `code`, closest first."""
+    pending = [code]
+
+    while pending:
+        code = pending.pop(0)
+
+        for const in code.co_consts:
+            if isinstance(const, CodeType):
+                if const.co_name == name:
+                    return const
+
+                pending.append(const)
+
+    raise LookupError(f"No function named {name!r} in the compiled implementation.")
+
+def compile_implementation(
+    func: FunctionType,
+    implementation: str,
+    implementation_id: str | None = None,
+) -> FunctionType:
+    """
+    Compiles the body of an implementation into a function that replaces `func`.
+
+    The replacement has the exact signature, defaults, globals and closure of `func`,
+    so that it binds its arguments and resolves its names like the original does.
+    The code object is cached by the hash of its source, so an implementation is
+    only parsed and compiled once per process, unless it is evicted by the
+    `CODE_CACHE_SIZE` most recently used implementations in the meantime. If
+    `implementation_id` is given, `reload(implementation_id)` evicts the code
+    object unless another implementation uses it too.
+    """
+    cells = dict(zip(func.__code__.co_freevars, func.__closure__ or ()))
+    owner = _owner(func)
+
+    # The variables captured by the original are made free variables of the
+    # replacement by declaring them in an enclosing function. A method is also
+    # nested in a class of the same name, so that private names are mangled
+    # and zero-argument super() works like in the original.
+    enclosing = ", ".join(sorted(name for name in cells if name != "__class__"))
+    func_code = f"def __hotswap__({enclosing}):\n"
+    indent = "    "
+
+    if owner is not None:
+        func_code += f"{indent}class {owner}:\n"
+        indent += "    "
 
+    func_code += f"{indent}def {func.__name__}{_parameters(func)}:\n"
+    func_code += textwrap.indent(implementation.strip("\n") or "pass", indent + "    ") + "\n"
+
+    key = hashlib.sha256(func_code.encode()).hexdigest()
+
+    with _code_cache_lock:
+        code = _code_cache.get(key)
+
+        if code is not None:
+            _code_cache.move_to_end(key)
+
+    if code is None:
+        filename = f"<hotswap {func.__qualname__} {key[:12]}>"
+        code = _find_code(compile(func_code, filename, "exec"), func.__name__)
+
+    with _code_cache_lock:
+        if key not in _code_cache:
+            _code_cache[key] = code
+
+            # Register the source so that tracebacks through the implementation show its lines
+            linecache.cache[code.co_filename] = (
+                len(func_code), None, func_code.splitlines(True), code.co_filename
+            )
+
+        if implementation_id is not None:
+            _code_users.setdefault(key, set()).add(implementation_id)
+            _implementation_keys.setdefault(implementation_id, set()).add(key)
+
+        while len(_code_cache) > CODE_CACHE_SIZE:
+            _evict(next(iter(_code_cache)))
+
+    if "__class__" in code.co_freevars and "__class__" not in cells:
+        # The original does not capture its class, so it is looked up by name
+        cls = func.__globals__.get(owner) if owner is not None else None
+        cells["__class__"] = CellType(cls) if isinstance(cls, type) else CellType()
+
+    implementation = FunctionType(
+        code,
+        func.__globals__,
+        func.__name__,
+        func.__defaults__,
+        tuple(cells[name] for name in code.co_freevars),
+    )
+    implementation.__kwdefaults__ = func.__kwdefaults__
+    implementation.__qualname__ = func.__qualname__
+    implementation.__annotations__ = func.__annotations__
+    implementation.__doc__ = func.__doc__
+
+    return implementation
+
+def _evict(key: str):
+    """Drops a compiled implementation and its source from the caches. Called with `_code_cache_lock`."""
+    code = _code_cache.pop(key)
+    linecache.cache.pop(code.co_filename, None)
+
+    for implementation_id in _code_users.pop(key, ()):
+        keys = _implementation_keys[implementation_id]
+        keys.discard(key)
+
+        if not keys:
+            del _implementation_keys[implementation_id]
+
+def resolve(
+    func: FunctionType,
+    implementations: dict[str, FunctionType | None],
+    implementation_id: str,
+) -> FunctionType | None:
+    """Returns the compiled implementation of a function, loading it into its cache on first use."""
+    try:
+        return implementations[implementation_id]
+    except KeyError:
+        pass
+
+    try:
+        source = get_implementation(func, implementation_id)
+        implementation = compile_implementation(func, source, implementation_id)
+    except NoImplementationSpecified:
+        implementation = None
+
+    implementations[implementation_id] = implementation
+    return implementation
+
+def preload(implementation_id: str):
+    """
+    Compiles an implementation of every hotswapped function ahead of its first call.
+
+    Processes forked afterwards inherit the compiled functions, so an implementation
+    is compiled once for a whole batch of runs rather than once per run. Functions
+    whose implementation fails to compile are left to fail when they are called.
+    """
+    for func, implementations in _registry:
+        try:
+            resolve(func, implementations, implementation_id)
+        except Exception:
+            pass
+
+def reload(implementation_id: str | None = None):
+    """
+    Forgets the compiled implementations with the given ID, or all of them, so they are read again on their next call.
+
+    Their code objects and sources are evicted from the caches as well, unless another
+    implementation still uses them.
+    """
+    for _, implementations in _registry:
+        if implementation_id is None:
+            implementations.clear()
+        else:
+            implementations.pop(implementation_id, None)
+
+    with _code_cache_lock:
+        if implementation_id is None:
+            for key in list(_code_cache):
+                _evict(key)
+
+            _code_users.clear()
+            _implementation_keys.clear()
+            return
+
+        for key in _implementation_keys.pop(implementation_id, ()):
+            users = _code_users[key]
+            users.discard(implementation_id)
+
+            if not users:
+                del _code_users[key]
+                _evict(key)
+
+def hotswap(func: FunctionType | classmethod | staticmethod | property):
+    # The implementation is resolved when the function is called rather than
+    # when it is decorated, so that a preloaded interpreter (e.g. the sandbox
+    # worker) can fork and serve a different implementation in every child.
+    # Each implementation is compiled on its first call only (or ahead of time
+    # by `preload`), and later calls dispatch straight to the compiled function.
+
+    # The decorator is normally applied right below @classmethod, @staticmethod
+    # or @property, but descriptors it is applied to are rebuilt around the
+    # hotswapped function just the same.
+    match Decorator.of(func):
+        case Decorator.CLASSMETHOD | Decorator.STATICMETHOD:
+            return type(func)(hotswap(func.__func__))
+        case Decorator.PROPERTY:
+            return func.getter(hotswap(func.fget))
+
+    implementations: dict[str, FunctionType | None] = {}
+    _registry.append((func, implementations))
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        func_code = f"def _dynamic_func(self):\n"
-        for line in implementation.splitlines():
-            func_code += "    " + line + "\n"
-        local_vars = {}
-        exec(func_code, func.__globals__, local_vars)
-        return local_vars["_dynamic_func"](*args, **kwargs)
-
-    wrapper.__name__ = func.__name__
-    wrapper.__qualname__ = func.__qualname__
-    wrapper.__doc__ = func.__doc__
-
-    return wrapper
\ No newline at end of file
+        try:
+            implementation_id = get_implementation_id()
+        except NoImplementationSpecified:
+            return func(*args, **kwargs)
+
+        implementation = resolve(func, implementations, implementation_id)
+
+        if implementation is None:
+            return func(*args, **kwargs)
+
+        return implementation(*args, **kwargs)
+
+    return wrapper
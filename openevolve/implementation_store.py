@@ -0,0 +1,220 @@
+"""
+Append-only pack file of implementations, keyed by (implementation_id, fullname).
+
+The host appends the functions of every candidate to a single file in the
+implementations directory, instead of writing one file per function. Readers,
+such as the hotswapped functions in the sandbox, index the file as it grows
+and read the bodies they need, without ever writing to it, so the directory
+can be mounted read-only.
+
+Each record is a header with the byte lengths of its three fields, followed by
+the UTF-8 encoded implementation ID, fullname and body. The records of a
+candidate are written with a single `write`, so readers only ever see whole
+candidates, or an incomplete record at the end of the file that they skip
+until it is complete.
+
+Evaluated candidates are discarded, and the pack is compacted into a new file
+once enough of it is dead. Readers notice the new file when they next miss in
+their index.
+"""
+from openevolve.custom_types import FullName, HostAbsPath
+
+from collections.abc import Iterable
+
+import threading
+import logging
+import struct
+import os
+
+PACK_FILENAME = "implementations.pack"
+
+# Byte lengths of the implementation ID, fullname and body of a record
+RECORD_HEADER = struct.Struct("<III")
+
+def _encode(implementation_id: str, fullname: FullName, body: str) -> bytes:
+    fields = [implementation_id.encode(), fullname.encode(), body.encode()]
+    return RECORD_HEADER.pack(*map(len, fields)) + b"".join(fields)
+
+class ImplementationStore:
+    """An append-only pack file of implementations, shared by a writer on the host and any number of readers."""
+
+    def __init__(
+        self,
+        root: HostAbsPath,
+        gc_threshold: float = 0.5,
+        gc_min_bytes: int = 1 << 20,
+    ):
+        """
+        Opens the store in a directory. The pack file is only created by the first write.
+
+        Args:
+            root (HostAbsPath): The implementations directory.
+            gc_threshold (float): The fraction of the pack that must be discarded before it is compacted.
+            gc_min_bytes (int): The number of discarded bytes below which the pack is never compacted.
+        """
+        self.path = root / PACK_FILENAME
+        self.gc_threshold = gc_threshold
+        self.gc_min_bytes = gc_min_bytes
+
+        self._lock = threading.Lock()
+
+        # Reader state: where the body of each record is, and how much of the pack is indexed
+        self._fd: int | None = None
+        self._index: dict[tuple[str, FullName], tuple[int, int]] = {}
+        self._indexed = 0
+
+        # Writer state: the size of the records of each candidate, and how much of it is discarded
+        self._sizes: dict[str, int] = {}
+        self._size = 0
+        self._dead = 0
+
+    def put(self, implementation_id: str, bodies: dict[FullName, str]):
+        """
+        Appends the functions of a candidate to the pack.
+
+        Args:
+            implementation_id (str): The ID of the implementation.
+            bodies (dict[FullName, str]): The body of each function, by its full name (relpath + space + qualname).
+        """
+        data = b"".join(
+            _encode(implementation_id, fullname, body)
+            for fullname, body in bodies.items()
+        )
+
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+
+            self._sizes[implementation_id] = self._sizes.get(implementation_id, 0) + len(data)
+            self._size += len(data)
+
+    def get(self, implementation_id: str, fullname: FullName) -> str | None:
+        """
+        Reads the body of a function of a candidate.
+
+        Args:
+            implementation_id (str): The ID of the implementation.
+            fullname (FullName): The full name of the function (relpath + space + qualname).
+
+        Returns:
+            str | None: The body of the function, or None if the candidate does not replace it.
+        """
+        key = (implementation_id, fullname)
+
+        with self._lock:
+            if key not in self._index:
+                self._refresh()
+
+            if key not in self._index:
+                return None
+
+            offset, length = self._index[key]
+            return os.pread(self._fd, length, offset).decode()
+
+    def discard(self, implementation_id: str):
+        """
+        Marks a candidate as evaluated, so that its functions are dropped by the next compaction.
+
+        Args:
+            implementation_id (str): The ID of the implementation.
+        """
+        with self._lock:
+            self._dead += self._sizes.pop(implementation_id, 0)
+
+            if self._dead >= self.gc_min_bytes and self._dead >= self.gc_threshold * self._size:
+                self._compact()
+
+    def gc(self):
+        """Compacts the pack, dropping the functions of every discarded candidate."""
+        with self._lock:
+            self._compact()
+
+    def close(self):
+        """Closes the pack file if it is open for reading."""
+        with self._lock:
+            self._close()
+
+    def _refresh(self):
+        """Indexes the records appended since the last refresh, reopening the pack if it was compacted."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+
+        if self._fd is not None and os.fstat(self._fd).st_ino != stat.st_ino:
+            self._close()
+
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDONLY)
+
+        data = os.pread(self._fd, stat.st_size - self._indexed, self._indexed)
+        position = 0
+
+        while position + RECORD_HEADER.size <= len(data):
+            lengths = RECORD_HEADER.unpack_from(data, position)
+            start = position + RECORD_HEADER.size
+            end = start + sum(lengths)
+
+            # The end of a record that is still being written
+            if end > len(data):
+                break
+
+            id_end = start + lengths[0]
+            name_end = id_end + lengths[1]
+            key = (data[start:id_end].decode(), data[id_end:name_end].decode())
+            self._index[key] = (self._indexed + name_end, lengths[2])
+            position = end
+
+        self._indexed += position
+
+    def _compact(self):
+        """Rewrites the pack with the live candidates only, and atomically replaces it."""
+        if not self.path.exists():
+            return
+
+        live = self._sizes
+        temp_path = self.path.with_suffix(".compact")
+
+        with open(self.path, "rb") as source, open(temp_path, "wb") as target:
+            data = source.read()
+            position = 0
+
+            while position + RECORD_HEADER.size <= len(data):
+                lengths = RECORD_HEADER.unpack_from(data, position)
+                start = position + RECORD_HEADER.size
+                end = start + sum(lengths)
+
+                if data[start:start + lengths[0]].decode() in live:
+                    target.write(data[position:end])
+
+                position = end
+
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, self.path)
+
+        logging.debug(f"Compacted {self.path}, dropping {self._dead} bytes.")
+        self._size -= self._dead
+        self._dead = 0
+
+    def _close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+
+        self._fd = None
+        self._index = {}
+        self._indexed = 0
+
+    def __contains__(self, key: tuple[str, FullName]) -> bool:
+        return self.get(*key) is not None
+
+    def ids(self) -> Iterable[str]:
+        """Returns the IDs of the candidates in the pack."""
+        with self._lock:
+            self._refresh()
+            return {implementation_id for implementation_id, _ in self._index}
@@ -0,0 +1,234 @@
+"""Cheap static checks that reject samples before they reach the sandbox."""
+from openevolve.code_manipulation import Program, structured_output_to_prog_meta
+from openevolve.structured_outputs import ProgramImplementation
+from openevolve.evaluation_cache import program_fingerprint
+from openevolve.custom_types import FullName, FuncMeta, HostAbsPath
+
+from collections.abc import Sequence
+from enum import StrEnum
+
+import collections
+import threading
+import builtins
+import ast
+
+# Names every module has, on top of the builtins
+MODULE_DUNDERS = {
+    "__name__", "__file__", "__doc__", "__package__", "__spec__",
+    "__loader__", "__builtins__", "__cached__", "__annotations__",
+}
+
+class Rejection(StrEnum):
+    """Enum for the reasons a sample is rejected before evaluation."""
+    SYNTAX = "syntax"
+    SIGNATURE = "signature"
+    STUB = "stub"
+    UNDEFINED_NAME = "undefined_name"
+    DUPLICATE = "duplicate"
+    EMPTY = "empty"
+
+def _is_stub(function: ast.FunctionDef | ast.AsyncFunctionDef) -> bool:
+    """Whether a function does nothing but pass, `...`, a docstring or raise NotImplementedError."""
+    for statement in function.body:
+        if isinstance(statement, ast.Pass):
+            continue
+
+        if isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Constant):
+            continue
+
+        if isinstance(statement, ast.Raise) and statement.exc is not None:
+            exc = statement.exc.func if isinstance(statement.exc, ast.Call) else statement.exc
+
+            if isinstance(exc, ast.Name) and exc.id == "NotImplementedError":
+                continue
+
+        return False
+
+    return True
+
+def _bound_names(node: ast.AST) -> set[str]:
+    """Returns every name bound anywhere in a node, including in its nested scopes."""
+    names = set()
+
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and isinstance(child.ctx, (ast.Store, ast.Del)):
+            names.add(child.id)
+        elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(child.name)
+        elif isinstance(child, ast.arg):
+            names.add(child.arg)
+        elif isinstance(child, (ast.Import, ast.ImportFrom)):
+            for alias in child.names:
+                names.add((alias.asname or alias.name).split(".")[0])
+        elif isinstance(child, (ast.Global, ast.Nonlocal)):
+            names.update(child.names)
+        elif isinstance(child, ast.ExceptHandler) and child.name:
+            names.add(child.name)
+        elif isinstance(child, (ast.MatchAs, ast.MatchStar)) and child.name:
+            names.add(child.name)
+        elif isinstance(child, ast.MatchMapping) and child.rest:
+            names.add(child.rest)
+
+    return names
+
+def _module_names(source: str) -> set[str] | None:
+    """Returns the names bound at the top level of a module, or None if they cannot be known statically."""
+    names = set()
+    pending = list(ast.parse(source).body)
+
+    while pending:
+        node = pending.pop()
+
+        if isinstance(node, ast.ImportFrom) and any(alias.name == "*" for alias in node.names):
+            return None
+
+        # The names bound inside functions and classes are not module names, but their own names are
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+            continue
+
+        if isinstance(node, ast.Lambda):
+            continue
+
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+
+        pending.extend(ast.iter_child_nodes(node))
+
+    return names
+
+class Prescreener:
+    """
+    Rejects samples that cannot be worth evaluating, using static checks only:
+    - the sample could be parsed from the LLM response
+    - every function compiles
+    - the functions and their signatures match the program metadata
+    - no function is a stub
+    - no function uses a name that is not defined in it, in its module or in the builtins
+    - the program is not the same, up to formatting and comments, as one of the programs in its prompt
+
+    Repeats of programs from other prompts are left to the evaluation cache.
+    """
+
+    def __init__(self, workspace_root: HostAbsPath, program_meta: dict[FullName, FuncMeta]):
+        """
+        Initializes the prescreener.
+
+        Args:
+            workspace_root (HostAbsPath): The root of the project on the host, used to read the modules of the functions.
+            program_meta (dict[FullName, FuncMeta]): Metadata for the program functions.
+        """
+        self.workspace_root = workspace_root
+        self.program_meta = program_meta
+
+        # Number of samples rejected for each reason, and accepted
+        self.counts: collections.Counter[Rejection] = collections.Counter()
+        self.accepted = 0
+
+        self._module_names: dict[str, set[str] | None] = {}
+        self._lock = threading.Lock()
+
+    def screen(
+        self,
+        implementation: ProgramImplementation | None,
+        parents: Sequence[Program] = (),
+    ) -> Rejection | None:
+        """
+        Checks a sample.
+
+        Args:
+            implementation (ProgramImplementation | None): The sample, or None if the LLM response could not be parsed.
+            parents (Sequence[Program]): The programs in the prompt the sample was drawn from.
+
+        Returns:
+            Rejection | None: Why the sample is rejected, or None if it should be evaluated.
+        """
+        rejection, program = self._check(implementation)
+
+        if rejection is None and parents:
+            fingerprint = program_fingerprint(program)
+
+            if any(program_fingerprint(parent) == fingerprint for parent in parents):
+                rejection = Rejection.DUPLICATE
+
+        with self._lock:
+            if rejection is None:
+                self.accepted += 1
+            else:
+                self.counts[rejection] += 1
+
+        return rejection
+
+    def _check(self, implementation: ProgramImplementation | None) -> tuple[Rejection | None, Program | None]:
+        if implementation is None:
+            return Rejection.EMPTY, None
+
+        trees = []
+
+        for function in implementation.functions:
+            try:
+                tree = ast.parse(function.code)
+                compile(tree, f"<{function.filepath} {function.qualname}>", "exec")
+            except (SyntaxError, ValueError):
+                return Rejection.SYNTAX, None
+
+            definitions = [
+                node for node in tree.body
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+            ]
+
+            if len(definitions) != 1:
+                return Rejection.SIGNATURE, None
+
+            trees.append((function, definitions[0]))
+
+        try:
+            program = structured_output_to_prog_meta(implementation, self.program_meta)
+        except (ValueError, KeyError):
+            return Rejection.SIGNATURE, None
+
+        for function, definition in trees:
+            if _is_stub(definition):
+                return Rejection.STUB, None
+
+            if self._has_undefined_names(function.filepath, function.qualname, definition):
+                return Rejection.UNDEFINED_NAME, None
+
+        return None, program
+
+    def _has_undefined_names(
+        self,
+        filepath: str,
+        qualname: str,
+        definition: ast.FunctionDef | ast.AsyncFunctionDef,
+    ) -> bool:
+        # Nested functions also see the names of their enclosing functions
+        if "<locals>" in qualname:
+            return False
+
+        module_names = self._get_module_names(filepath)
+
+        if module_names is None:
+            return False
+
+        defined = _bound_names(definition) | module_names | MODULE_DUNDERS | set(dir(builtins))
+
+        return any(
+            isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id not in defined
+            for node in ast.walk(definition)
+        )
+
+    def _get_module_names(self, filepath: str) -> set[str] | None:
+        with self._lock:
+            if filepath not in self._module_names:
+                try:
+                    source = (self.workspace_root / filepath).read_text()
+                    self._module_names[filepath] = _module_names(source)
+                except (OSError, SyntaxError):
+                    self._module_names[filepath] = None
+
+            return self._module_names[filepath]
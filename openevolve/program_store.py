@@ -0,0 +1,187 @@
+"""
+Columnar on-disk store of the programs of a database.
+
+A store is a directory with one row per program of an island, in the order
+the programs were added to their clusters:
+- `island.npy`, `program_id.npy`, `score.npy` and `length.npy` hold the island,
+  program ID, reduced score and length of each row.
+- `signature_offsets.npy` and `signature_values.npy` hold the signature of each
+  row, as a ragged column: the values of row i are
+  `signature_values[signature_offsets[i]:signature_offsets[i + 1]]`.
+  `signature_tests.npy` holds the integer test IDs of these values.
+- `code_offsets.npy` and `code.bin` hold the functions of each distinct program
+  as UTF-8 JSON, by program ID, in the same ragged layout. A program that is in
+  several islands or clusters is only stored once.
+- `meta.json` holds everything that is not per program, such as the best
+  program of each island.
+
+The numeric columns are memory-mapped and the code of a program is only
+decoded when it is asked for, so that the population can be analysed without
+reading the code of every program.
+"""
+from openevolve.code_manipulation import Decorator, FuncHeader, Function, Program
+
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import json
+import mmap
+
+FORMAT_VERSION = 3
+META_FILENAME = "meta.json"
+CODE_FILENAME = "code.bin"
+
+def _function_to_dict(function: Function) -> dict[str, Any]:
+    return {
+        "name": function.name,
+        "header": [function.header.name, function.header.args, function.header.return_type],
+        "body": function.body,
+        "path": None if function.path is None else str(function.path),
+        "qualname": function.qualname,
+        "line_no": function.line_no,
+        "decorator": function.decorator.value,
+    }
+
+def _function_from_dict(data: dict[str, Any]) -> Function:
+    name, args, return_type = data["header"]
+    return Function(
+        name=data["name"],
+        header=FuncHeader(name=name, args=args, return_type=return_type),
+        body=data["body"],
+        path=data["path"],
+        qualname=data["qualname"],
+        line_no=data["line_no"],
+        decorator=Decorator(data["decorator"]),
+    )
+
+def encode_program(program: Program) -> bytes:
+    """Encodes the functions of a program, independently of how the classes are laid out in memory."""
+    return json.dumps([_function_to_dict(function) for function in program.functions]).encode()
+
+def decode_program(data: bytes) -> Program:
+    """Decodes a program encoded by `encode_program`."""
+    return Program(functions=[_function_from_dict(function) for function in json.loads(data)])
+
+def _offsets(lengths: list[int]) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+def write_store(
+    directory: Path,
+    programs: Iterable[Program],
+    rows: Sequence[tuple[int, int, tuple[float, ...], tuple[int, ...] | None, float, int]],
+    meta: dict[str, Any],
+):
+    """
+    Writes a store.
+
+    Args:
+        directory (Path): The directory to write the store to. It is created if needed.
+        programs (Iterable[Program]): The distinct programs, whose IDs are their positions.
+        rows (Sequence[tuple[int, int, tuple[float, ...], tuple[int, ...] | None, float, int]]):
+            The island, program ID, signature, test IDs of the signature (by position if
+            None), reduced score and length of each row.
+        meta (dict[str, Any]): JSON-serializable data that is not per program.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+
+    code_lengths = []
+
+    with open(directory / CODE_FILENAME, "wb") as code_file:
+        for program in programs:
+            code = encode_program(program)
+            code_file.write(code)
+            code_lengths.append(len(code))
+
+    islands, program_ids, signatures, tests, scores, lengths = zip(*rows) if rows else ((),) * 6
+
+    np.save(directory / "island.npy", np.array(islands, dtype=np.int32))
+    np.save(directory / "program_id.npy", np.array(program_ids, dtype=np.int64))
+    np.save(directory / "score.npy", np.array(scores, dtype=np.float64))
+    np.save(directory / "length.npy", np.array(lengths, dtype=np.int64))
+    np.save(directory / "signature_offsets.npy", _offsets([len(signature) for signature in signatures]))
+    np.save(
+        directory / "signature_values.npy",
+        np.array([value for signature in signatures for value in signature], dtype=np.float64),
+    )
+    np.save(
+        directory / "signature_tests.npy",
+        np.array([
+            test
+            for signature, signature_tests in zip(signatures, tests)
+            for test in (range(len(signature)) if signature_tests is None else signature_tests)
+        ], dtype=np.int64),
+    )
+    np.save(directory / "code_offsets.npy", _offsets(code_lengths))
+
+    with open(directory / META_FILENAME, "w") as file:
+        json.dump({"format_version": FORMAT_VERSION, **meta}, file)
+
+def is_store(path: Path) -> bool:
+    """Whether a path is a store directory."""
+    return (path / META_FILENAME).is_file()
+
+class ProgramStore:
+    """A store opened for reading, with memory-mapped columns and lazily decoded code."""
+
+    def __init__(self, directory: Path):
+        """
+        Opens a store.
+
+        Args:
+            directory (Path): The store directory.
+        """
+        self.directory = directory
+
+        with open(directory / META_FILENAME) as file:
+            self.meta: dict[str, Any] = json.load(file)
+
+        if self.meta["format_version"] != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported program store format {self.meta['format_version']} in {directory}."
+            )
+
+        self.island: np.ndarray = np.load(directory / "island.npy", mmap_mode="r")
+        self.program_id: np.ndarray = np.load(directory / "program_id.npy", mmap_mode="r")
+        self.score: np.ndarray = np.load(directory / "score.npy", mmap_mode="r")
+        self.length: np.ndarray = np.load(directory / "length.npy", mmap_mode="r")
+        self._signature_offsets = np.load(directory / "signature_offsets.npy", mmap_mode="r")
+        self._signature_values = np.load(directory / "signature_values.npy", mmap_mode="r")
+        self._signature_tests = np.load(directory / "signature_tests.npy", mmap_mode="r")
+        self._code_offsets = np.load(directory / "code_offsets.npy", mmap_mode="r")
+
+        # An empty file cannot be memory-mapped
+        with open(directory / CODE_FILENAME, "rb") as file:
+            self._code = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if self._code_offsets[-1] else b""
+
+    def __len__(self) -> int:
+        """Returns the number of rows."""
+        return len(self.island)
+
+    @property
+    def num_programs(self) -> int:
+        """Returns the number of distinct programs."""
+        return len(self._code_offsets) - 1
+
+    def signature(self, row: int) -> tuple[float, ...]:
+        """Returns the signature of a row."""
+        start, end = self._signature_offsets[row], self._signature_offsets[row + 1]
+        return tuple(self._signature_values[start:end].tolist())
+
+    def signature_tests(self, row: int) -> tuple[int, ...]:
+        """Returns the test IDs of the signature of a row."""
+        start, end = self._signature_offsets[row], self._signature_offsets[row + 1]
+        return tuple(self._signature_tests[start:end].tolist())
+
+    def program(self, program_id: int) -> Program:
+        """Reads and decodes the code of a program."""
+        start, end = self._code_offsets[program_id], self._code_offsets[program_id + 1]
+        return decode_program(self._code[start:end])
+
+    def close(self):
+        """Closes the memory-mapped code."""
+        if isinstance(self._code, mmap.mmap):
+            self._code.close()
@@ -15,11 +15,14 @@
 
 """A programs database that implements the evolutionary algorithm."""
 
+import collections
+import dataclasses
+import enum
+import hashlib
 import pathlib
 import pickle
 from collections.abc import Mapping, Sequence
-import copy
-import dataclasses
+import threading
 import time
 from typing import Any, Iterable, Tuple
 
@@ -27,7 +30,9 @@ from absl import logging
 import numpy as np
 import scipy
 
+from openevolve import checkpoint
 from openevolve import code_manipulation
+from openevolve import program_store
 from openevolve import config as config_lib
 from openevolve.project_indexer import ProjectIndexer
 
@@ -35,6 +40,41 @@ Signature = tuple[float, ...]
 ScoresPerTest = Mapping[Any, float]
 
 
+class EvictionPolicy(enum.StrEnum):
+    """Which program leaves a full cluster, or which cluster leaves a full island."""
+
+    LONGEST = "longest"
+    OLDEST = "oldest"
+    LOWEST_NOVELTY = "lowest_novelty"
+    RESERVOIR = "reservoir"
+
+
+# Policies that apply to the programs of a cluster, which all share a
+# signature, and to the clusters of an island, which have no length.
+PROGRAM_EVICTION_POLICIES = (
+    EvictionPolicy.LONGEST, EvictionPolicy.OLDEST, EvictionPolicy.RESERVOIR
+)
+CLUSTER_EVICTION_POLICIES = (
+    EvictionPolicy.OLDEST, EvictionPolicy.LOWEST_NOVELTY, EvictionPolicy.RESERVOIR
+)
+
+# Number of steps the cluster sampling temperature decays in over a period. The
+# temperature only changes once per step, so that the sampling probabilities
+# computed at one temperature are reused for the registrations in between.
+TEMPERATURE_STEPS = 100
+
+
+def _eviction_policy(
+    value: str, supported: Sequence[EvictionPolicy], name: str
+) -> EvictionPolicy:
+    """Parses an eviction policy of the config."""
+    if value not in supported:
+        raise ValueError(
+            f"Unsupported {name} {value!r}, expected one of {[str(policy) for policy in supported]}."
+        )
+    return EvictionPolicy(value)
+
+
 def _softmax(logits: np.ndarray, temperature: float) -> np.ndarray:
     """Returns the tempered softmax of 1D finite `logits`."""
     if not np.all(np.isfinite(logits)):
@@ -60,6 +100,11 @@ def _get_signature(scores_per_test: ScoresPerTest) -> Signature:
     return tuple(scores_per_test[k] for k in sorted(scores_per_test.keys()))
 
 
+def _get_tests(scores_per_test: ScoresPerTest) -> tuple[Any, ...]:
+    """Returns the tests of the scores of `_get_signature`, in the same order."""
+    return tuple(sorted(scores_per_test.keys()))
+
+
 # TODO: FIX
 @dataclasses.dataclass(frozen=True)
 class Prompt:
@@ -71,15 +116,25 @@ class Prompt:
       island_id: Identifier of the island that produced the implementations
          included in the prompt. Used to direct the newly generated implementation
          into the same island.
+      parents: The implementations included in the prompt. Samples that repeat
+         one of them are not worth evaluating.
     """
 
     code: str
     version_generated: int
     island_id: int
+    parents: tuple[code_manipulation.Program, ...] = ()
 
 
 class ProgramsDatabase:
-    """A collection of programs, organized as islands."""
+    """A collection of programs, organized as islands.
+
+    Samplers and evaluators use the database from several threads. Each island,
+    along with its best program and score, is guarded by its own lock, so that
+    reads and writes on one island never wait for another island. Counters
+    shared by all islands are guarded by a separate lock, which is never held
+    while waiting for an island.
+    """
 
     def __init__(
         self,
@@ -92,23 +147,37 @@ class ProgramsDatabase:
 
         self._last_reset_time: float = time.time()
         self._program_counter = 0
-        self._backups_done = 0
         self.identifier = identifier
 
         self._file_hierarchy = ProjectIndexer.get_tree_description(self._template)
 
+        for name in ("max_programs_per_cluster", "max_clusters_per_island"):
+            capacity = getattr(config, name)
+            if capacity is not None and capacity < 1:
+                raise ValueError(f"`{name}` must be at least 1, got {capacity}.")
+        self._program_eviction_policy = _eviction_policy(
+            config.program_eviction_policy, PROGRAM_EVICTION_POLICIES, "program_eviction_policy"
+        )
+        self._cluster_eviction_policy = _eviction_policy(
+            config.cluster_eviction_policy, CLUSTER_EVICTION_POLICIES, "cluster_eviction_policy"
+        )
+
+        # Programs of every island, interned by content.
+        self._program_table = ProgramTable()
+
         # Initialize empty islands.
-        self._islands: list[Island] = []
-        for _ in range(config.num_islands):
-            self._islands.append(
-                Island(
-                    template,
-                    self._file_hierarchy,
-                    config.functions_per_prompt,
-                    config.cluster_sampling_temperature_init,
-                    config.cluster_sampling_temperature_period,
-                )
-            )
+        self._islands: list[Island] = [
+            self._new_island() for _ in range(config.num_islands)
+        ]
+        self._island_locks: list[threading.Lock] = [
+            threading.Lock() for _ in range(config.num_islands)
+        ]
+        # Number of changes made to each island, which orders the checkpoint events.
+        self._island_versions: list[int] = [0] * config.num_islands
+        # Guards the reset and backup counters.
+        self._lock = threading.Lock()
+        # Held while islands are being reset, so that resets do not overlap.
+        self._reset_lock = threading.Lock()
         self._best_score_per_island: list[float] = [-float("inf")] * config.num_islands
         self._best_program_per_island: list[code_manipulation.Program | None] = [
             None
@@ -117,6 +186,11 @@ class ProgramsDatabase:
             None
         ] * config.num_islands
 
+        self._checkpointer = checkpoint.Checkpointer(
+            pathlib.Path(config.backup_folder) / f"program_db_{identifier}",
+            self._snapshot,
+        )
+
     def get_best_programs_per_island(
         self,
     ) -> Iterable[Tuple[code_manipulation.Program | None]]:
@@ -126,51 +200,209 @@ class ProgramsDatabase:
             reverse=True,
         )
 
-    def save(self, file):
-        """Save database to a file"""
-        data = {}
-        keys = [
-            "_islands",
-            "_best_score_per_island",
-            "_best_program_per_island",
-            "_best_scores_per_test_per_island",
-        ]
-        for key in keys:
-            data[key] = getattr(self, key)
-        pickle.dump(data, file)
+    def get_eviction_counts(self) -> collections.Counter:
+        """Returns the number of programs and clusters evicted from the islands so far."""
+        counts = collections.Counter()
+        for island_id, lock in enumerate(self._island_locks):
+            with lock:
+                counts.update(self._islands[island_id].evictions)
+        return counts
+
+    def get_best_scores_per_test(self, island_id: int) -> ScoresPerTest | None:
+        """Returns the scores per test of the best program of an island, if it has any."""
+        return self._best_scores_per_test_per_island[island_id]
+
+    def _new_island(self) -> "Island":
+        return Island(
+            self._template,
+            self._file_hierarchy,
+            self._config.functions_per_prompt,
+            self._config.cluster_sampling_temperature_init,
+            self._config.cluster_sampling_temperature_period,
+            self._program_table,
+            self._config.max_programs_per_cluster,
+            self._program_eviction_policy,
+            self._config.max_clusters_per_island,
+            self._cluster_eviction_policy,
+        )
+
+    def _snapshot(self, directory: pathlib.Path) -> None:
+        """Writes the database to a program store.
+
+        Islands are read one at a time, so the others keep running meanwhile.
+        Programs are not modified once registered, so they are written outside
+        of the locks.
+        """
+        islands = []
+        for island_id, lock in enumerate(self._island_locks):
+            with lock:
+                islands.append((
+                    list(self._islands[island_id].rows()),
+                    self._islands[island_id]._num_programs,
+                    self._island_versions[island_id],
+                    self._best_program_per_island[island_id],
+                    self._best_score_per_island[island_id],
+                    self._best_scores_per_test_per_island[island_id],
+                ))
+
+        # Interned programs are shared by islands and clusters, so they are written once.
+        programs = []
+        program_ids = {}
+
+        def program_id(program):
+            if id(program) not in program_ids:
+                program_ids[id(program)] = len(programs)
+                programs.append(program)
+            return program_ids[id(program)]
 
-    def load(self, file):
-        """Load previously saved database"""
-        data = pickle.load(file)
-        for key in data.keys():
-            setattr(self, key, data[key])
+        rows = []
+        best = []
+        for island_id, (island_rows, num_programs, version, best_program, best_score, best_scores) in enumerate(islands):
+            for signature, tests, score, length, program in island_rows:
+                rows.append((island_id, program_id(program), signature, tests, score, length))
+            best.append({
+                "program_id": None if best_program is None else program_id(best_program),
+                "score": best_score,
+                "scores_per_test": None if best_scores is None else list(best_scores.items()),
+                "num_programs": num_programs,
+                "version": version,
+            })
+
+        program_store.write_store(directory, programs, rows, {"islands": best})
+
+    def save(self, path):
+        """Save database to a program store directory"""
+        self._snapshot(pathlib.Path(path))
+
+    def load(self, path):
+        """Load a previously saved database.
+
+        Args:
+          path: A program store directory written by `save`, a checkpoint
+            directory, whose last snapshot is loaded and whose event log is
+            replayed, or a file pickled by earlier versions of `save`.
+        """
+        path = pathlib.Path(path)
+        events = iter(())
+        if program_store.is_store(path):
+            self._load_store(path)
+        elif path.is_dir():
+            snapshot, events = checkpoint.read_checkpoint(path)
+            if snapshot is not None:
+                self._load_store(snapshot)
+        else:
+            with open(path, "rb") as f:
+                data = pickle.load(f)
+            for key in data.keys():
+                setattr(self, key, data[key])
+            self._island_versions = [0] * len(self._islands)
+        self._island_locks = [threading.Lock() for _ in self._islands]
+
+        for island_id, version, kind, *payload in events:
+            # The snapshot already includes the older events of the island
+            if version <= self._island_versions[island_id]:
+                continue
+            if kind == "register":
+                self._add_to_island(island_id, *payload)
+            elif kind == "reset":
+                self._replace_island(island_id, *payload)
+            self._island_versions[island_id] = version
+
+        # The checkpoint of this database starts from the loaded state.
+        self._checkpointer.snapshot()
+
+    def _load_store(self, directory: pathlib.Path) -> None:
+        store = program_store.ProgramStore(directory)
+        try:
+            islands_meta = store.meta["islands"]
+            self._program_table = ProgramTable()
+            islands = [self._new_island() for _ in islands_meta]
+            # Each program is decoded once, however many islands and clusters hold it.
+            programs = {}
+
+            def program(program_id):
+                if program_id not in programs:
+                    programs[program_id] = store.program(program_id)
+                return programs[program_id]
+
+            for row in range(len(store)):
+                islands[int(store.island[row])]._register(
+                    store.signature(row),
+                    float(store.score[row]),
+                    program(int(store.program_id[row])),
+                    int(store.length[row]),
+                    store.signature_tests(row),
+                )
+            best_programs = [
+                None if meta["program_id"] is None else program(meta["program_id"])
+                for meta in islands_meta
+            ]
+        finally:
+            store.close()
+
+        for island, meta in zip(islands, islands_meta):
+            island._num_programs = meta["num_programs"]
+        self._islands = islands
+        self._island_versions = [meta["version"] for meta in islands_meta]
+        self._best_score_per_island = [meta["score"] for meta in islands_meta]
+        self._best_program_per_island = best_programs
+        self._best_scores_per_test_per_island = [
+            None if meta["scores_per_test"] is None else dict(meta["scores_per_test"])
+            for meta in islands_meta
+        ]
 
     def backup(self):
-        filename = f"program_db_{self.identifier}_{self._backups_done}.pickle"
-        p = pathlib.Path(self._config.backup_folder)
-        if not p.exists():
-            p.mkdir(parents=True, exist_ok=True)
-        filepath = p / filename
-        logging.info(f"Saving backup to {filepath}.")
+        """Saves a snapshot of the database, and waits until it is written.
 
-        with open(filepath, mode="wb") as f:
-            self.save(f)
-        self._backups_done += 1
+        Raises:
+          RuntimeError: If the snapshot could not be written. The changes since
+            the last snapshot are still in the event log.
+        """
+        logging.info(f"Saving backup to {self._checkpointer.directory}.")
+        evictions = self.get_eviction_counts()
+        if evictions:
+            logging.info(f"Evictions: {dict(evictions)}")
+        self._checkpointer.snapshot(wait=True)
+
+    def close(self):
+        """Writes the pending checkpoint events."""
+        self._checkpointer.close()
+
+    def _log(self, island_id: int, kind: str, *payload: Any) -> None:
+        """Appends a change of an island to the checkpoint. Called with the lock of the island."""
+        self._island_versions[island_id] += 1
+        self._checkpointer.append(
+            (island_id, self._island_versions[island_id], kind, *payload)
+        )
 
     def get_prompt(self) -> Prompt:
         """Returns a prompt containing implementations from one chosen island."""
         island_id = np.random.randint(len(self._islands))
-        code, version_generated = self._islands[island_id].get_prompt()
-        return Prompt(code, version_generated, island_id)
+        with self._island_locks[island_id]:
+            code, version_generated, parents = self._islands[island_id].get_prompt()
+        return Prompt(code, version_generated, island_id, tuple(parents))
 
     def _register_program_in_island(
         self,
         program: code_manipulation.Program,
         island_id: int,
         scores_per_test: ScoresPerTest,
+        length: int | None = None,
     ) -> None:
         """Registers `program` in the specified island."""
-        self._islands[island_id].register_program(program, scores_per_test)
+        with self._island_locks[island_id]:
+            self._add_to_island(island_id, program, scores_per_test, length)
+            self._log(island_id, "register", program, scores_per_test, length)
+
+    def _add_to_island(
+        self,
+        island_id: int,
+        program: code_manipulation.Program,
+        scores_per_test: ScoresPerTest,
+        length: int | None = None,
+    ) -> None:
+        """Adds `program` to an island. Called with the lock of the island."""
+        self._islands[island_id].register_program(program, scores_per_test, length)
         score = _reduce_score(scores_per_test)
         if score > self._best_score_per_island[island_id]:
             self._best_program_per_island[island_id] = program
@@ -188,48 +420,284 @@ class ProgramsDatabase:
         # In an asynchronous implementation we should consider the possibility of
         # registering a program on an island that had been reset after the prompt
         # was generated. Leaving that out here for simplicity.
+        # Rendering a program is expensive, so its length is only computed once.
+        length = len(str(program))
         if island_id is None:
             # This is a program added at the beginning, so adding it to all islands.
             for island_id in range(len(self._islands)):
-                self._register_program_in_island(program, island_id, scores_per_test)
+                self._register_program_in_island(program, island_id, scores_per_test, length)
         else:
-            self._register_program_in_island(program, island_id, scores_per_test)
+            self._register_program_in_island(program, island_id, scores_per_test, length)
 
-        # Check whether it is time to reset an island.
-        if time.time() - self._last_reset_time > self._config.reset_period:
-            self._last_reset_time = time.time()
-            self.reset_islands()
+        # Check whether it is time to reset an island, or to back up. Only the
+        # thread that claims either does it, while the others carry on.
+        reset = backup = False
+        with self._lock:
+            if time.time() - self._last_reset_time > self._config.reset_period:
+                self._last_reset_time = time.time()
+                reset = True
 
-        # Backup every N iterations
-        if self._program_counter > 0:
+            # Snapshot every N registrations, in the background
             self._program_counter += 1
-            if self._program_counter > self._config.backup_period:
+            if self._program_counter >= self._config.backup_period:
                 self._program_counter = 0
-                self.backup()
+                backup = True
+
+        if reset:
+            self.reset_islands()
+        if backup:
+            self._checkpointer.snapshot()
 
     def reset_islands(self) -> None:
-        """Resets the weaker half of islands."""
-        # We sort best scores after adding minor noise to break ties.
-        indices_sorted_by_score: np.ndarray = np.argsort(
-            self._best_score_per_island
-            + np.random.randn(len(self._best_score_per_island)) * 1e-6
-        )
-        num_islands_to_reset = self._config.num_islands // 2
-        reset_islands_ids = indices_sorted_by_score[:num_islands_to_reset]
-        keep_islands_ids = indices_sorted_by_score[num_islands_to_reset:]
-        for island_id in reset_islands_ids:
-            self._islands[island_id] = Island(
-                self._template,
-                self._file_hierarchy,
-                self._config.functions_per_prompt,
-                self._config.cluster_sampling_temperature_init,
-                self._config.cluster_sampling_temperature_period,
+        """Resets the weaker half of islands.
+
+        Islands are replaced one at a time, each holding only its own lock and
+        briefly the lock of its founder's island, so the other islands keep
+        serving prompts and registrations meanwhile.
+        """
+        if not self._reset_lock.acquire(blocking=False):
+            # Another thread is already resetting the islands.
+            return
+
+        try:
+            # We sort best scores after adding minor noise to break ties.
+            indices_sorted_by_score: np.ndarray = np.argsort(
+                list(self._best_score_per_island)
+                + np.random.randn(len(self._best_score_per_island)) * 1e-6
             )
-            self._best_score_per_island[island_id] = -float("inf")
-            founder_island_id = np.random.choice(keep_islands_ids)
-            founder = self._best_program_per_island[founder_island_id]
-            founder_scores = self._best_scores_per_test_per_island[founder_island_id]
-            self._register_program_in_island(founder, island_id, founder_scores)
+            num_islands_to_reset = self._config.num_islands // 2
+            reset_islands_ids = indices_sorted_by_score[:num_islands_to_reset]
+            keep_islands_ids = indices_sorted_by_score[num_islands_to_reset:]
+            for island_id in reset_islands_ids:
+                founder_island_id = np.random.choice(keep_islands_ids)
+                with self._island_locks[founder_island_id]:
+                    founder = self._best_program_per_island[founder_island_id]
+                    founder_scores = self._best_scores_per_test_per_island[founder_island_id]
+
+                # The new island is seeded before it is published.
+                island = self._new_island()
+                island.register_program(founder, founder_scores)
+                with self._island_locks[island_id]:
+                    self._replace_island(island_id, founder, founder_scores, island)
+                    self._log(island_id, "reset", founder, founder_scores)
+        finally:
+            self._reset_lock.release()
+
+    def _replace_island(
+        self,
+        island_id: int,
+        founder: code_manipulation.Program,
+        founder_scores: ScoresPerTest,
+        island: "Island | None" = None,
+    ) -> None:
+        """Replaces an island with a new one seeded with `founder`. Called with the lock of the island."""
+        if island is None:
+            island = self._new_island()
+            island.register_program(founder, founder_scores)
+        self._islands[island_id].release()
+        # The eviction counts cover the whole run, not only the current island.
+        island.evictions.update(self._islands[island_id].evictions)
+        self._islands[island_id] = island
+        self._best_program_per_island[island_id] = founder
+        self._best_scores_per_test_per_island[island_id] = founder_scores
+        self._best_score_per_island[island_id] = _reduce_score(founder_scores)
+
+
+class ProgramTable:
+    """Programs interned by content, shared by the islands of a database.
+
+    Islands and clusters hold the integer IDs of their programs, so that a
+    program registered in several islands, or sampled several times by the
+    LLM, is only kept in memory once. Programs are reference-counted, and are
+    dropped once no cluster holds them anymore.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._programs: dict[int, code_manipulation.Program] = {}
+        self._lengths: dict[int, int] = {}
+        self._refcounts: dict[int, int] = {}
+        # ID of each program by the hash of its content, and by the identity of
+        # the interned object, which saves hashing it when it is registered again.
+        self._ids_by_digest: dict[bytes, int] = {}
+        self._digests: dict[int, bytes] = {}
+        self._ids_by_object: dict[int, int] = {}
+
+    def intern(
+        self,
+        program: code_manipulation.Program,
+        length: int | None = None,
+    ) -> int:
+        """Returns the ID of `program`, adding it if no equal program is held, and takes a reference to it."""
+        with self._lock:
+            program_id = self._ids_by_object.get(id(program))
+            if program_id is not None:
+                self._refcounts[program_id] += 1
+                return program_id
+
+        # Encoding and hashing the program is the slow part, so it runs without
+        # the lock. Another thread may intern an equal program in the meantime,
+        # which the lookup by digest below accounts for.
+        digest = hashlib.sha256(program_store.encode_program(program)).digest()
+        if length is None:
+            length = len(str(program))
+
+        with self._lock:
+            program_id = self._ids_by_digest.get(digest)
+            if program_id is None:
+                program_id = self._next_id
+                self._next_id += 1
+                self._programs[program_id] = program
+                self._lengths[program_id] = length
+                self._refcounts[program_id] = 0
+                self._ids_by_digest[digest] = program_id
+                self._digests[program_id] = digest
+                self._ids_by_object[id(program)] = program_id
+            self._refcounts[program_id] += 1
+            return program_id
+
+    def release(self, program_ids: Iterable[int]) -> None:
+        """Drops a reference to each of `program_ids`, and the programs that are not referenced anymore."""
+        with self._lock:
+            for program_id in program_ids:
+                self._refcounts[program_id] -= 1
+                if self._refcounts[program_id] == 0:
+                    program = self._programs.pop(program_id)
+                    del self._ids_by_object[id(program)]
+                    del self._ids_by_digest[self._digests.pop(program_id)]
+                    del self._lengths[program_id]
+                    del self._refcounts[program_id]
+
+    def get(self, program_id: int) -> code_manipulation.Program:
+        """Returns the program with ID `program_id`."""
+        return self._programs[program_id]
+
+    def length(self, program_id: int) -> int:
+        """Returns the length of the program with ID `program_id`."""
+        return self._lengths[program_id]
+
+    def __len__(self) -> int:
+        return len(self._programs)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_lock"]
+        # Object identities do not survive pickling
+        del state["_ids_by_object"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._ids_by_object = {
+            id(program): program_id for program_id, program in self._programs.items()
+        }
+
+
+class NoveltyIndex:
+    """Distance from the signature of each cluster of an island to the nearest other one.
+
+    Signatures are compared test by test. Programs leave out the tests they
+    fail, so two signatures may not have the same tests. A test that only one
+    of them has sets them further apart than any difference of scores: the
+    distance is the pair (number of such tests, L1 distance over the tests
+    both have), compared lexicographically.
+
+    The nearest neighbour of every cluster is updated as clusters are added
+    and removed, comparing one signature to all the others, instead of
+    comparing all pairs.
+    """
+
+    # Number of clusters the arrays start with room for
+    _INITIAL_CAPACITY = 8
+    # Number of tests that differ from a cluster without any neighbour
+    _NO_NEIGHBOUR = np.iinfo(np.int64).max
+
+    def __init__(self) -> None:
+        # Column of each test in the matrix of scores, in which missing tests are NaN
+        self._columns: dict[Any, int] = {}
+        self._size = 0
+        self._values: np.ndarray = np.full((self._INITIAL_CAPACITY, 0), np.nan)
+        self._mismatches: np.ndarray = np.empty(self._INITIAL_CAPACITY, dtype=np.int64)
+        self._distances: np.ndarray = np.empty(self._INITIAL_CAPACITY, dtype=np.float64)
+        self._nearest: np.ndarray = np.empty(self._INITIAL_CAPACITY, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, scores_per_test: ScoresPerTest) -> None:
+        """Adds the signature of a new cluster, after the existing ones."""
+        new_tests = [test for test in scores_per_test if test not in self._columns]
+        for test in new_tests:
+            self._columns[test] = len(self._columns)
+        if new_tests:
+            self._values = np.pad(
+                self._values, ((0, 0), (0, len(new_tests))), constant_values=np.nan
+            )
+
+        index = self._size
+        if index == len(self._values):
+            self._values = np.vstack([self._values, np.full_like(self._values, np.nan)])
+            self._mismatches = np.resize(self._mismatches, 2 * index)
+            self._distances = np.resize(self._distances, 2 * index)
+            self._nearest = np.resize(self._nearest, 2 * index)
+        self._values[index] = np.nan
+        for test, score in scores_per_test.items():
+            self._values[index, self._columns[test]] = score
+        self._size += 1
+
+        mismatches, distances = self._distances_from(index)
+        # The new cluster may be closer to the others than their nearest neighbours.
+        closer = (mismatches[:index] < self._mismatches[:index]) | (
+            (mismatches[:index] == self._mismatches[:index])
+            & (distances[:index] < self._distances[:index])
+        )
+        self._mismatches[:index][closer] = mismatches[:index][closer]
+        self._distances[:index][closer] = distances[:index][closer]
+        self._nearest[:index][closer] = index
+        self._set_nearest(index, mismatches, distances)
+
+    def remove(self, index: int) -> None:
+        """Removes the signature of the cluster at `index`, shifting the ones after it."""
+        size = self._size - 1
+        for array in (self._values, self._mismatches, self._distances, self._nearest):
+            array[index:size] = array[index + 1 : size + 1]
+        self._size = size
+
+        nearest = self._nearest[:size]
+        orphans = np.flatnonzero(nearest == index)
+        nearest[nearest > index] -= 1
+        # Only the clusters whose nearest neighbour was removed are compared again.
+        for orphan in orphans:
+            self._set_nearest(orphan, *self._distances_from(orphan))
+
+    def least_novel(self, scores: np.ndarray, exclude: int) -> int:
+        """Returns the index of the cluster closest to another, the worst of them on ties, other than `exclude`."""
+        mismatches = self._mismatches[: self._size].copy()
+        distances = self._distances[: self._size].copy()
+        mismatches[exclude] = self._NO_NEIGHBOUR
+        distances[exclude] = np.inf
+        return int(np.lexsort((scores[: self._size], distances, mismatches))[0])
+
+    def _distances_from(self, index: int) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the distances from a cluster to every cluster, with itself at no neighbour's distance."""
+        values = self._values[: self._size, : len(self._columns)]
+        row = values[index]
+        present = ~np.isnan(values)
+        row_present = ~np.isnan(row)
+        mismatches = (present != row_present).sum(axis=1)
+        shared = present & row_present
+        distances = np.where(shared, np.abs(values - row), 0.0).sum(axis=1)
+        mismatches[index] = self._NO_NEIGHBOUR
+        distances[index] = np.inf
+        return mismatches, distances
+
+    def _set_nearest(self, index: int, mismatches: np.ndarray, distances: np.ndarray) -> None:
+        nearest = int(np.lexsort((distances, mismatches))[0])
+        self._mismatches[index] = mismatches[nearest]
+        self._distances[index] = distances[nearest]
+        self._nearest[index] = nearest if nearest != index else -1
 
 
 class Island:
@@ -242,8 +710,23 @@ class Island:
         functions_per_prompt: int,
         cluster_sampling_temperature_init: float,
         cluster_sampling_temperature_period: int,
+        program_table: ProgramTable | None = None,
+        max_programs_per_cluster: int | None = None,
+        program_eviction_policy: EvictionPolicy = EvictionPolicy.LONGEST,
+        max_clusters: int | None = None,
+        cluster_eviction_policy: EvictionPolicy = EvictionPolicy.LOWEST_NOVELTY,
     ) -> None:
         self._template: code_manipulation.Program = template
+        # Where the programs of the clusters are interned.
+        self._program_table = program_table if program_table is not None else ProgramTable()
+        self._max_programs_per_cluster = max_programs_per_cluster
+        self._program_eviction_policy = program_eviction_policy
+        self._max_clusters = max_clusters
+        self._cluster_eviction_policy = cluster_eviction_policy
+        # Number of programs and clusters evicted to stay within the limits.
+        self.evictions: collections.Counter = collections.Counter()
+        # Number of clusters ever created, which reservoir sampling of the clusters needs.
+        self._num_clusters_created = 0
         self._file_hierarchy = file_hierarchy
         self._functions_per_prompt: int = functions_per_prompt
         self._cluster_sampling_temperature_init = cluster_sampling_temperature_init
@@ -251,100 +734,340 @@ class Island:
 
         self._clusters: dict[Signature, Cluster] = {}
         self._num_programs: int = 0
+        self._init_sampling()
+        self._init_novelty()
+
+    def _init_sampling(self) -> None:
+        """Indexes the clusters for sampling, in the order they were created."""
+        self._signatures: list[Signature] = list(self._clusters.keys())
+        self._scores: np.ndarray = np.empty(
+            max(len(self._signatures), Cluster._INITIAL_CAPACITY), dtype=np.float64
+        )
+        self._scores[: len(self._signatures)] = [
+            self._clusters[signature].score for signature in self._signatures
+        ]
+        # Cumulative cluster sampling probabilities, and the temperature they were
+        # computed at. They are recomputed when a cluster is added or removed, or the
+        # temperature moves on to its next step.
+        self._cumulative_probabilities: np.ndarray | None = None
+        self._probabilities_temperature: float | None = None
+
+    def _init_novelty(self) -> None:
+        """Indexes the signatures of the clusters, if the least novel one is evicted from a full island."""
+        self._novelty: NoveltyIndex | None = None
+        if (
+            self._max_clusters is not None
+            and self._cluster_eviction_policy == EvictionPolicy.LOWEST_NOVELTY
+        ):
+            self._novelty = NoveltyIndex()
+            for signature in self._signatures:
+                self._novelty.add(self._clusters[signature].scores_per_test(signature))
 
     def register_program(
         self,
         program: code_manipulation.Program,
         scores_per_test: ScoresPerTest,
+        length: int | None = None,
     ) -> None:
         """Stores a program on this island, in its appropriate cluster."""
-        signature = _get_signature(scores_per_test)
+        self._register(
+            _get_signature(scores_per_test),
+            _reduce_score(scores_per_test),
+            program,
+            length,
+            _get_tests(scores_per_test),
+        )
+
+    def _register(
+        self,
+        signature: Signature,
+        score: float,
+        program: code_manipulation.Program,
+        length: int | None = None,
+        tests: tuple[Any, ...] | None = None,
+    ) -> None:
+        """Stores a program in the cluster of `signature`, creating it with `score` and `tests` if needed."""
+        program_id = self._program_table.intern(program, length)
+        length = self._program_table.length(program_id)
         if signature not in self._clusters:
-            score = _reduce_score(scores_per_test)
-            self._clusters[signature] = Cluster(score, program)
+            cluster = Cluster(score, program_id, length, tests)
+            self._clusters[signature] = cluster
+            num_clusters = len(self._signatures)
+            if num_clusters == len(self._scores):
+                self._scores = np.resize(self._scores, 2 * num_clusters)
+            self._scores[num_clusters] = score
+            self._signatures.append(signature)
+            self._cumulative_probabilities = None
+            self._num_clusters_created += 1
+            if self._novelty is not None:
+                self._novelty.add(cluster.scores_per_test(signature))
+            if self._max_clusters is not None and len(self._signatures) > self._max_clusters:
+                self._remove_cluster(self._choose_cluster_to_evict())
         else:
-            self._clusters[signature].register_program(program)
+            evicted = self._clusters[signature].register_program(
+                program_id,
+                length,
+                self._max_programs_per_cluster,
+                self._program_eviction_policy,
+            )
+            if evicted is not None:
+                self._program_table.release([evicted])
+                self.evictions["programs"] += 1
         self._num_programs += 1
 
-    def get_prompt(self) -> tuple[str, int]:
-        """Constructs a prompt containing functions from this island."""
-        signatures = list(self._clusters.keys())
-        cluster_scores = np.array(
-            [self._clusters[signature].score for signature in signatures]
-        )
+    def _choose_cluster_to_evict(self) -> int:
+        """Returns the index of the cluster to evict from a full island, which is never the best one."""
+        num_clusters = len(self._signatures)
+        scores = self._scores[:num_clusters]
+        best = int(np.argmax(scores))
+
+        if self._cluster_eviction_policy == EvictionPolicy.OLDEST:
+            return 0 if best != 0 else 1
+
+        if self._cluster_eviction_policy == EvictionPolicy.LOWEST_NOVELTY:
+            return self._novelty.least_novel(scores, best)
+
+        # Reservoir sampling: the new cluster is kept with probability
+        # `max_clusters / clusters created`, in place of a random one.
+        new = num_clusters - 1
+        if np.random.randint(self._num_clusters_created) >= self._max_clusters and best != new:
+            return new
+        index = np.random.randint(num_clusters - 1)
+        return index + 1 if index >= best else index
+
+    def _remove_cluster(self, index: int) -> None:
+        """Removes the cluster at `index` of the sampling index, and releases its programs."""
+        signature = self._signatures.pop(index)
+        num_clusters = len(self._signatures)
+        self._scores[index:num_clusters] = self._scores[index + 1 : num_clusters + 1]
+        self._cumulative_probabilities = None
+        if self._novelty is not None:
+            self._novelty.remove(index)
+
+        cluster = self._clusters.pop(signature)
+        self._program_table.release(program_id for program_id, _ in cluster)
+        self.evictions["clusters"] += 1
+        self.evictions["programs"] += len(cluster)
+
+    def rows(
+        self,
+    ) -> Iterable[tuple[Signature, tuple[Any, ...] | None, float, int, code_manipulation.Program]]:
+        """Yields the signature, its tests, the cluster score, length and program of every program, in insertion order."""
+        for signature in self._signatures:
+            cluster = self._clusters[signature]
+            for program_id, length in cluster:
+                yield signature, cluster.tests, cluster.score, length, self._program_table.get(program_id)
+
+    def release(self) -> None:
+        """Releases the programs of this island from the program table, once the island is discarded."""
+        for cluster in self._clusters.values():
+            self._program_table.release(program_id for program_id, _ in cluster)
+
+    def get_prompt(self) -> tuple[str, int, list[code_manipulation.Program]]:
+        """Constructs a prompt containing functions from this island.
+
+        Returns:
+          The prompt, the version of the function to be completed, and the
+          implementations included in the prompt.
+        """
+        signatures = self._signatures
 
         # Convert scores to probabilities using softmax with temperature schedule.
         period = self._cluster_sampling_temperature_period
+        step = max(1, period // TEMPERATURE_STEPS)
         temperature = self._cluster_sampling_temperature_init * (
-            1 - (self._num_programs % period) / period
+            1 - (self._num_programs % period) // step * step / period
         )
-        probabilities = _softmax(cluster_scores, temperature)
+        if (
+            self._cumulative_probabilities is None
+            or temperature != self._probabilities_temperature
+        ):
+            probabilities = _softmax(self._scores[: len(signatures)], temperature)
+            self._cumulative_probabilities = np.cumsum(probabilities)
+            self._probabilities_temperature = temperature
 
         # At the beginning of an experiment when we have few clusters, place fewer
         # programs into the prompt.
         functions_per_prompt = min(len(self._clusters), self._functions_per_prompt)
 
-        idx = np.random.choice(
-            len(signatures), size=functions_per_prompt, p=probabilities
+        cumulative = self._cumulative_probabilities
+        idx = np.searchsorted(
+            cumulative,
+            np.random.random(functions_per_prompt) * cumulative[-1],
+            side="right",
         )
+        idx = np.minimum(idx, len(signatures) - 1)
         chosen_signatures = [signatures[i] for i in idx]
         implementations = []
         scores = []
         for signature in chosen_signatures:
             cluster = self._clusters[signature]
-            implementations.append(cluster.sample_program())
+            implementations.append(self._program_table.get(cluster.sample_program()))
             scores.append(cluster.score)
 
         indices = np.argsort(scores)
         sorted_implementations = [implementations[i] for i in indices]
         version_generated = len(sorted_implementations) + 1
-        return self._generate_prompt(sorted_implementations), version_generated
+        return (
+            self._generate_prompt(sorted_implementations),
+            version_generated,
+            sorted_implementations,
+        )
+
+    def __setstate__(self, state):
+        # Islands pickled before their size was bounded
+        state.setdefault("_max_programs_per_cluster", None)
+        state.setdefault("_program_eviction_policy", EvictionPolicy.LONGEST)
+        state.setdefault("_max_clusters", None)
+        state.setdefault("_cluster_eviction_policy", EvictionPolicy.LOWEST_NOVELTY)
+        state.setdefault("evictions", collections.Counter())
+        state.setdefault("_num_clusters_created", len(state["_clusters"]))
+        self.__dict__.update(state)
+        # Islands pickled before programs were interned
+        if "_program_table" not in state:
+            self._program_table = ProgramTable()
+            for cluster in self._clusters.values():
+                cluster._intern(self._program_table)
+        # Islands pickled before the clusters were indexed for sampling
+        if "_signatures" not in state:
+            self._init_sampling()
+        if "_novelty" not in state:
+            self._init_novelty()
 
     def _generate_prompt(
         self, implementations: Sequence[code_manipulation.Program]
     ) -> str:
-        implementations = copy.deepcopy(implementations)
-        prompt = f"# File Hierarchy \n{self._file_hierarchy}\n\n"
-        for program_version, implementation in enumerate(implementations):
-            prompt += f"# Start of Program  Version {program_version} (*_v{program_version})\n"
-            if program_version >= 1:
-                prompt += f"# This is an improved version of the previous program (*_v{program_version - 1})\n\n"
-
-            for function in implementation.functions:
-                path = function.path
-                func_loc_comment = f"#{path}: {function.qualname} ({function.decorator if function.decorator else ''}\n)"
-                prompt += f"{func_loc_comment}\n"
+        return "".join([
+            f"# File Hierarchy \n{self._file_hierarchy}\n\n",
+            *(
+                implementation.to_prompt(program_version)
+                for program_version, implementation in enumerate(implementations)
+            ),
+        ])
 
-                func_str = function.to_str(version=program_version)
-                prompt += f"{func_str}\n\n"
 
-            prompt += f"# End of Program Version {program_version}\n\n"
-
-        return prompt
+class Cluster:
+    """A cluster of programs on the same island and with the same Signature.
 
+    The cluster holds the IDs of its programs in the program table of its
+    island, along with their lengths.
+    """
 
-class Cluster:
-    """A cluster of programs on the same island and with the same Signature."""
+    # Number of programs the arrays of IDs and lengths start with room for
+    _INITIAL_CAPACITY = 8
 
-    def __init__(self, score: float, implementation: code_manipulation.Program):
+    def __init__(
+        self,
+        score: float,
+        program_id: int,
+        length: int,
+        tests: tuple[Any, ...] | None = None,
+    ):
         self._score = score
-        self._programs: list[code_manipulation.Program] = [implementation]
-        self._lengths: list[int] = [len(str(implementation))]
+        self._tests = tests
+        self._size = 0
+        self._program_ids: np.ndarray = np.empty(self._INITIAL_CAPACITY, dtype=np.int64)
+        self._lengths: np.ndarray = np.empty(self._INITIAL_CAPACITY, dtype=np.int64)
+        # Cumulative sampling probabilities, computed on the first sample after an insert
+        self._cumulative_probabilities: np.ndarray | None = None
+        # Number of programs ever registered, which reservoir sampling needs.
+        self._num_registered = 0
+        self.register_program(program_id, length)
 
     @property
     def score(self) -> float:
         """Reduced score of the signature that this cluster represents."""
         return self._score
 
-    def register_program(self, program: code_manipulation.Program) -> None:
-        """Adds `program` to the cluster."""
-        self._programs.append(program)
-        self._lengths.append(len(str(program)))
+    @property
+    def tests(self) -> tuple[Any, ...] | None:
+        """Tests of the scores of the signature, in the same order, if they are known."""
+        return self._tests
 
-    def sample_program(self) -> code_manipulation.Program:
-        """Samples a program, giving higher probability to shorther programs."""
-        normalized_lengths = (np.array(self._lengths) - min(self._lengths)) / (
-            max(self._lengths) + 1e-6
+    def scores_per_test(self, signature: Signature) -> dict[Any, float]:
+        """Returns the scores of `signature` by test, or by position if the tests are not known."""
+        tests = self._tests if self._tests is not None else range(len(signature))
+        return dict(zip(tests, signature))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterable[tuple[int, int]]:
+        """Yields the ID and length of every program of the cluster."""
+        return zip(
+            self._program_ids[: self._size].tolist(),
+            self._lengths[: self._size].tolist(),
         )
-        probabilities = _softmax(-normalized_lengths, temperature=1.0)
-        return np.random.choice(self._programs, p=probabilities)
\ No newline at end of file
+
+    def register_program(
+        self,
+        program_id: int,
+        length: int,
+        capacity: int | None = None,
+        policy: EvictionPolicy = EvictionPolicy.LONGEST,
+    ) -> int | None:
+        """Adds the program with ID `program_id` and length `length` to the cluster.
+
+        If the cluster then holds more than `capacity` programs, one of them,
+        possibly the new one, is evicted according to `policy`, and its ID is
+        returned.
+        """
+        if self._size == len(self._lengths):
+            self._program_ids = np.resize(self._program_ids, 2 * self._size)
+            self._lengths = np.resize(self._lengths, 2 * self._size)
+        self._program_ids[self._size] = program_id
+        self._lengths[self._size] = length
+        self._size += 1
+        self._num_registered += 1
+        self._cumulative_probabilities = None
+
+        if capacity is None or self._size <= capacity:
+            return None
+        if policy == EvictionPolicy.LONGEST:
+            index = int(np.argmax(self._lengths[: self._size]))
+        elif policy == EvictionPolicy.OLDEST:
+            index = 0
+        else:
+            # Reservoir sampling: the new program is kept with probability
+            # `capacity / programs registered`, in place of a random one.
+            index = min(np.random.randint(self._num_registered), self._size - 1)
+        return self._remove(index)
+
+    def _remove(self, index: int) -> int:
+        """Removes the program at `index`, and returns its ID."""
+        program_id = int(self._program_ids[index])
+        self._program_ids[index : self._size - 1] = self._program_ids[index + 1 : self._size]
+        self._lengths[index : self._size - 1] = self._lengths[index + 1 : self._size]
+        self._size -= 1
+        self._cumulative_probabilities = None
+        return program_id
+
+    def sample_program(self) -> int:
+        """Samples the ID of a program, giving higher probability to shorther programs."""
+        if self._cumulative_probabilities is None:
+            lengths = self._lengths[: self._size]
+            normalized_lengths = (lengths - lengths.min()) / (lengths.max() + 1e-6)
+            probabilities = _softmax(-normalized_lengths, temperature=1.0)
+            self._cumulative_probabilities = np.cumsum(probabilities)
+
+        cumulative = self._cumulative_probabilities
+        index = np.searchsorted(cumulative, np.random.random() * cumulative[-1], side="right")
+        return int(self._program_ids[min(index, self._size - 1)])
+
+    def _intern(self, program_table: ProgramTable) -> None:
+        """Replaces the programs of a cluster pickled before programs were interned by their IDs."""
+        programs = self.__dict__.pop("_programs")
+        lengths = np.asarray(self._lengths, dtype=np.int64)
+        self._size = 0
+        self._num_registered = 0
+        self._program_ids = np.empty(max(len(programs), 1), dtype=np.int64)
+        self._lengths = np.empty(max(len(programs), 1), dtype=np.int64)
+        for program, length in zip(programs, lengths.tolist()):
+            self.register_program(program_table.intern(program, length), length)
+
+    def __setstate__(self, state):
+        state.setdefault("_cumulative_probabilities", None)
+        state.setdefault("_tests", None)
+        if "_num_registered" not in state:
+            state["_num_registered"] = state["_size"] if "_size" in state else len(state["_programs"])
+        self.__dict__.update(state)
@@ -18,6 +18,7 @@
 from collections.abc import Collection, Sequence
 
 import llm
+import asyncio
 import numpy as np
 import time
 import logging
@@ -119,10 +120,12 @@ class Sampler:
         evaluators: Sequence[evaluator.AsyncEvaluator],
         model: LLM | vLLM,
         uid: int = 0,
+        evaluation_queue: evaluator.EvaluationQueue | None = None,
     ) -> None:
         self._database = database
         self._evaluators = evaluators
         self._llm = model
+        self._evaluation_queue = evaluation_queue
         self.uid = uid
         self.generation_number = 0
 
@@ -140,19 +143,35 @@ class Sampler:
         t1 = time.time()
         llm_time = t1 - t0
 
-        # Time evaluation
+        # Time evaluation, or only the hand-off when an evaluation queue is used
         eval_times = []
         for sample in samples:
             curr_id = str(self.uid) + "_" + str(self.generation_number)
             self.generation_number += 1
             t0 = time.time()
-            chosen_evaluator = np.random.choice(self._evaluators)
-            chosen_evaluator.analyse(sample, prompt.island_id, curr_id)
+            if self._evaluation_queue is not None:
+                self._evaluation_queue.put(
+                    sample, prompt.island_id, curr_id, prompt.parents
+                )
+            else:
+                chosen_evaluator = np.random.choice(self._evaluators)
+                asyncio.run(
+                    chosen_evaluator.analyse(sample, prompt.island_id, curr_id)
+                )
             t1 = time.time()
             eval_times.append(t1 - t0)
 
         # Log timing results
         avg_eval_time = sum(eval_times) / len(eval_times)
+        logging.debug(
+            f"Sampler {self.uid}: prompt {prompt_time:.3f}s, "
+            f"LLM {llm_time:.3f}s, evaluation {avg_eval_time:.3f}s per sample"
+        )
+
+        if self._evaluation_queue is not None:
+            logging.debug(
+                f"Evaluation queue depth: {self._evaluation_queue.depth}"
+            )
 
 if __name__ == "__main__":
     from pathlib import Path
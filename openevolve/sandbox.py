@@ -2,7 +2,10 @@ from openevolve.test_case import TestCase
 
 from openevolve.constants import (
     HOTSWAP_ENVVAR,
+    WORKSPACE_ROOT_ENVVAR,
+    IMPS_ROOT_ENVVAR,
     SANDBOX_IMAGE_NAME,
+    SANDBOX_IMAGE_DIGEST_LABEL,
     SANDBOX_CONTAINER_NAME,
     CONTAINER_MAIN_PATH,
     CONTAINER_EVAL_PATH,
@@ -19,19 +22,69 @@ from openevolve.custom_types import (
     ContainerAbsPath,
 )
 
-from openevolve.eval_result import EvalResult
+from openevolve.eval_result import EvalResult, EvalStatus
+from openevolve.engine_client import EngineClient, SubprocessEngineClient
 
+from contextlib import contextmanager
+from collections.abc import Iterator
+from dataclasses import dataclass
 from enum import StrEnum
 from typing import Any
 
 import cloudpickle as pickle
+import subprocess
+import functools
+import hashlib
+import select
+import signal
+import mmap
+import time
+import threading
 import tempfile
+import shlex
+import json
 import logging
 import pathlib
+import queue
 import shutil
 import sys
 import os
 
+# The OpenEvolve checkout that is installed in the container image
+OPENEVOLVE_ROOT: HostAbsPath = pathlib.Path(__file__).resolve().parent.parent
+
+@functools.cache
+def openevolve_digest() -> str:
+    """Returns a digest of the OpenEvolve sources that are installed in the container image."""
+    digest = hashlib.sha256()
+    package = OPENEVOLVE_ROOT / "openevolve"
+    paths = [OPENEVOLVE_ROOT / "pyproject.toml", *sorted(package.rglob("*"))]
+
+    for path in paths:
+        if path.is_file() and "__pycache__" not in path.parts:
+            digest.update(str(path.relative_to(OPENEVOLVE_ROOT)).encode() + b"\0")
+            digest.update(path.read_bytes())
+
+    return digest.hexdigest()
+
+def write_test_cases(test_cases: list[TestCase], inputs_root: HostAbsPath):
+    """
+    Pickles test cases to the files the worker reads them from, one per test case.
+
+    Args:
+        test_cases (list[TestCase]): List of test cases to write.
+        inputs_root (HostAbsPath): The directory to write the test cases to.
+    """
+    for i, test_case in enumerate(test_cases):
+        # Write the test case to a file using cloudpickle
+        with open(inputs_root / f"{i}.pickle", "wb") as file:
+            test_case_dict = {
+                "args": test_case.args,
+                "kwargs": test_case.kwargs,
+            }
+
+            pickle.dump(test_case_dict, file)
+
 class DummySandbox:
     """Base class for Sandboxes that execute the generated code."""
     sandboxes = 0
@@ -45,6 +98,15 @@ class DummySandbox:
         DummySandbox.sandboxes += 1
         return sandbox_id
 
+    def run_batch(
+        self,
+        implementation_id: str,
+        test_ids: list[int],
+        timeout: float = 30.0,
+    ) -> list[EvalResult]:
+        """Runs several test cases of an implementation. Sandboxes can override this to save round-trips."""
+        return [self.run(implementation_id, test_id, timeout) for test_id in test_ids]
+
 class ContainerEngine(StrEnum):
     """Enum for container engines."""
     PODMAN = "podman"
@@ -52,15 +114,82 @@ class ContainerEngine(StrEnum):
 
 DEFAULT_CONTAINER_ENGINE = ContainerEngine.DOCKER
 
+class Retention(StrEnum):
+    """Enum for what to keep of the outputs or logs of an implementation once it is evaluated."""
+    KEEP = "keep"
+    FAILED = "failed"
+    DELETE = "delete"
+
+# Exit code of `timeout` when it times out, and of a run killed with SIGKILL, either by
+# `timeout -s KILL` or by the OOM killer of the container's cgroup
+TIMEOUT_EXITCODE = 124
+KILLED_EXITCODE = 128 + signal.SIGKILL
+
+def _killed_status(returncode: int | None, elapsed: float, kill_after: float) -> EvalStatus | None:
+    """
+    Returns the status of a run killed in the container, which leaves no output behind.
+
+    Args:
+        returncode (int | None): The exit code of the run.
+        elapsed (float): How long the run took, in seconds.
+        kill_after (float): The time in seconds after which `timeout` kills the run.
+
+    Returns:
+        EvalStatus | None: TIMEOUT or OOM, or None if the run was not killed.
+    """
+    if returncode == TIMEOUT_EXITCODE:
+        return EvalStatus.TIMEOUT
+
+    # `timeout -s KILL` and the OOM killer both kill with SIGKILL, so they are told apart by the time
+    if returncode == KILLED_EXITCODE:
+        return EvalStatus.TIMEOUT if elapsed >= kill_after else EvalStatus.OOM
+
+    return None
+
+class SandboxTimeoutError(TimeoutError):
+    """Raised when a run does not come back within the host-side timeout."""
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    """
+    Resource limits of the sandboxed runs.
+
+    Attributes:
+        memory (int | None): The maximum memory in bytes of a container, also used as
+            the maximum address space of each run in the persistent worker.
+        cpus (float | None): The maximum number of CPUs a container can use.
+        pids (int | None): The maximum number of processes in a container.
+    """
+    memory: int | None = None
+    cpus: float | None = None
+    pids: int | None = None
+
+    def engine_args(self) -> list[str]:
+        """Returns the container engine flags that enforce the limits."""
+        args = []
+
+        if self.memory is not None:
+            # Disallow swap so that the memory limit is a hard one
+            args += ["--memory", str(self.memory), "--memory-swap", str(self.memory)]
+
+        if self.cpus is not None:
+            args += ["--cpus", str(self.cpus)]
+
+        if self.pids is not None:
+            args += ["--pids-limit", str(self.pids)]
+
+        return args
+
 class ContainerSandbox(DummySandbox):
     """
     Basic sandbox that runs unsafe code in Podman or Docker container.
     - the sandbox should be safe against inadvertent bad code by LLM but not against malicious attacks.
     - does not require any other dependencies on the host than Podman/Docker
-    - does not support multithreading
+    - runs are spread over a pool of identical containers, one run per container at a time
     - might provide easier or more lightweight debugging experience than some other fancier sandbox environments
     """
     engine: ContainerEngine = DEFAULT_CONTAINER_ENGINE
+    client: EngineClient = SubprocessEngineClient(DEFAULT_CONTAINER_ENGINE.value)
 
     def __init__(
         self,
@@ -70,6 +199,18 @@ class ContainerSandbox(DummySandbox):
         setup_relpath: HostRelPath | None = None,
         force_rebuild_container: bool = False,
         pythonpath: ContainerAbsPath = CONTAINER_PYTHONPATH,
+        num_containers: int = 1,
+        max_runs_per_container: int | None = None,
+        use_worker: bool = True,
+        outputs_root: HostAbsPath | None = None,
+        logs_root: HostAbsPath | None = None,
+        mount_outputs: bool = True,
+        use_mmap: bool = False,
+        outputs_retention: Retention = Retention.DELETE,
+        logs_retention: Retention = Retention.FAILED,
+        resource_limits: ResourceLimits | None = None,
+        timeout_grace: float = 10.0,
+        worker_startup_timeout: float = 120.0,
     ):
         """
         Initializes the container sandbox.
@@ -81,6 +222,23 @@ class ContainerSandbox(DummySandbox):
             setup_relpath (HostRelPath | None): The path to the setup file for installation on the host, relative to the project root (e.g. "./setup.sh"). If provided, must be a shell script.
             force_rebuild_container (bool): If True, forces the rebuild of the container, even if it already exists.
             pythonpath (ContainerAbsPath): The absolute path to the Python interpreter to use on the host. Defaults to `CONTAINER_PYTHONPATH`.
+            num_containers (int): Number of identical containers to keep warm for parallel runs.
+            max_runs_per_container (int | None): If provided, containers are recycled after this many runs.
+            use_worker (bool): If True, runs are served by a persistent worker process in each container
+                that preloads the project once, instead of starting a new interpreter for every run.
+            outputs_root (HostAbsPath | None): The host directory bind-mounted as the outputs directory of the containers.
+                Defaults to a new temporary directory.
+            logs_root (HostAbsPath | None): The host directory bind-mounted as the logs directory of the containers.
+                Defaults to a new temporary directory.
+            mount_outputs (bool): If True, outputs and logs are bind-mounted and results are read directly from the host.
+                Otherwise they stay in the containers and results are copied out.
+            use_mmap (bool): If True, results are read from the bind-mounted outputs through a memory map.
+            outputs_retention (Retention): What to keep of the bind-mounted outputs of an implementation once it is evaluated.
+            logs_retention (Retention): What to keep of the bind-mounted logs of an implementation once it is evaluated.
+            resource_limits (ResourceLimits | None): If provided, the CPU, memory and process limits of the containers and runs.
+            timeout_grace (float): Extra seconds the host waits for a run on top of its timeout before killing it
+                and recycling its container.
+            worker_startup_timeout (float): The maximum time in seconds to wait for a persistent worker to load the project.
         """
         super().__init__()
 
@@ -89,6 +247,26 @@ class ContainerSandbox(DummySandbox):
         self.eval_relpath = eval_relpath
         self.setup_relpath = setup_relpath
         self.pythonpath = pythonpath
+        self.use_worker = use_worker
+        self.mount_outputs = mount_outputs
+        self.use_mmap = use_mmap
+        self.outputs_retention = outputs_retention
+        self.logs_retention = logs_retention
+        self.resource_limits = resource_limits or ResourceLimits()
+        self.timeout_grace = timeout_grace
+        self.worker_startup_timeout = worker_startup_timeout
+        self.outputs_root: HostAbsPath | None = None
+        self.logs_root: HostAbsPath | None = None
+
+        if mount_outputs:
+            self.outputs_root = pathlib.Path(outputs_root or tempfile.mkdtemp(suffix="_outputs"))
+            self.logs_root = pathlib.Path(logs_root or tempfile.mkdtemp(suffix="_logs"))
+            self.outputs_root.mkdir(parents=True, exist_ok=True)
+            self.logs_root.mkdir(parents=True, exist_ok=True)
+
+        # Persistent workers, by the name of the container they run in
+        self._workers: dict[str, ContainerWorker] = {}
+        self._workers_lock = threading.Lock()
 
         eval_abspath = project_root / eval_relpath
         setup_abspath = project_root / setup_relpath if setup_relpath else None
@@ -110,45 +288,55 @@ class ContainerSandbox(DummySandbox):
                 f"Evaluation file {eval_relpath} does not exist in the project root {project_root}."
             )
 
-        if self.sandbox_id != 0:
-            return
-
-        # Check if the container image already exists
-        # If it does, we can skip the build step unless forced to rebuild
-        if force_rebuild_container or not self.container_exists():
-            # If the container already exists, remove it
-            self.remove_container()
-
-            # Build the container image
+        # The image is shared by all sandboxes, so only the first one builds it.
+        # It is rebuilt if forced, or if it does not exist yet or was built from other sources.
+        if self.sandbox_id == 0 and (force_rebuild_container or not self.image_up_to_date()):
             self.build_image(
                 project_root,
                 eval_relpath,
                 setup_relpath,
             )
 
-            # Create the container from the built image
-            self.create_container(imps_root)
+        # Start the pool of containers created from the image
+        self.pool = ContainerPool(
+            self,
+            [
+                f"{SANDBOX_CONTAINER_NAME}_{self.sandbox_id}_{i}"
+                for i in range(num_containers)
+            ],
+            imps_root,
+            max_runs_per_container=max_runs_per_container,
+            outputs_root=self.outputs_root,
+            logs_root=self.logs_root,
+            resource_limits=self.resource_limits,
+        )
 
-        # Start the container if it is not already running
-        self.start_container()
+        # The mounted directories are specific to this sandbox, so containers
+        # left over from a previous run cannot be reused when mounting.
+        self.pool.start(force_recreate=force_rebuild_container or mount_outputs)
 
     @staticmethod
     def has_engine(engine: ContainerEngine) -> bool:
         """Checks if the specified container engine is available."""
-        ret = os.system(f"{engine.value} --version")
-        return ret == 0
+        return SubprocessEngineClient(engine.value).run(["--version"]).ok
 
     @classmethod
     def use_engine(cls, engine: ContainerEngine):
         """Sets the container engine to the specified one."""
         logging.debug(f"Using container engine: {engine.value}")
         cls.engine = engine
+        cls.client = SubprocessEngineClient(engine.value)
+
+    @classmethod
+    def use_client(cls, client: EngineClient):
+        """Sets the client used to run container engine commands, e.g. a fake engine for tests."""
+        cls.client = client
 
     @classmethod
     @property
     def executable(cls) -> str:
         """Returns the executable command for the container engine."""
-        return cls.engine.value
+        return cls.client.executable
 
     @classmethod
     def select_engine(cls) -> ContainerEngine:
@@ -171,12 +359,15 @@ class ContainerSandbox(DummySandbox):
         setup_relpath: HostAbsPath | None = None,
     ):
         """
-        Builds the container image.
-        
+        Builds the container image, with the OpenEvolve checkout of the host installed in it.
+
         Args:
             project_root (HostAbsPath): The absolute path to the project root on the host.
             eval_relpath (HostRelPath): The path to the evaluation entry point on the host, relative to the project root (e.g. "./eval.py").
             setup_relpath (HostAbsPath | None): The absolute path to the setup file for installation, located on the host. If provided, must be a shell script.
+
+        Raises:
+            RuntimeError: If OpenEvolve is not run from a source checkout, or the build fails.
         """
         version = sys.version.split(" ")[0]
         logging.debug(f"Using Python version: {version}")
@@ -189,107 +380,141 @@ class ContainerSandbox(DummySandbox):
         logging.debug("Building container image")
 
         # Add the setup file as a build argument if provided
-        extra = ""
+        extra = []
 
         if setup_relpath is not None:
-            extra = f'--build-arg SETUP_RELPATH="{setup_relpath}"'
+            extra = ["--build-arg", f"SETUP_RELPATH={setup_relpath}"]
 
         # Set the build context to the project root
         build_context = project_root
 
+        # The worker and the hotswapped functions in the container come from the same sources as the host
+        if not (OPENEVOLVE_ROOT / "pyproject.toml").is_file():
+            raise RuntimeError(
+                f"Cannot install OpenEvolve in the container image: {OPENEVOLVE_ROOT} is not a source checkout."
+            )
+
         # Prepare the command to build the container image
-        cmd = (
+        cmd = [
             # Use the container engine to build the image
-            f"{cls.executable} build "
+            "build",
             # Set the build argument for the Python version
-            f"--build-arg PYTHON_VERSION={version} "
+            "--build-arg", f"PYTHON_VERSION={version}",
             # Set the build argument for the workspace root
-            f"--build-arg PROJECT_ROOT=. "
+            "--build-arg", "PROJECT_ROOT=.",
             # Set the build argument for the evaluation entry point
-            f"--build-arg EVAL_RELPATH={eval_relpath} "
+            "--build-arg", f"EVAL_RELPATH={eval_relpath}",
+            # Pass the OpenEvolve checkout to install, and the digest to label the image with
+            "--build-context", f"openevolve={OPENEVOLVE_ROOT}",
+            "--build-arg", f"OPENEVOLVE_DIGEST={openevolve_digest()}",
             # Tag the image with the name
-            f"-t {SANDBOX_IMAGE_NAME} "
+            "-t", SANDBOX_IMAGE_NAME,
             # Use the Dockerfile from the container directory
-            f"-f {dockerfile} {build_context} "
+            "-f", dockerfile, build_context,
             # Add any extra build arguments, such as the setup file
-            f"{extra}"
-        )
+            *extra,
+        ]
 
-        # Execute the command to build the image
-        logging.debug(f"Executing: {cmd}")
-        ret = os.system(cmd)
+        # Execute the command to build the image, showing its progress
+        result = cls.client.run(cmd, capture_output=False)
 
-        if ret != 0:
+        if not result.ok:
             raise RuntimeError(
                 f"Failed to build the container image {SANDBOX_IMAGE_NAME}. "
                 "Please check the Dockerfile and the build context."
             )
 
     @classmethod
-    def create_container(cls, imps_root: HostAbsPath):
+    def create_container(
+        cls,
+        imps_root: HostAbsPath,
+        container_name: str = SANDBOX_CONTAINER_NAME,
+        outputs_root: HostAbsPath | None = None,
+        logs_root: HostAbsPath | None = None,
+        resource_limits: ResourceLimits | None = None,
+    ):
         """
         Creates a container from the built image.
         
         Args:
             imps_root (HostAbsPath): The absolute path to the implementations directory on the host (e.g. /tmp/...).
+            container_name (str): The name of the container to create.
+            outputs_root (HostAbsPath | None): If provided, the host directory to bind-mount as the outputs directory.
+            logs_root (HostAbsPath | None): If provided, the host directory to bind-mount as the logs directory.
+            resource_limits (ResourceLimits | None): If provided, the CPU, memory and process limits of the container.
         """
         # Create the container
         logging.debug("Creating container from the built image...")
-        
-        cmd = (
-            f"{cls.executable} create "
+
+        # Mount the outputs and logs directories from the host if provided,
+        # so that results can be read without copying them out of the container
+        extra = []
+
+        if outputs_root is not None:
+            extra += ["--mount", f"type=bind,source={outputs_root},target={CONTAINER_OUTPUTS_PATH}"]
+
+        if logs_root is not None:
+            extra += ["--mount", f"type=bind,source={logs_root},target={CONTAINER_LOGS_PATH}"]
+
+        # Let the engine enforce the resource limits through cgroups
+        if resource_limits is not None:
+            extra += resource_limits.engine_args()
+
+        cmd = [
+            "create",
             # Set the container to run in interactive mode
-            f"-i "
+            "-i",
             # Set the container name
-            f"--name {SANDBOX_CONTAINER_NAME} "
+            "--name", container_name,
             # Mount the implementations directory from the host to /implementations in the container
-            f"--mount type=bind,source={imps_root},target={CONTAINER_IMPS_PATH},readonly "
+            "--mount", f"type=bind,source={imps_root},target={CONTAINER_IMPS_PATH},readonly",
+            # Add any extra mounts and the resource limits
+            *extra,
             # Use the built image
-            f"{SANDBOX_IMAGE_NAME}:latest"
-        )
+            f"{SANDBOX_IMAGE_NAME}:latest",
+        ]
 
-        logging.debug(f"Executing: {cmd}")
-        os.system(cmd)
+        cls.client.run(cmd, check=True)
 
         # Complete the image build process
         logging.debug("Container image built successfully.")
 
+    def upload_test_cases(self, test_cases: list[TestCase]):
+        """
+        Uploads test cases to every container of the pool.
+
+        Args:
+            test_cases (list[TestCase]): List of test cases to upload.
+        """
+        self.pool.set_test_cases(test_cases)
+
     @classmethod
-    def upload_test_cases(cls, test_cases: list[TestCase]):
+    def copy_test_cases(
+        cls,
+        test_cases: list[TestCase],
+        container_name: str = SANDBOX_CONTAINER_NAME,
+    ):
         """
-        Uploads test cases to the container sandbox.
+        Copies test cases into a container.
 
         Args:
             test_cases (list[TestCase]): List of test cases to upload.
+            container_name (str): The name of the container to copy the test cases to.
         """
         # Create a temporary directory on the host file system
         # to store the test cases.
         temp_dir = tempfile.mkdtemp()
 
         try:
-            # Copy the test case files to the temporary directory
-            for i, test_case in enumerate(test_cases):
-                # Create a unique filename for each test case
-                test_case_file = os.path.join(temp_dir, f"{i}.pickle")
-
-                # Write the test case to a file using cloudpickle
-                with open(test_case_file, "wb") as file:
-                    test_case_dict = {
-                        "args": test_case.args,
-                        "kwargs": test_case.kwargs,
-                    }
-
-                    pickle.dump(test_case_dict, file)
+            # Write the test case files to the temporary directory
+            write_test_cases(test_cases, pathlib.Path(temp_dir))
 
             # Use the container engine to copy files to the container
-            cmd = (
-                f"{cls.executable} "
-                f"cp {temp_dir}/. "
-                f"{SANDBOX_CONTAINER_NAME}:{CONTAINER_INPUTS_PATH}"
+            logging.debug(f"Copying test cases to container {container_name}")
+            cls.client.run(
+                ["cp", f"{temp_dir}/.", f"{container_name}:{CONTAINER_INPUTS_PATH}"],
+                check=True,
             )
-
-            logging.debug(f"Copying test cases to container: {cmd}")
-            os.system(cmd)
         except Exception as e:
             logging.error(f"Failed to upload test cases: {e}")
             raise
@@ -305,54 +530,123 @@ class ContainerSandbox(DummySandbox):
         Returns:
             bool: True if the image exists, False otherwise.
         """
-        cmd = f"{cls.executable} image ls {SANDBOX_IMAGE_NAME} -q"
-        result = os.popen(cmd).read().strip()
-        return bool(result)
+        result = cls.client.run(["image", "ls", SANDBOX_IMAGE_NAME, "-q"])
+        return bool(result.stdout.strip())
+
+    @classmethod
+    def image_up_to_date(cls) -> bool:
+        """
+        Checks if the container image exists and has the OpenEvolve sources of the host installed.
+
+        Returns:
+            bool: True if the image was built from the same OpenEvolve sources, False otherwise.
+        """
+        result = cls.client.run([
+            "image", "inspect",
+            "--format", f'{{{{ index .Config.Labels "{SANDBOX_IMAGE_DIGEST_LABEL}" }}}}',
+            SANDBOX_IMAGE_NAME,
+        ])
+        return result.ok and result.stdout.strip() == openevolve_digest()
 
     @classmethod
-    def container_exists(cls) -> bool:
+    def container_exists(cls, container_name: str = SANDBOX_CONTAINER_NAME) -> bool:
         """
         Checks if the container exists.
 
+        Args:
+            container_name (str): The name of the container to look for.
+
         Returns:
             bool: True if the container exists, False otherwise.
         """
-        cmd = f"{cls.executable} container ls"
-        result = os.popen(cmd).read().strip()
-        return SANDBOX_CONTAINER_NAME in result
+        result = cls.client.run(["container", "ls", "-a", "--format", "{{.Names}}"])
+        return container_name in result.stdout.split()
+
+    @classmethod
+    def container_healthy(
+        cls,
+        container_name: str = SANDBOX_CONTAINER_NAME,
+        timeout: float = 10.0,
+    ) -> bool:
+        """
+        Checks if the container is running and responds to commands.
+
+        Args:
+            container_name (str): The name of the container to check.
+            timeout (float): The time in seconds the container has to respond.
+
+        Returns:
+            bool: True if a trivial command succeeds in the container, False otherwise.
+        """
+        return cls.client.run(["exec", container_name, "true"], timeout=timeout).ok
 
     @classmethod
-    def remove_container(cls):
+    def remove_container(cls, container_name: str = SANDBOX_CONTAINER_NAME):
         """
         Removes the container if it exists.
+
+        Args:
+            container_name (str): The name of the container to remove.
         """
-        if cls.container_exists():
-            cmd = f"{cls.executable} rm -f {SANDBOX_CONTAINER_NAME}"
-            logging.debug(f"Removing container: {cmd}")
-            os.system(cmd)
+        if cls.container_exists(container_name):
+            logging.debug(f"Removing container {container_name}")
+            cls.client.run(["rm", "-f", container_name], check=True)
         else:
             logging.debug("No container to remove.")
 
     @classmethod
-    def start_container(cls):
+    def start_container(cls, container_name: str = SANDBOX_CONTAINER_NAME):
         """
         Starts the container if it is not already running.
         If the container is already running, it will not do anything.
+
+        Args:
+            container_name (str): The name of the container to start.
         """
-        cmd = (
-            f"{cls.executable} start "
-            f"{SANDBOX_CONTAINER_NAME}"
-        )
+        cls.client.run(["start", container_name], check=True)
 
-        logging.debug(f"Executing: {cmd}")
-        os.system(cmd)
+    def get_worker(self, container_name: str) -> "ContainerWorker":
+        """
+        Returns the persistent worker of a container, (re)starting it if it is not running.
+
+        Args:
+            container_name (str): The name of the container.
+        """
+        with self._workers_lock:
+            worker = self._workers.get(container_name)
+
+            if worker is None or not worker.alive:
+                worker = ContainerWorker(
+                    self.client,
+                    container_name,
+                    self.pythonpath,
+                    memory_limit=self.resource_limits.memory,
+                    startup_timeout=self.worker_startup_timeout,
+                )
+                self._workers[container_name] = worker
+
+            return worker
+
+    def stop_worker(self, container_name: str):
+        """
+        Stops the persistent worker of a container, if any.
+
+        Args:
+            container_name (str): The name of the container.
+        """
+        with self._workers_lock:
+            worker = self._workers.pop(container_name, None)
+
+        if worker is not None:
+            worker.close()
 
     def execute(
         self,
         implementation_id: str,
         test_id: int,
         timeout: float = 30.0,
-    ) -> tuple[ContainerAbsPath, int]:
+        container_name: str = SANDBOX_CONTAINER_NAME,
+    ) -> tuple[ContainerAbsPath, int | None]:
         """
         Use podman/docker to execute python in a container.
         - The main.py shall execute the LLM generated method from prog.pickle file providing
@@ -361,9 +655,15 @@ class ContainerSandbox(DummySandbox):
         Everything except the /workspace folder will be read-only so that the environment remains good
         for future runs.
 
+        The run is killed in the container, and the engine command on the host, if it
+        takes longer than `timeout` plus the grace period.
+
+        Raises:
+            SandboxTimeoutError: If the engine command did not return in time.
+
         Returns:
             Path: The absolute path of the output file in the container.
-            int: The exit code of the command executed in the container.
+            int | None: The exit code of the command executed in the container.
         """
         inputs_filename = f"{test_id}.pickle"
         outputs_filename = f"{implementation_id}/output_{test_id}.pickle"
@@ -374,46 +674,51 @@ class ContainerSandbox(DummySandbox):
         # Create the directory to store logs for this implementation and test case
         log_dir = CONTAINER_LOGS_PATH / implementation_id / f"test_{test_id}"
 
-        cmd = (
-            # Use the container engine to execute the command
-            f"{self.executable} exec "
-            # Create the log directory and all necessary parent directories
-            f"{SANDBOX_CONTAINER_NAME} mkdir -p {log_dir}"
+        # Create the output and log directories and all necessary parent directories
+        self.client.run(
+            ["exec", container_name, "mkdir", "-p", outputs_filepath.parent, log_dir],
+            check=True,
         )
-        logging.debug(f"Creating log directory: {cmd}")
-        os.system(cmd)
 
         stdout_path = log_dir / "stdout.txt"
         stderr_path = log_dir / "stderr.txt"
 
-        cmd = (
+        cmd = [
             # Use the container engine to run the command
-            f"{self.executable} exec "
-            # Set the container to run on
-            f"{SANDBOX_CONTAINER_NAME} "
-            # Run the command in a bash shell
-            f"/bin/bash -c '"
+            "exec",
             # Set the environment variable for hot-swapping
-            f"{HOTSWAP_ENVVAR}={implementation_id} "
-            # Call the Python interpreter in the container
-            f"{self.pythonpath} "
-            # Execute the main Python script in the container
-            f"{CONTAINER_MAIN_PATH} "
-            # Pass the paths to the eval program, input file, output file, and log directory
-            f"{CONTAINER_EVAL_PATH} "
-            f"{inputs_filepath} "
-            f"{outputs_filepath} "
-            # Pass the timeout to the main script
-            f"{timeout} "
-            # Pipe the standard output to a log file
-            f"> {stdout_path} "
-            # Pipe the standard error output to a log file
-            f"2> {stderr_path} "
-            # Close the command string
-            f"'"
-        )
-        logging.debug(f"Executing: {cmd}")
-        return outputs_filepath, os.system(cmd)
+            "-e", f"{HOTSWAP_ENVVAR}={implementation_id}",
+            # Set the container to run on
+            container_name,
+            # Run the command in a bash shell inside the container, which redirects the output
+            "/bin/bash", "-c",
+            shlex.join([
+                # Kill the interpreter if it hangs past the timeout of the main script
+                "timeout", "-s", "KILL", str(timeout + self.timeout_grace / 2),
+                # Call the Python interpreter in the container
+                str(self.pythonpath),
+                # Execute the main Python script in the container
+                str(CONTAINER_MAIN_PATH),
+                # Pass the paths to the eval program, input file and output file
+                str(CONTAINER_EVAL_PATH),
+                str(inputs_filepath),
+                str(outputs_filepath),
+                # Pass the timeout to the main script
+                str(timeout),
+            ])
+            # Pipe the standard output and error output to log files
+            + f" > {stdout_path} 2> {stderr_path}",
+        ]
+
+        result = self.client.run(cmd, timeout=timeout + self.timeout_grace)
+
+        if result.timed_out:
+            raise SandboxTimeoutError(
+                f"Run of implementation {implementation_id} on test {test_id} "
+                f"in container {container_name} timed out."
+            )
+
+        return outputs_filepath, result.returncode
 
     def run(
         self,
@@ -432,28 +737,834 @@ class ContainerSandbox(DummySandbox):
         Returns:
             EvalResult: The result of the evaluation, containing the output data and exit code.
         """
-        output_filepath, retcode = self.execute(implementation_id, test_id, timeout)
+        return self.run_batch(implementation_id, [test_id], timeout)[0]
 
-        # Create a temporary file to store the output
-        output_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pickle")
-        
-        # Copy the output file from the container to the host
-        cmd = (
-            f"{self.executable} cp "
-            f"{SANDBOX_CONTAINER_NAME}:{output_filepath} "
-            f"{output_file.name}"
+    def run_batch(
+        self,
+        implementation_id: str,
+        test_ids: list[int],
+        timeout: float = 30.0,
+    ) -> list[EvalResult]:
+        """
+        Runs several test cases of an implementation in a single round-trip to one container.
+
+        If the container does not answer within the host-side timeout, it is recycled and
+        the test cases without a result are reported with the `EvalStatus.TIMEOUT` status.
+
+        Args:
+            implementation_id (str): The ID of the implementation to run.
+            test_ids (list[int]): The IDs of the test cases to execute.
+            timeout (float): The maximum time in seconds to allow for each test case.
+
+        Returns:
+            list[EvalResult]: The result of each test case, in the order of `test_ids`.
+        """
+        with self.pool.lease() as container_name:
+            timed_out = False
+            # Status of the runs killed in the container, which have no output
+            killed: dict[int, EvalStatus] = {}
+
+            try:
+                if self.use_worker:
+                    self.get_worker(container_name).request_batch(
+                        implementation_id,
+                        test_ids,
+                        timeout,
+                        response_timeout=timeout * len(test_ids) + self.timeout_grace,
+                    )
+                else:
+                    for test_id in test_ids:
+                        t0 = time.monotonic()
+                        _, returncode = self.execute(implementation_id, test_id, timeout, container_name)
+                        status = _killed_status(
+                            returncode, time.monotonic() - t0, timeout + self.timeout_grace / 2
+                        )
+
+                        if status is not None:
+                            killed[test_id] = status
+            except SandboxTimeoutError as e:
+                logging.warning(f"{e} Recycling the container.")
+                timed_out = True
+
+            if self.mount_outputs:
+                # The outputs are bind-mounted, so they can be read in place
+                eval_results = self._load_results(
+                    self.outputs_root / implementation_id, test_ids, container_name, timed_out, killed
+                )
+            else:
+                # Create a temporary directory to store the outputs
+                output_dir = tempfile.mkdtemp(suffix=f"_{implementation_id}")
+
+                try:
+                    # Copy all output files of the implementation from the container at once
+                    self.client.run([
+                        "cp",
+                        f"{container_name}:{CONTAINER_OUTPUTS_PATH / implementation_id}/.",
+                        output_dir,
+                    ])
+
+                    eval_results = self._load_results(
+                        pathlib.Path(output_dir), test_ids, container_name, timed_out, killed
+                    )
+                finally:
+                    # Clean up the temporary directory
+                    shutil.rmtree(output_dir)
+
+            # Whatever hung may still be running, so the container is replaced
+            # after the finished results were collected
+            if timed_out:
+                self.pool.recycle(container_name)
+
+        if self.mount_outputs:
+            _apply_retention(
+                self.outputs_root / implementation_id,
+                self.logs_root / implementation_id,
+                test_ids,
+                eval_results,
+                self.outputs_retention,
+                self.logs_retention,
+            )
+
+        return eval_results
+
+    def _load_results(
+        self,
+        output_dir: HostAbsPath,
+        test_ids: list[int],
+        container_name: str,
+        timed_out: bool = False,
+        killed: dict[int, EvalStatus] | None = None,
+    ) -> list[EvalResult]:
+        """
+        Loads the results of a batch from a directory on the host.
+
+        Args:
+            output_dir (HostAbsPath): The directory of the outputs of the batch.
+            test_ids (list[int]): The IDs of the test cases of the batch.
+            container_name (str): The container the batch ran in.
+            timed_out (bool): Whether the batch timed out on the host, so that missing outputs are timeouts.
+            killed (dict[int, EvalStatus] | None): The status of the runs killed in the container, by test ID.
+
+        Raises:
+            FileNotFoundError: If no run of the batch left an output, and none of them was killed.
+
+        Returns:
+            list[EvalResult]: The result of each test case, in the order of `test_ids`.
+        """
+        killed = killed or {}
+        output_paths = [output_dir / f"output_{test_id}.pickle" for test_id in test_ids]
+
+        if timed_out:
+            # The runs that did not finish before the timeout have no output
+            return [
+                _load_result(path, self.use_mmap, missing=EvalStatus.TIMEOUT)
+                for path in output_paths
+            ]
+
+        # No output at all marks the lease as failed, so the container
+        # gets health-checked, unless the runs were killed for a known reason.
+        if not killed and not any(path.exists() for path in output_paths):
+            raise FileNotFoundError(
+                f"No outputs found in {output_dir} for container {container_name}."
+            )
+
+        return [
+            _load_result(path, self.use_mmap, missing=killed.get(test_id, EvalStatus.ERROR))
+            for test_id, path in zip(test_ids, output_paths)
+        ]
+
+
+def _load_result(
+    output_path: HostAbsPath,
+    use_mmap: bool = False,
+    missing: EvalStatus = EvalStatus.ERROR,
+) -> EvalResult:
+    """Loads a pickled EvalResult, treating a missing or empty output as a failed run with the `missing` status."""
+    if not output_path.exists() or output_path.stat().st_size == 0:
+        return EvalResult(success=False, output=None, status=missing)
+
+    with open(output_path, "rb") as file:
+        if use_mmap:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return pickle.loads(buffer)
+
+        return pickle.load(file)
+
+def _apply_retention(
+    outputs_dir: HostAbsPath,
+    logs_dir: HostAbsPath,
+    test_ids: list[int],
+    eval_results: list[EvalResult],
+    outputs_retention: Retention,
+    logs_retention: Retention,
+):
+    """Deletes the outputs and logs of a batch on the host according to the retention policies."""
+    for test_id, eval_result in zip(test_ids, eval_results):
+        if not _retain(outputs_retention, eval_result):
+            (outputs_dir / f"output_{test_id}.pickle").unlink(missing_ok=True)
+
+        if not _retain(logs_retention, eval_result):
+            shutil.rmtree(logs_dir / f"test_{test_id}", ignore_errors=True)
+
+    # Other batches of the same implementation may still be writing here,
+    # so the directories are only removed once they are empty.
+    for directory in (outputs_dir, logs_dir):
+        try:
+            directory.rmdir()
+        except OSError:
+            pass
+
+def _retain(retention: Retention, eval_result: EvalResult) -> bool:
+    """Whether the outputs or logs of a run should be kept under a retention policy."""
+    if retention == Retention.KEEP:
+        return True
+
+    if retention == Retention.FAILED:
+        return not eval_result.success
+
+    return False
+
+
+class WorkerProcess:
+    """
+    Host-side handle of a persistent worker (see `openevolve.container.worker`).
+    Requests are sent over the stdin/stdout pipes of the worker process, one
+    request at a time.
+
+    The worker is killed if it does not answer in time, so a hung worker never
+    blocks the evaluator thread waiting for it.
+    """
+
+    def __init__(
+        self,
+        process: subprocess.Popen,
+        name: str,
+        startup_timeout: float | None = 120.0,
+    ):
+        """
+        Waits for a started worker to load the project.
+
+        Args:
+            process (subprocess.Popen): The worker process, with text-mode stdin/stdout pipes.
+            name (str): The name of the worker, used in error messages.
+            startup_timeout (float | None): The maximum time in seconds to wait for the worker to be ready.
+
+        Raises:
+            SandboxTimeoutError: If the worker did not get ready in time.
+        """
+        self.name = name
+        self.process = process
+        self._lock = threading.Lock()
+
+        self._receive(startup_timeout)
+
+    @property
+    def alive(self) -> bool:
+        """Whether the worker process is still running."""
+        return self.process.poll() is None
+
+    def request(
+        self,
+        implementation_id: str,
+        test_id: int,
+        timeout: float = 30.0,
+        response_timeout: float | None = None,
+    ) -> pathlib.Path:
+        """
+        Runs a test case of an implementation in the worker.
+
+        Args:
+            implementation_id (str): The ID of the implementation to run.
+            test_id (int): The ID of the test case to execute.
+            timeout (float): The maximum time in seconds the worker allows for the run.
+            response_timeout (float | None): The maximum time in seconds to wait for the worker to respond.
+
+        Returns:
+            pathlib.Path: The absolute path of the output file, as seen by the worker.
+        """
+        response = self._send({
+            "implementation_id": implementation_id,
+            "test_id": test_id,
+            "timeout": timeout,
+        }, response_timeout)
+
+        return pathlib.Path(response["output_path"])
+
+    def request_batch(
+        self,
+        implementation_id: str,
+        test_ids: list[int],
+        timeout: float = 30.0,
+        response_timeout: float | None = None,
+    ) -> list[pathlib.Path]:
+        """
+        Runs several test cases of an implementation in the worker, in a single request.
+
+        Args:
+            implementation_id (str): The ID of the implementation to run.
+            test_ids (list[int]): The IDs of the test cases to execute.
+            timeout (float): The maximum time in seconds the worker allows for each run.
+            response_timeout (float | None): The maximum time in seconds to wait for the worker to respond.
+
+        Returns:
+            list[pathlib.Path]: The absolute paths of the output files, as seen by the worker.
+        """
+        response = self._send({
+            "implementation_id": implementation_id,
+            "test_ids": list(test_ids),
+            "timeout": timeout,
+        }, response_timeout)
+
+        return [pathlib.Path(result["output_path"]) for result in response["results"]]
+
+    def _send(self, request: dict[str, Any], timeout: float | None = None) -> dict[str, Any]:
+        """Sends a request to the worker and waits at most `timeout` seconds for its response."""
+        with self._lock:
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+            return self._receive(timeout)
+
+    def _receive(self, timeout: float | None = None) -> dict[str, Any]:
+        """Reads the next response of the worker, killing the worker if it takes longer than `timeout` seconds."""
+        # Responses are single lines and the worker waits for the next request
+        # after each one, so nothing is left in the buffer between responses
+        # and the pipe can be polled directly.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        remaining = timeout
+
+        while remaining is None or remaining > 0:
+            readable, _, _ = select.select([self.process.stdout], [], [], remaining)
+
+            if readable:
+                break
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+        else:
+            self.kill()
+            raise SandboxTimeoutError(
+                f"Worker {self.name} did not respond within {timeout} seconds."
+            )
+
+        line = self.process.stdout.readline()
+
+        if not line:
+            raise RuntimeError(f"Worker {self.name} exited.")
+
+        response = json.loads(line)
+
+        if "error" in response:
+            raise RuntimeError(f"Worker {self.name} failed: {response['error']}")
+
+        return response
+
+    def kill(self):
+        """Kills the worker."""
+        self.process.kill()
+        self.process.wait()
+
+    def close(self):
+        """Stops the worker."""
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+
+class ContainerWorker(WorkerProcess):
+    """A persistent worker running in a container, attached through a long-lived `exec` process."""
+
+    def __init__(
+        self,
+        client: EngineClient,
+        container_name: str,
+        pythonpath: ContainerAbsPath = CONTAINER_PYTHONPATH,
+        memory_limit: int | None = None,
+        startup_timeout: float | None = 120.0,
+    ):
+        """
+        Starts the worker in the container and waits for it to load the project.
+
+        Args:
+            client (EngineClient): The client used to run container engine commands.
+            container_name (str): The name of the container to run the worker in.
+            pythonpath (ContainerAbsPath): The Python interpreter in the container.
+            memory_limit (int | None): If provided, the maximum address space in bytes of each run.
+            startup_timeout (float | None): The maximum time in seconds to wait for the worker to be ready.
+
+        Raises:
+            SandboxTimeoutError: If the worker did not get ready in time.
+        """
+        self.container_name = container_name
+
+        extra = []
+
+        if memory_limit is not None:
+            extra += ["--memory-limit", str(memory_limit)]
+
+        process = client.popen(
+            [
+                "exec", "-i", container_name,
+                pythonpath, "-m", "openevolve.container.worker",
+                *extra,
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+
+        super().__init__(process, f"in container {container_name}", startup_timeout)
+
+
+class LocalWorker(WorkerProcess):
+    """A persistent worker running as a local process, in its own process group."""
+
+    def __init__(
+        self,
+        worker_args: list[str],
+        name: str,
+        env: dict[str, str] | None = None,
+        pythonpath: HostAbsPath | str = sys.executable,
+        startup_timeout: float | None = 120.0,
+    ):
+        """
+        Starts the worker and waits for it to load the project.
+
+        Args:
+            worker_args (list[str]): The command-line arguments of `openevolve.container.worker`.
+            name (str): The name of the worker, used in error messages.
+            env (dict[str, str] | None): The environment of the worker. Defaults to the environment of the host.
+            pythonpath (HostAbsPath | str): The Python interpreter to run the worker with.
+            startup_timeout (float | None): The maximum time in seconds to wait for the worker to be ready.
+
+        Raises:
+            SandboxTimeoutError: If the worker did not get ready in time.
+        """
+        process = subprocess.Popen(
+            [str(pythonpath), "-m", "openevolve.container.worker", *map(str, worker_args)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            env=env,
+            # The runs are forked by the worker, so they are killed with its process group
+            start_new_session=True,
+        )
+
+        super().__init__(process, name, startup_timeout)
+
+    def kill(self):
+        """Kills the worker and the runs it forked."""
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+        self.process.wait()
+
+
+class ContainerPool:
+    """
+    A pool of identical, warm containers created from `SANDBOX_IMAGE_NAME`.
+
+    Each container is leased to a single run at a time, so concurrent runs never
+    share a container. Containers that fail a health check, or that reached
+    `max_runs_per_container`, are recycled: removed, recreated from the image,
+    started and given the test cases again.
+    """
+
+    def __init__(
+        self,
+        sandbox: "ContainerSandbox",
+        container_names: list[str],
+        imps_root: HostAbsPath,
+        max_runs_per_container: int | None = None,
+        outputs_root: HostAbsPath | None = None,
+        logs_root: HostAbsPath | None = None,
+        resource_limits: ResourceLimits | None = None,
+    ):
+        """
+        Initializes the pool. Containers are only created by `start`.
+
+        Args:
+            sandbox (ContainerSandbox): The sandbox whose engine commands are used to manage containers.
+            container_names (list[str]): The names of the containers in the pool.
+            imps_root (HostAbsPath): The absolute path to the implementations directory on the host.
+            max_runs_per_container (int | None): If provided, containers are recycled after this many runs.
+            outputs_root (HostAbsPath | None): If provided, the host directory bind-mounted as the outputs directory of every container.
+            logs_root (HostAbsPath | None): If provided, the host directory bind-mounted as the logs directory of every container.
+            resource_limits (ResourceLimits | None): If provided, the CPU, memory and process limits of every container.
+        """
+        if not container_names:
+            raise ValueError("A container pool needs at least one container.")
+
+        self.sandbox = sandbox
+        self.container_names = list(container_names)
+        self.imps_root = imps_root
+        self.max_runs_per_container = max_runs_per_container
+        self.outputs_root = outputs_root
+        self.logs_root = logs_root
+        self.resource_limits = resource_limits
+
+        self._test_cases: list[TestCase] | None = None
+        self._runs: dict[str, int] = {name: 0 for name in self.container_names}
+        self._free: queue.Queue[str] = queue.Queue()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.container_names)
+
+    def start(self, force_recreate: bool = False):
+        """
+        Creates the missing containers, starts all of them and makes them available for leasing.
+
+        Args:
+            force_recreate (bool): If True, existing containers are removed and recreated.
+        """
+        for container_name in self.container_names:
+            if force_recreate or not self.sandbox.container_exists(container_name):
+                self.sandbox.remove_container(container_name)
+                self.sandbox.create_container(
+                    self.imps_root,
+                    container_name,
+                    self.outputs_root,
+                    self.logs_root,
+                    self.resource_limits,
+                )
+
+            self.sandbox.start_container(container_name)
+            self._free.put(container_name)
+
+    def set_test_cases(self, test_cases: list[TestCase]):
+        """
+        Uploads test cases to every container, and remembers them for recycled containers.
+
+        Args:
+            test_cases (list[TestCase]): List of test cases to upload.
+        """
+        with self._lock:
+            self._test_cases = test_cases
+
+        for container_name in self.container_names:
+            self.sandbox.copy_test_cases(test_cases, container_name)
+
+    @contextmanager
+    def lease(self) -> Iterator[str]:
+        """
+        Leases a container for the duration of the context, blocking until one is free.
+
+        Yields:
+            str: The name of the leased container.
+        """
+        container_name = self._free.get()
+        healthy = True
+
+        try:
+            yield container_name
+        except BaseException:
+            healthy = False
+            raise
+        finally:
+            self.release(container_name, healthy)
+
+    def release(self, container_name: str, healthy: bool = True):
+        """
+        Returns a container to the pool, recycling it first if needed.
+
+        Args:
+            container_name (str): The name of the leased container.
+            healthy (bool): False if the run using the container failed unexpectedly.
+        """
+        try:
+            with self._lock:
+                self._runs[container_name] += 1
+                worn_out = (
+                    self.max_runs_per_container is not None
+                    and self._runs[container_name] >= self.max_runs_per_container
+                )
+
+            if not healthy:
+                healthy = self.sandbox.container_healthy(container_name)
+
+            if worn_out or not healthy:
+                self.recycle(container_name)
+        finally:
+            self._free.put(container_name)
+
+    def recycle(self, container_name: str):
+        """
+        Replaces a container with a fresh one created from the image.
+
+        Args:
+            container_name (str): The name of the container to recycle.
+        """
+        logging.info(f"Recycling container {container_name}.")
+
+        self.sandbox.stop_worker(container_name)
+        self.sandbox.remove_container(container_name)
+        self.sandbox.create_container(
+            self.imps_root,
+            container_name,
+            self.outputs_root,
+            self.logs_root,
+            self.resource_limits,
+        )
+        self.sandbox.start_container(container_name)
+
+        with self._lock:
+            self._runs[container_name] = 0
+            test_cases = self._test_cases
+
+        if test_cases is not None:
+            self.sandbox.copy_test_cases(test_cases, container_name)
+
+    def check_health(self) -> dict[str, bool]:
+        """
+        Health-checks the idle containers and recycles the unhealthy ones.
+
+        Returns:
+            dict[str, bool]: Health of each checked container before recycling.
+        """
+        idle = []
+
+        while True:
+            try:
+                idle.append(self._free.get_nowait())
+            except queue.Empty:
+                break
+
+        health = {}
+
+        try:
+            for container_name in idle:
+                health[container_name] = self.sandbox.container_healthy(container_name)
+
+                if not health[container_name]:
+                    self.recycle(container_name)
+        finally:
+            for container_name in idle:
+                self._free.put(container_name)
+
+        return health
+
+
+class ProcessSandbox(DummySandbox):
+    """
+    Sandbox that runs the code in a pool of pre-forked local worker processes.
+    - does not require a container engine, and runs the project as it is on the host
+    - each worker preloads the project once and forks a child per run, like the container worker
+    - runs are limited with rlimits and work in their own scratch directory, but are otherwise not isolated
+      from the host, so this sandbox is meant for trusted code, tests and benchmarks
+    """
+
+    def __init__(
+        self,
+        project_root: HostAbsPath,
+        imps_root: HostAbsPath,
+        eval_relpath: HostRelPath,
+        num_workers: int = 1,
+        pythonpath: HostAbsPath | str = sys.executable,
+        work_root: HostAbsPath | None = None,
+        memory_limit: int | None = None,
+        timeout_grace: float = 10.0,
+        worker_startup_timeout: float = 60.0,
+        use_mmap: bool = False,
+        logs_retention: Retention = Retention.FAILED,
+    ):
+        """
+        Initializes the process sandbox and starts its workers.
+
+        Args:
+            project_root (HostAbsPath): The absolute path to the project root on the host.
+            imps_root (HostAbsPath): The absolute path to the implementations directory on the host (e.g. /tmp/...).
+            eval_relpath (HostRelPath): The path to the evaluation entry point on the host, relative to the project root (e.g. "./eval.py").
+            num_workers (int): Number of worker processes running in parallel.
+            pythonpath (HostAbsPath | str): The Python interpreter to run the workers with. Defaults to the current one.
+            work_root (HostAbsPath | None): The directory for the inputs, outputs, logs and scratch directories of the runs.
+                Defaults to a new temporary directory.
+            memory_limit (int | None): If provided, the maximum address space in bytes of each run.
+            timeout_grace (float): Extra seconds the host waits for a run on top of its timeout before killing its worker.
+            worker_startup_timeout (float): The maximum time in seconds to wait for a worker to load the project.
+            use_mmap (bool): If True, results are read through a memory map.
+            logs_retention (Retention): What to keep of the logs of an implementation once it is evaluated.
+        """
+        super().__init__()
+
+        eval_abspath = project_root / eval_relpath
+
+        # Check that the evaluation entry point is a Python file
+        if not eval_abspath.is_file() or eval_abspath.suffix != ".py":
+            raise ValueError(
+                f"eval_file must be a Python file, got {eval_abspath.suffix}"
+            )
+
+        self.project_root = project_root
+        self.imps_root = imps_root
+        self.eval_relpath = eval_relpath
+        self.pythonpath = pythonpath
+        self.memory_limit = memory_limit
+        self.timeout_grace = timeout_grace
+        self.worker_startup_timeout = worker_startup_timeout
+        self.use_mmap = use_mmap
+        self.logs_retention = logs_retention
+
+        self.work_root = pathlib.Path(work_root or tempfile.mkdtemp(suffix="_sandbox"))
+        self.inputs_root = self.work_root / "inputs"
+        self.outputs_root = self.work_root / "outputs"
+        self.logs_root = self.work_root / "logs"
+        self.scratch_root = self.work_root / "scratch"
+
+        for directory in (self.inputs_root, self.outputs_root, self.logs_root, self.scratch_root):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        # Point the hotswapped functions at the project and implementations on the
+        # host, and let the worker pick the implementation of each run
+        self.env = {
+            **os.environ,
+            WORKSPACE_ROOT_ENVVAR: str(project_root),
+            IMPS_ROOT_ENVVAR: str(imps_root),
+        }
+        self.env.pop(HOTSWAP_ENVVAR, None)
+
+        # Workers are started up front, and restarted when they are killed
+        self._workers: list[LocalWorker | None] = [None] * num_workers
+        self._free: queue.Queue[int] = queue.Queue()
+
+        for index in range(num_workers):
+            self._workers[index] = self._start_worker(index)
+            self._free.put(index)
+
+    def _start_worker(self, index: int) -> LocalWorker:
+        """Starts the worker in a given slot of the pool."""
+        worker_args = [
+            "--eval", self.project_root / self.eval_relpath,
+            "--inputs", self.inputs_root,
+            "--outputs", self.outputs_root,
+            "--logs", self.logs_root,
+            "--workspace", self.project_root,
+            "--scratch", self.scratch_root,
+        ]
+
+        if self.memory_limit is not None:
+            worker_args += ["--memory-limit", self.memory_limit]
+
+        return LocalWorker(
+            worker_args,
+            f"process_{self.sandbox_id}_{index}",
+            env=self.env,
+            pythonpath=self.pythonpath,
+            startup_timeout=self.worker_startup_timeout,
+        )
+
+    @contextmanager
+    def lease(self) -> Iterator[LocalWorker]:
+        """
+        Leases a worker for the duration of the context, blocking until one is free.
+
+        Yields:
+            LocalWorker: The leased worker, restarted first if it is not running.
+        """
+        index = self._free.get()
+
+        try:
+            worker = self._workers[index]
+
+            if worker is None or not worker.alive:
+                self._workers[index] = worker = self._start_worker(index)
+
+            yield worker
+        finally:
+            self._free.put(index)
+
+    def upload_test_cases(self, test_cases: list[TestCase]):
+        """
+        Writes test cases to the inputs directory shared by the workers.
+
+        Args:
+            test_cases (list[TestCase]): List of test cases to upload.
+        """
+        write_test_cases(test_cases, self.inputs_root)
+
+    def run(
+        self,
+        implementation_id: str,
+        test_id: int,
+        timeout: float = 30.0,
+    ) -> EvalResult:
+        """
+        Runs a test case of an implementation in one of the workers.
+
+        Args:
+            implementation_id (str): The ID of the implementation to run.
+            test_id (int): The ID of the test case to execute.
+            timeout (float): The maximum time in seconds to allow for the function execution.
+
+        Returns:
+            EvalResult: The result of the evaluation, containing the output data and exit code.
+        """
+        return self.run_batch(implementation_id, [test_id], timeout)[0]
+
+    def run_batch(
+        self,
+        implementation_id: str,
+        test_ids: list[int],
+        timeout: float = 30.0,
+    ) -> list[EvalResult]:
+        """
+        Runs several test cases of an implementation in a single request to one worker.
+
+        If the worker does not answer within the host-side timeout, it is killed together with
+        its runs, and the test cases without a result are reported with the `EvalStatus.TIMEOUT` status.
+
+        Args:
+            implementation_id (str): The ID of the implementation to run.
+            test_ids (list[int]): The IDs of the test cases to execute.
+            timeout (float): The maximum time in seconds to allow for each test case.
+
+        Returns:
+            list[EvalResult]: The result of each test case, in the order of `test_ids`.
+        """
+        missing = EvalStatus.ERROR
+
+        with self.lease() as worker:
+            try:
+                worker.request_batch(
+                    implementation_id,
+                    test_ids,
+                    timeout,
+                    response_timeout=timeout * len(test_ids) + self.timeout_grace,
+                )
+            except SandboxTimeoutError as e:
+                # The worker was killed, so it gets restarted by the next lease
+                logging.warning(f"{e} Restarting the worker.")
+                missing = EvalStatus.TIMEOUT
+
+        outputs_dir = self.outputs_root / implementation_id
+        eval_results = [
+            _load_result(outputs_dir / f"output_{test_id}.pickle", self.use_mmap, missing)
+            for test_id in test_ids
+        ]
+
+        # The results were read, so only the logs are worth keeping
+        _apply_retention(
+            outputs_dir,
+            self.logs_root / implementation_id,
+            test_ids,
+            eval_results,
+            Retention.DELETE,
+            self.logs_retention,
         )
-        logging.debug(f"Copying output file from container: {cmd}")
-        os.system(cmd)
 
-        # Load the output data from the temporary file
-        with open(output_file.name, "rb") as file:
-            eval_result = pickle.load(file)
+        return eval_results
 
-        # Clean up the temporary file
-        os.remove(output_file.name)
+    def close(self):
+        """Stops the workers."""
+        for worker in self._workers:
+            if worker is not None:
+                worker.close()
 
-        return eval_result
+        self._workers = [None] * len(self._workers)
 
 '''
 def main(workspace_root, implementations_root):
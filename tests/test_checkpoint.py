@@ -0,0 +1,50 @@
+from openevolve.checkpoint import Checkpointer, read_checkpoint
+
+import pytest
+
+def write_snapshot(path):
+    path.mkdir()
+
+def test_checkpointer_survives_failed_snapshots(tmp_path):
+    failures = [OSError("No space left on device")]
+
+    def snapshot(path):
+        if failures:
+            raise failures.pop()
+        write_snapshot(path)
+
+    checkpointer = Checkpointer(tmp_path, snapshot)
+    checkpointer.append((0, 1, "register"))
+
+    with pytest.raises(RuntimeError, match="Failed to write a snapshot") as error:
+        checkpointer.snapshot(wait=True)
+    assert isinstance(error.value.__cause__, OSError)
+
+    # The thread carries on with the events and snapshots after the failure
+    checkpointer.append((0, 2, "register"))
+    checkpointer.snapshot(wait=True)
+    checkpointer.append((0, 3, "register"))
+    checkpointer.close()
+
+    snapshot_path, events = read_checkpoint(tmp_path)
+    assert snapshot_path is not None
+    assert list(events) == [(0, 3, "register")]
+
+def test_checkpointer_skips_unpicklable_events(tmp_path):
+    checkpointer = Checkpointer(tmp_path, write_snapshot)
+    checkpointer.append((0, 1, "register", lambda: None))
+    checkpointer.append((0, 2, "register"))
+    checkpointer.close()
+
+    _, events = read_checkpoint(tmp_path)
+    assert list(events) == [(0, 2, "register")]
+
+def test_snapshot_does_not_wait_for_stopped_checkpointer(tmp_path):
+    # The checkpoint directory cannot be created, so the thread stops at once
+    directory = tmp_path / "file"
+    directory.write_text("")
+    checkpointer = Checkpointer(directory, write_snapshot)
+    checkpointer._WAIT_INTERVAL = 0.01
+
+    with pytest.raises(RuntimeError, match="stopped before the snapshot was written"):
+        checkpointer.snapshot(wait=True)
@@ -0,0 +1,67 @@
+from openevolve import core
+
+import threading
+import time
+
+class FakeSampler:
+    def __init__(self, uid: int, delay: float):
+        self.uid = uid
+        self.delay = delay
+        self.calls = 0
+
+    def sample(self):
+        time.sleep(self.delay)
+        self.calls += 1
+
+class FakeDatabase:
+    def __init__(self):
+        self.backups = 0
+
+    def backup(self):
+        self.backups += 1
+
+def test_runs_each_sampler_for_its_iterations():
+    samplers = [FakeSampler(i, 0.001) for i in range(4)]
+    database = FakeDatabase()
+
+    core.run(samplers, database, iterations=5)
+
+    assert [s.calls for s in samplers] == [5, 5, 5, 5]
+    assert database.backups == 1
+
+def test_fast_sampler_is_not_blocked_by_slow_sampler():
+    finished = []
+
+    class RecordingSampler(FakeSampler):
+        def sample(self):
+            super().sample()
+            finished.append(self.uid)
+
+    slow = RecordingSampler(0, 0.2)
+    fast = RecordingSampler(1, 0.01)
+
+    core.run([slow, fast], FakeDatabase(), iterations=3)
+
+    # In lockstep mode the fast sampler would wait for the slow one every round.
+    assert finished[:3] == [1, 1, 1]
+    assert slow.calls == 3
+
+def test_limits_in_flight_samples():
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    class CountingSampler(FakeSampler):
+        def sample(self):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(self.delay)
+            with lock:
+                active -= 1
+
+    samplers = [CountingSampler(i, 0.01) for i in range(6)]
+    core.run(samplers, FakeDatabase(), iterations=3, max_in_flight=2)
+
+    assert peak <= 2
@@ -0,0 +1,89 @@
+from openevolve.engine_client import CommandResult, EngineClient, EngineError, SubprocessEngineClient
+from openevolve.constants import CONTAINER_IMPS_PATH, SANDBOX_IMAGE_NAME
+from openevolve.sandbox import ContainerSandbox, openevolve_digest
+
+from pathlib import Path
+
+import pytest
+import sys
+
+class FakeEngineClient(EngineClient):
+    """Records engine commands instead of running them."""
+
+    def __init__(self, outputs: dict[str, str] | None = None):
+        super().__init__("fake-engine")
+        self.commands = []
+        self.outputs = outputs or {}
+
+    def _run(self, cmd, timeout, capture_output):
+        self.commands.append(cmd[1:])
+        return CommandResult(cmd, 0, stdout=self.outputs.get(cmd[1], ""))
+
+    def popen(self, args, **kwargs):
+        raise NotImplementedError("The fake engine cannot start long-lived commands")
+
+@pytest.fixture
+def python():
+    return SubprocessEngineClient(sys.executable)
+
+@pytest.fixture
+def fake_engine():
+    previous = ContainerSandbox.client
+    client = FakeEngineClient(outputs={"container": "other_container\nopenevolve_sandbox\n"})
+    ContainerSandbox.use_client(client)
+    yield client
+    ContainerSandbox.use_client(previous)
+
+def test_runs_argv_without_shell(python):
+    result = python.run(["-c", "import sys; print(sys.argv[1:])", "$HOME; true"])
+
+    assert result.ok
+    assert result.stdout.strip() == "['$HOME; true']"
+
+def test_kills_commands_that_time_out(python):
+    result = python.run(["-c", "import time; time.sleep(5)"], timeout=0.2)
+
+    assert result.timed_out
+    assert not result.ok
+
+def test_raises_on_failure_when_checked(python):
+    with pytest.raises(EngineError, match="exited with code 3"):
+        python.run(["-c", "import sys; sys.exit(3)"], check=True)
+
+def test_requires_clients_to_run_commands():
+    class PartialEngineClient(EngineClient):
+        def _run(self, cmd, timeout, capture_output):
+            return CommandResult(cmd, 0)
+
+    with pytest.raises(TypeError, match="popen"):
+        PartialEngineClient("fake-engine")
+
+def test_reports_missing_executable():
+    result = SubprocessEngineClient("openevolve-missing-engine").run(["--version"])
+
+    assert result.returncode == 127
+
+def test_sandbox_uses_pluggable_client(fake_engine):
+    ContainerSandbox.create_container(Path("/tmp/imps"), "box")
+
+    assert fake_engine.commands == [[
+        "create", "-i", "--name", "box",
+        "--mount", f"type=bind,source=/tmp/imps,target={CONTAINER_IMPS_PATH},readonly",
+        f"{SANDBOX_IMAGE_NAME}:latest",
+    ]]
+    assert ContainerSandbox.container_exists("openevolve_sandbox")
+    assert not ContainerSandbox.container_exists("openevolve")
+
+def test_rebuilds_images_of_other_sources():
+    previous = ContainerSandbox.client
+
+    try:
+        ContainerSandbox.use_client(FakeEngineClient(outputs={"image": openevolve_digest() + "\n"}))
+        assert ContainerSandbox.image_up_to_date()
+        assert ContainerSandbox.client.commands[0][:2] == ["image", "inspect"]
+
+        # Images built before the sources were installed from the host have no digest
+        ContainerSandbox.use_client(FakeEngineClient(outputs={"image": "\n"}))
+        assert not ContainerSandbox.image_up_to_date()
+    finally:
+        ContainerSandbox.use_client(previous)
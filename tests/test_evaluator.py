@@ -0,0 +1,343 @@
+from openevolve.evaluator import AbandonedProgram, AsyncEvaluator, EvaluationQueue, ImplementationsManager
+from openevolve.structured_outputs import FunctionImplementation, ProgramImplementation
+from openevolve.code_manipulation import structured_output_to_prog_meta
+from openevolve.custom_types import FuncMeta
+from openevolve.evaluation_cache import EvaluationCache, project_fingerprint
+from openevolve.prescreen import Prescreener, Rejection
+from openevolve.sandbox import DummySandbox
+from openevolve.eval_result import EvalResult
+from openevolve.test_case import TestCase
+
+from pathlib import Path
+
+import threading
+import logging
+import asyncio
+import pytest
+import time
+
+CODE = "def f(x):\n    return x + 1"
+
+@pytest.fixture
+def implementation(tmp_path):
+    ImplementationsManager.set_implementations_root(tmp_path)
+    ImplementationsManager.set_program_meta({
+        "module.py f": FuncMeta(
+            file_path=Path("module.py"),
+            qualname="f",
+            line_no=1,
+            class_name=None,
+            header="def f(x):",
+        )
+    })
+    return ProgramImplementation(
+        functions=[FunctionImplementation(filepath="module.py", qualname="f", code=CODE)]
+    )
+
+class FakeDatabase:
+    def __init__(self):
+        self.registered = []
+
+    def register_program(self, program, island_id, scores_per_test):
+        self.registered.append((program, island_id, scores_per_test))
+
+class FakeSandbox(DummySandbox):
+    def __init__(self, delay: float = 0.0, outputs: dict | None = None, delays: dict | None = None):
+        super().__init__()
+        self.delay = delay
+        self.delays = delays or {}
+        self.outputs = outputs or {}
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        self.batches = []
+
+    def run_batch(self, implementation_id, test_ids, timeout):
+        self.batches.append(test_ids)
+        return super().run_batch(implementation_id, test_ids, timeout)
+
+    def upload_test_cases(self, tests):
+        self.tests = tests
+
+    def run(self, implementation_id, test_id, timeout):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delays.get(test_id, self.delay))
+        with self.lock:
+            self.active -= 1
+        output = self.outputs.get(test_id, float(test_id))
+        return EvalResult(success=output is not None, output=output)
+
+def test_analyse_runs_tests_concurrently(implementation):
+    database = FakeDatabase()
+    sandbox = FakeSandbox(delay=0.05)
+    tests = [TestCase(args=[], kwargs={}) for _ in range(8)]
+    evaluator = AsyncEvaluator(database, sandbox, tests, max_concurrency=4, batch_size=1)
+
+    asyncio.run(evaluator.analyse(implementation, 0, "0"))
+    evaluator.shutdown()
+
+    assert sandbox.peak == 4
+    (program, island_id, scores), = database.registered
+    assert island_id == 0
+    assert scores == {i: float(i) for i in range(8)}
+    assert ImplementationsManager.store.get("0", "module.py f") == "return x + 1"
+
+def test_analyse_times_out_on_host(implementation):
+    database = FakeDatabase()
+    sandbox = FakeSandbox(delay=0.5)
+    tests = [TestCase(args=[], kwargs={})]
+    evaluator = AsyncEvaluator(database, sandbox, tests, timeout=0.01, timeout_grace=0.01)
+
+    asyncio.run(evaluator.analyse(implementation, 0, "0"))
+    evaluator.shutdown()
+
+    assert database.registered == []
+
+def test_analyse_skips_failed_tests(implementation):
+    database = FakeDatabase()
+    sandbox = FakeSandbox(outputs={1: None})
+    tests = [TestCase(args=[], kwargs={}) for _ in range(3)]
+    evaluator = AsyncEvaluator(database, sandbox, tests)
+
+    asyncio.run(evaluator.analyse(implementation, None, "0"))
+    evaluator.shutdown()
+
+    (_, _, scores), = database.registered
+    assert scores == {0: 0.0, 2: 2.0}
+
+def test_analyse_batches_test_cases(implementation):
+    database = FakeDatabase()
+    sandbox = FakeSandbox()
+    tests = [TestCase(args=[], kwargs={}) for _ in range(5)]
+    evaluator = AsyncEvaluator(database, sandbox, tests, batch_size=2)
+
+    asyncio.run(evaluator.analyse(implementation, 0, "0"))
+    evaluator.shutdown()
+
+    assert sorted(sandbox.batches) == [[0, 1], [2, 3], [4]]
+    (_, _, scores), = database.registered
+    assert scores == {i: float(i) for i in range(5)}
+
+class CascadeDatabase(FakeDatabase):
+    def __init__(self, best_scores):
+        super().__init__()
+        self.best_scores = best_scores
+
+    def get_best_scores_per_test(self, island_id):
+        return self.best_scores
+
+def test_cascade_runs_every_test_of_winning_programs(implementation):
+    database = CascadeDatabase({0: 0.0, 1: 1.0, 2: 2.0})
+    sandbox = FakeSandbox()
+    tests = [TestCase(args=[], kwargs={}) for _ in range(3)]
+    evaluator = AsyncEvaluator(database, sandbox, tests, cascade=True)
+
+    asyncio.run(evaluator.analyse(implementation, 0, "0"))
+    evaluator.shutdown()
+
+    assert sandbox.batches == [[0], [1], [2]]
+    (_, _, scores), = database.registered
+    assert scores == {0: 0.0, 1: 1.0, 2: 2.0}
+    assert not evaluator.cascade_exits
+
+@pytest.mark.parametrize("outputs, best_scores, margin, exit_batch", [
+    ({1: None}, {}, 0.0, 1),
+    ({}, {0: 0.0, 1: 2.0, 2: 2.0}, 0.0, 1),
+    ({}, {0: 0.0, 1: 1.5, 2: 5.0}, 0.5, 2),
+])
+def test_cascade_abandons_losing_programs(implementation, outputs, best_scores, margin, exit_batch, caplog):
+    caplog.set_level(logging.INFO)
+    database = CascadeDatabase(best_scores)
+    sandbox = FakeSandbox(outputs=outputs)
+    tests = [TestCase(args=[], kwargs={}) for _ in range(4)]
+    evaluator = AsyncEvaluator(database, sandbox, tests, cascade=True, cascade_margin=margin)
+
+    asyncio.run(evaluator.analyse(implementation, 0, "0"))
+    evaluator.shutdown()
+
+    assert database.registered == []
+    assert sandbox.batches == [[i] for i in range(exit_batch + 1)]
+    assert evaluator.cascade_exits == {exit_batch: 1}
+
+    # The scores of the tests that ran are logged
+    scores = {i: float(i) for i in range(exit_batch + 1) if i not in outputs}
+    assert f"Abandoned implementation 0 of island 0 after batch {exit_batch}, with partial scores {scores}." in caplog.messages
+    assert list(evaluator.abandoned) == [AbandonedProgram("0", 0, exit_batch, scores)]
+
+def test_cascade_runs_every_test_of_initial_program(implementation):
+    database = CascadeDatabase({})
+    sandbox = FakeSandbox(outputs={0: None})
+    tests = [TestCase(args=[], kwargs={}) for _ in range(3)]
+    evaluator = AsyncEvaluator(database, sandbox, tests, cascade=True)
+
+    asyncio.run(evaluator.analyse(implementation, None, "-1"))
+    evaluator.shutdown()
+
+    (_, _, scores), = database.registered
+    assert scores == {1: 1.0, 2: 2.0}
+
+def test_cascade_runs_fastest_tests_first(implementation):
+    database = CascadeDatabase({0: 0.0, 1: 1.0, 2: 2.0})
+    sandbox = FakeSandbox(delays={0: 0.1, 1: 0.05, 2: 0.0})
+    tests = [TestCase(args=[], kwargs={}) for _ in range(3)]
+    evaluator = AsyncEvaluator(database, sandbox, tests, cascade=True)
+
+    # The tests are timed on the initial program
+    asyncio.run(evaluator.analyse(implementation, None, "-1"))
+    assert evaluator.test_order == [2, 1, 0]
+    assert evaluator.test_durations[0] > evaluator.test_durations[1] > evaluator.test_durations[2]
+
+    sandbox.batches.clear()
+    asyncio.run(evaluator.analyse(implementation, 0, "0"))
+    evaluator.shutdown()
+
+    assert sandbox.batches == [[2], [1], [0]]
+
+class FakeEvaluator:
+    def __init__(self):
+        self.analysed = []
+
+    async def analyse(self, implementation, island_id, implementation_id):
+        self.analysed.append(implementation_id)
+
+def test_analyse_reuses_cached_evaluations(implementation, tmp_path):
+    database = FakeDatabase()
+    sandbox = FakeSandbox()
+    tests = [TestCase(args=[i], kwargs={}) for i in range(2)]
+    cache = EvaluationCache(tmp_path / "cache.jsonl")
+    evaluator = AsyncEvaluator(database, sandbox, tests, cache=cache)
+
+    # The same program, formatted differently
+    duplicate = ProgramImplementation(functions=[FunctionImplementation(
+        filepath="module.py", qualname="f", code="def f(x):\n    # Increment\n    return (x + 1)",
+    )])
+
+    asyncio.run(evaluator.analyse(implementation, 0, "0"))
+    asyncio.run(evaluator.analyse(duplicate, 1, "1"))
+    evaluator.shutdown()
+
+    assert sandbox.batches == [[0, 1]]
+    assert [(island_id, scores) for _, island_id, scores in database.registered] == [
+        (0, {0: 0.0, 1: 1.0}),
+        (1, {0: 0.0, 1: 1.0}),
+    ]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # The cache persists, but only for the same tests
+    reopened = EvaluationCache(tmp_path / "cache.jsonl")
+    program = ImplementationsManager.parse_implementation(implementation)
+    assert reopened.get(reopened.key(program, tests)) == {0: 0.0, 1: 1.0}
+    assert reopened.get(reopened.key(program, tests[:1])) is None
+
+def test_cache_is_not_reused_once_project_changes(implementation, tmp_path):
+    project = tmp_path / "project"
+    (project / ".venv").mkdir(parents=True)
+    (project / "eval.py").write_text("SCALE = 1\n")
+    (project / "setup.sh").write_text("true\n")
+    program = ImplementationsManager.parse_implementation(implementation)
+    tests = [TestCase(args=[0], kwargs={})]
+
+    cache = EvaluationCache(tmp_path / "cache.jsonl", context=project_fingerprint(project, ["setup.sh"]))
+    cache.put(cache.key(program, tests), {0: 1.0})
+
+    def cached_scores():
+        cache = EvaluationCache(tmp_path / "cache.jsonl", context=project_fingerprint(project, ["setup.sh"]))
+        return cache.get(cache.key(program, tests))
+
+    # Files outside the sources of the project do not matter
+    (project / ".venv" / "site.py").write_text("")
+    (project / "data.csv").write_text("1\n")
+    assert cached_scores() == {0: 1.0}
+
+    (project / "setup.sh").write_text("pip install numpy\n")
+    assert cached_scores() is None
+
+    (project / "setup.sh").write_text("true\n")
+    (project / "eval.py").write_text("SCALE = 2\n")
+    assert cached_scores() is None
+
+def test_queue_evaluates_every_sample():
+    evaluators = [FakeEvaluator(), FakeEvaluator()]
+    evaluation_queue = EvaluationQueue(evaluators, maxsize=4)
+
+    for i in range(10):
+        evaluation_queue.put(None, 0, str(i))
+
+    evaluation_queue.close()
+
+    analysed = sorted(evaluators[0].analysed + evaluators[1].analysed, key=int)
+    assert analysed == [str(i) for i in range(10)]
+
+    metrics = evaluation_queue.metrics()
+    assert metrics.enqueued == 10
+    assert metrics.processed == 10
+    assert metrics.failed == 0
+
+def test_queue_workers_keep_every_container_busy(implementation):
+    sandbox = FakeSandbox(delay=0.2)
+    # The whole test suite of a sample is a single sandbox round-trip
+    evaluator = AsyncEvaluator(FakeDatabase(), sandbox, [TestCase([], {})] * 2, max_concurrency=4)
+    queue = EvaluationQueue([evaluator], num_workers=4)
+
+    for i in range(4):
+        queue.put(implementation, 0, str(i))
+    queue.close()
+    evaluator.shutdown()
+
+    assert len(sandbox.batches) == 4
+    assert sandbox.peak == 4
+
+def test_queue_applies_backpressure():
+    release = threading.Event()
+
+    class BlockingEvaluator(FakeEvaluator):
+        def analyse(self, implementation, island_id, implementation_id):
+            release.wait()
+
+    evaluation_queue = EvaluationQueue([BlockingEvaluator()], maxsize=1)
+
+    # One sample is held by the worker and one fills the queue.
+    evaluation_queue.put(None, 0, "0")
+    evaluation_queue.put(None, 0, "1")
+
+    producer = threading.Thread(target=evaluation_queue.put, args=(None, 0, "2"))
+    producer.start()
+    time.sleep(0.05)
+    assert producer.is_alive()
+
+    release.set()
+    producer.join(timeout=1)
+    assert not producer.is_alive()
+    evaluation_queue.close()
+
+def test_queue_counts_failures():
+    class FailingEvaluator(FakeEvaluator):
+        async def analyse(self, implementation, island_id, implementation_id):
+            raise RuntimeError("sandbox crashed")
+
+    evaluation_queue = EvaluationQueue([FailingEvaluator()])
+    evaluation_queue.put(None, 0, "0")
+    evaluation_queue.close()
+
+    assert evaluation_queue.metrics().failed == 1
+
+def test_queue_drops_rejected_samples(implementation, tmp_path):
+    (tmp_path / "module.py").write_text(CODE + "\n")
+    prescreener = Prescreener(tmp_path, ImplementationsManager.program_meta)
+    evaluator = FakeEvaluator()
+    evaluation_queue = EvaluationQueue([evaluator], prescreener=prescreener)
+
+    parents = [structured_output_to_prog_meta(implementation, ImplementationsManager.program_meta)]
+
+    assert evaluation_queue.put(implementation, 0, "0")
+    # The same program as its parent
+    assert not evaluation_queue.put(implementation, 0, "1", parents)
+    # A response that could not be parsed
+    assert not evaluation_queue.put(None, 0, "2")
+    evaluation_queue.close()
+
+    assert evaluator.analysed == ["0"]
+    assert evaluation_queue.metrics().rejected == 2
+    assert prescreener.counts == {Rejection.DUPLICATE: 1, Rejection.EMPTY: 1}
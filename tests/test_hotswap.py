@@ -0,0 +1,247 @@
+from openevolve.implementation_store import ImplementationStore
+
+from collections import OrderedDict
+
+import openevolve
+import linecache
+import threading
+import pytest
+import sys
+
+# The package re-exports the decorator under the same name as the module
+hotswap = sys.modules["openevolve.hotswap"]
+
+@openevolve.hotswap
+def g(a, b=2, /, *args, c=3, **kwargs):
+    return None
+
+class Base:
+    def describe(self):
+        return "base"
+
+class Shape(Base):
+    sides = 4
+
+    def __init__(self):
+        self.__secret = 7
+
+    @openevolve.hotswap
+    def area(self, scale=1):
+        return None
+
+    @classmethod
+    @openevolve.hotswap
+    def make(cls):
+        return None
+
+    @staticmethod
+    @openevolve.hotswap
+    def double(x):
+        return None
+
+    @property
+    @openevolve.hotswap
+    def perimeter(self):
+        return None
+
+    # The decorator can also be applied on top of the descriptors
+    @openevolve.hotswap
+    @classmethod
+    def count(cls):
+        return None
+
+    @openevolve.hotswap
+    def describe(self):
+        return None
+
+def make_counter():
+    total = 0
+
+    @openevolve.hotswap
+    def add(x):
+        nonlocal total
+        total += x
+        return total
+
+    return add
+
+@pytest.fixture
+def imps(tmp_path, monkeypatch):
+    module_dir = tmp_path / "imps" / "test_hotswap.py"
+    module_dir.mkdir(parents=True)
+
+    monkeypatch.setattr(hotswap, "CONTAINER_IMPS_PATH", tmp_path / "imps")
+    monkeypatch.setattr(hotswap, "get_relative_path", lambda func, root: "test_hotswap.py")
+    monkeypatch.setattr(hotswap, "_code_cache", OrderedDict())
+    hotswap.reload()
+    return module_dir
+
+@pytest.fixture
+def f(imps):
+    # Every test gets a fresh wrapper, with nothing cached yet
+    @openevolve.hotswap
+    def f(x):
+        return x + 1
+
+    (imps / f"{f.__qualname__} 1").write_text("return 10")
+    (imps / f"{f.__qualname__} 2").write_text("return 20")
+    (imps / f"{f.__qualname__} 3").write_text("return 10")
+    return f
+
+def test_uses_original_without_implementation(f, monkeypatch):
+    monkeypatch.delenv(hotswap.HOTSWAP_ENVVAR, raising=False)
+    assert f(1) == 2
+
+    monkeypatch.setenv(hotswap.HOTSWAP_ENVVAR, "404")
+    assert f(1) == 2
+
+def test_compiles_each_implementation_once(f, monkeypatch):
+    reads = []
+    get_implementation = hotswap.get_implementation
+
+    def counting_get_implementation(func, implementation_id=None):
+        reads.append(implementation_id)
+        return get_implementation(func, implementation_id)
+
+    monkeypatch.setattr(hotswap, "get_implementation", counting_get_implementation)
+
+    for implementation_id, expected in [("1", 10), ("2", 20), ("1", 10), ("3", 10)]:
+        monkeypatch.setenv(hotswap.HOTSWAP_ENVVAR, implementation_id)
+
+        for _ in range(100):
+            assert f(1) == expected
+
+    assert reads == ["1", "2", "3"]
+    # Implementations 1 and 3 share their source, and so their code object
+    assert len(hotswap._code_cache) == 2
+
+def test_thread_context_overrides_process_and_environment(f, monkeypatch):
+    monkeypatch.setenv(hotswap.HOTSWAP_ENVVAR, "1")
+    assert f(1) == 10
+
+    hotswap.activate("2")
+
+    try:
+        assert f(1) == 20
+
+        with hotswap.use_implementation("-1"):
+            assert f(1) == 2
+
+            results = []
+            thread = threading.Thread(target=lambda: results.append(f(1)))
+            thread.start()
+            thread.join()
+
+            # Other threads are not affected
+            assert results == [20]
+
+        assert f(1) == 20
+    finally:
+        hotswap.activate(None)
+
+def test_preloads_and_reloads_implementations(f, monkeypatch):
+    hotswap.preload("1")
+    assert len(hotswap._code_cache) == 1
+
+    path = next(hotswap.CONTAINER_IMPS_PATH.rglob("* 1"))
+    path.write_text("return 11")
+
+    with hotswap.use_implementation("1"):
+        assert f(1) == 10
+
+        hotswap.reload("1")
+        assert f(1) == 11
+
+def test_bounds_compiled_implementations(f, monkeypatch):
+    monkeypatch.setattr(hotswap, "CODE_CACHE_SIZE", 2)
+    filenames = []
+
+    for i in range(5):
+        implementation = hotswap.compile_implementation(f, f"return {i}")
+        assert implementation(1) == i
+        filenames.append(implementation.__code__.co_filename)
+
+    # Only the most recently used implementations and their sources are kept
+    assert len(hotswap._code_cache) == 2
+    assert [filename in linecache.cache for filename in filenames] == [False] * 3 + [True] * 2
+
+    hotswap.compile_implementation(f, "return 3")
+    hotswap.compile_implementation(f, "return 5")
+    assert filenames[3] in linecache.cache
+    assert filenames[4] not in linecache.cache
+
+def test_reload_evicts_unshared_code(f):
+    # Implementations 1 and 3 share their source, and so their code object
+    hotswap.preload("1")
+    hotswap.preload("3")
+    (filename,) = [code.co_filename for code in hotswap._code_cache.values()]
+
+    hotswap.reload("1")
+    assert len(hotswap._code_cache) == 1
+    assert filename in linecache.cache
+
+    hotswap.reload("3")
+    assert len(hotswap._code_cache) == 0
+    assert filename not in linecache.cache
+
+    hotswap.preload("2")
+    hotswap.reload()
+    assert len(hotswap._code_cache) == 0
+    assert not hotswap._implementation_keys
+
+IMPLEMENTATIONS = {
+    "g": "return (a, b, args, c, kwargs)",
+    "Shape.area": "return self.sides * scale * self.__secret",
+    "Shape.make": "return cls.__name__",
+    "Shape.double": "return 2 * x",
+    "Shape.perimeter": "return 4 * self.sides",
+    "Shape.count": "return cls.sides",
+    "Shape.describe": "return 'shape of ' + super().describe()",
+    "make_counter.<locals>.add": "nonlocal total\ntotal += 10 * x\nreturn total",
+}
+
+@pytest.fixture
+def swapped(imps):
+    for qualname, body in IMPLEMENTATIONS.items():
+        (imps / f"{qualname} 5").write_text(body)
+
+    with hotswap.use_implementation("5"):
+        yield
+
+def test_binds_arguments_like_the_original(swapped):
+    assert g(1) == (1, 2, (), 3, {})
+    assert g(1, 5, 6, c=7, d=8) == (1, 5, (6,), 7, {"d": 8})
+
+    with pytest.raises(TypeError):
+        g(a=1)
+
+def test_swaps_methods_and_descriptors(swapped):
+    shape = Shape()
+
+    assert shape.area() == 28
+    assert shape.area(scale=2) == 56
+    assert Shape.make() == "Shape"
+    assert shape.double(3) == 6
+    assert shape.perimeter == 16
+    assert Shape.count() == 4
+    assert shape.describe() == "shape of base"
+
+def test_shares_the_closure_of_the_original(swapped):
+    add = make_counter()
+
+    with hotswap.use_implementation("-1"):
+        assert add(1) == 1
+
+    assert add(1) == 11
+
+def test_reads_implementations_from_store(f, imps, monkeypatch):
+    store = ImplementationStore(imps.parent)
+    store.put("9", {f"test_hotswap.py {f.__qualname__}": "return 90"})
+    monkeypatch.setattr(hotswap, "_stores", {})
+
+    with hotswap.use_implementation("9"):
+        assert f(1) == 90
+
+    # Implementations missing from the store are still read from their own file
+    with hotswap.use_implementation("1"):
+        assert f(1) == 10
@@ -0,0 +1,59 @@
+from openevolve.implementation_store import ImplementationStore, RECORD_HEADER
+
+import pytest
+
+@pytest.fixture
+def writer(tmp_path):
+    return ImplementationStore(tmp_path, gc_min_bytes=0)
+
+def test_reads_implementations_written_by_another_store(writer, tmp_path):
+    reader = ImplementationStore(tmp_path)
+    assert reader.get("1", "module.py f") is None
+
+    writer.put("1", {"module.py f": "return 1", "module.py A.g": "return 'é'"})
+    writer.put("2", {"module.py f": "return 2"})
+
+    assert reader.get("1", "module.py f") == "return 1"
+    assert reader.get("1", "module.py A.g") == "return 'é'"
+    assert reader.get("2", "module.py f") == "return 2"
+    assert reader.get("2", "module.py A.g") is None
+    assert reader.ids() == {"1", "2"}
+
+def test_skips_records_that_are_still_being_written(writer, tmp_path):
+    writer.put("1", {"module.py f": "return 1"})
+
+    # Only the header of the next record made it to the file so far
+    with open(writer.path, "ab") as file:
+        file.write(RECORD_HEADER.pack(1, 11, 8))
+
+    reader = ImplementationStore(tmp_path)
+    assert reader.get("1", "module.py f") == "return 1"
+    assert reader.get("2", "module.py f") is None
+
+    with open(writer.path, "ab") as file:
+        file.write(b"2module.py freturn 2")
+
+    assert reader.get("2", "module.py f") == "return 2"
+
+def test_compacts_discarded_implementations(tmp_path):
+    writer = ImplementationStore(tmp_path, gc_threshold=0.5, gc_min_bytes=0)
+    reader = ImplementationStore(tmp_path)
+
+    for implementation_id in "123":
+        writer.put(implementation_id, {"module.py f": f"return {implementation_id}"})
+
+    assert reader.get("3", "module.py f") == "return 3"
+    size = writer.path.stat().st_size
+
+    # A third of the pack is not enough to compact it
+    writer.discard("1")
+    assert writer.path.stat().st_size == size
+
+    writer.discard("2")
+    assert writer.path.stat().st_size == size // 3
+
+    # The reader keeps what it indexed, and picks up the new pack when it misses
+    assert reader.get("3", "module.py f") == "return 3"
+    writer.put("4", {"module.py f": "return 4"})
+    assert reader.get("4", "module.py f") == "return 4"
+    assert reader.get("1", "module.py f") is None
@@ -0,0 +1,102 @@
+from openevolve.structured_outputs import FunctionImplementation, ProgramImplementation
+from openevolve.code_manipulation import structured_output_to_prog_meta
+from openevolve.prescreen import Prescreener, Rejection
+from openevolve.custom_types import FuncMeta
+
+from pathlib import Path
+
+import pytest
+
+MODULE = """\
+import math
+from collections import Counter as C
+
+LIMIT = 10
+
+if LIMIT:
+    SCALE = 2
+
+def helper(x):
+    local_only = 1
+    return x
+
+def f(x, *, n=1):
+    return x
+"""
+
+@pytest.fixture
+def prescreener(tmp_path):
+    (tmp_path / "module.py").write_text(MODULE)
+    return Prescreener(tmp_path, {
+        "module.py f": FuncMeta(
+            file_path=Path("module.py"),
+            qualname="f",
+            line_no=13,
+            class_name=None,
+            header="def f(x, *, n=1):",
+        )
+    })
+
+def sample(code, qualname="f"):
+    return ProgramImplementation(
+        functions=[FunctionImplementation(filepath="module.py", qualname=qualname, code=code)]
+    )
+
+@pytest.mark.parametrize("code, rejection", [
+    ("def f(x, *, n=1):\n    return math.sqrt(x) * LIMIT * SCALE + helper(n) + len(C())", None),
+    ("def f(x, *, n=1):\n    import numpy as np\n    y = [i for i in range(n)]\n    return np.sum(y) + x", None),
+    ("def f(x, *, n=1):\n    return x +", Rejection.SYNTAX),
+    ("def f(x, *, n=1):\n    return (yield x)\n    nonlocal x", Rejection.SYNTAX),
+    ("def f(y, *, n=1):\n    return y", Rejection.SIGNATURE),
+    ("def f(x, *, n=1):\n    return x\n\ndef g():\n    return 1", Rejection.SIGNATURE),
+    ("def f(x, *, n=1):\n    \"\"\"TODO\"\"\"\n    raise NotImplementedError()", Rejection.STUB),
+    ("def f(x, *, n=1):\n    ...", Rejection.STUB),
+    ("def f(x, *, n=1):\n    return x + local_only", Rejection.UNDEFINED_NAME),
+    ("def f(x, *, n=1):\n    return numpy.sum(x)", Rejection.UNDEFINED_NAME),
+])
+def test_screens_samples(prescreener, code, rejection):
+    assert prescreener.screen(sample(code)) == rejection
+
+def parent(prescreener, code):
+    return structured_output_to_prog_meta(sample(code), prescreener.program_meta)
+
+def test_rejects_unparsed_samples(prescreener):
+    assert prescreener.screen(None) == Rejection.EMPTY
+    assert prescreener.counts == {Rejection.EMPTY: 1}
+
+def test_rejects_duplicates_of_parents_up_to_formatting(prescreener):
+    parents = [
+        parent(prescreener, "def f(x, *, n=1):\n    return x * n"),
+        parent(prescreener, "def f(x, *, n=1):\n    return x - n"),
+    ]
+
+    assert prescreener.screen(sample("def f(x, *, n=1):\n    # Scale\n    return (x *  n)"), parents) == Rejection.DUPLICATE
+    assert prescreener.screen(sample("def f(x, *, n=1):\n    return x - n"), parents) == Rejection.DUPLICATE
+    assert prescreener.screen(sample("def f(x, *, n=1):\n    return x + n"), parents) is None
+
+def test_leaves_repeats_from_other_prompts_to_the_cache(prescreener):
+    # Only the parents of a sample are compared, so repeats are not remembered across prompts
+    assert prescreener.screen(sample("def f(x, *, n=1):\n    return x * n")) is None
+    assert prescreener.screen(sample("def f(x, *, n=1):\n    return x * n")) is None
+
+def test_counts_rejections(prescreener):
+    parents = [parent(prescreener, "def f(x, *, n=1):\n    return x")]
+
+    for code in ["def f(x, *, n=1):\n    return x + 1", "def f(x, *, n=1):\n    return x", "def f(:"]:
+        prescreener.screen(sample(code), parents)
+
+    assert prescreener.accepted == 1
+    assert prescreener.counts == {Rejection.DUPLICATE: 1, Rejection.SYNTAX: 1}
+
+def test_skips_name_check_without_module(tmp_path):
+    prescreener = Prescreener(tmp_path, {
+        "module.py f": FuncMeta(
+            file_path=Path("module.py"),
+            qualname="f",
+            line_no=1,
+            class_name=None,
+            header="def f(x):",
+        )
+    })
+
+    assert prescreener.screen(sample("def f(x):\n    return unknown(x)")) is None
@@ -0,0 +1,489 @@
+from openevolve.programs_database import (
+    Cluster, EvictionPolicy, Island, NoveltyIndex, ProgramsDatabase, ProgramTable, TEMPERATURE_STEPS
+)
+from openevolve.program_store import ProgramStore
+from openevolve.code_manipulation import Program
+from openevolve import config, program_store
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+import threading
+import pickle
+import json
+
+def make_program(code):
+    program = Program.from_code(code)
+    for function in program.functions:
+        function.path = "module.py"
+    return program
+
+def test_cluster_grows_past_initial_capacity():
+    cluster = Cluster(1.0, 0, 2)
+
+    for i in range(1, 100):
+        cluster.register_program(i, i)
+
+    assert len(cluster) == 100
+    assert list(cluster) == [(0, 2)] + [(i, i) for i in range(1, 100)]
+    assert cluster.sample_program() in range(100)
+
+def test_cluster_prefers_shorter_programs():
+    np.random.seed(0)
+    cluster = Cluster(1.0, 0, 5)
+    cluster.register_program(1, 500)
+
+    samples = [cluster.sample_program() for _ in range(2000)]
+    # softmax([0, -1]) puts about 73% of the mass on the shortest program
+    assert 0.68 < samples.count(0) / len(samples) < 0.78
+
+def test_cluster_resamples_after_insert():
+    cluster = Cluster(1.0, 0, 1)
+    assert cluster.sample_program() == 0
+
+    cluster.register_program(1, 1)
+    assert {cluster.sample_program() for _ in range(100)} == {0, 1}
+
+def test_cluster_evicts_longest_program():
+    cluster = Cluster(1.0, 0, 5)
+    assert cluster.register_program(1, 9, capacity=2) is None
+    assert cluster.register_program(2, 3, capacity=2) == 1
+    # A new program that is the longest is not kept
+    assert cluster.register_program(3, 7, capacity=2) == 3
+    assert list(cluster) == [(0, 5), (2, 3)]
+
+def test_cluster_evicts_oldest_program():
+    cluster = Cluster(1.0, 0, 1)
+    for i in range(1, 5):
+        cluster.register_program(i, 1, capacity=2, policy=EvictionPolicy.OLDEST)
+    assert list(cluster) == [(3, 1), (4, 1)]
+    assert cluster.sample_program() in {3, 4}
+
+def test_cluster_samples_reservoir_uniformly():
+    np.random.seed(0)
+    kept = np.zeros(10)
+    for _ in range(1000):
+        cluster = Cluster(1.0, 0, 1)
+        for i in range(1, 10):
+            cluster.register_program(i, 1, capacity=3, policy=EvictionPolicy.RESERVOIR)
+        assert len(cluster) == 3
+        kept[[program_id for program_id, _ in cluster]] += 1
+    # Every program is kept with probability 3 / 10
+    assert np.all(np.abs(kept / 1000 - 0.3) < 0.06)
+
+def test_program_table_interns_by_content():
+    table = ProgramTable()
+    program = make_program("def f(x):\n    return 1\n")
+    same = make_program("def f(x):\n    return 1\n")
+    other = make_program("def f(x):\n    return 2\n")
+
+    ids = [table.intern(program), table.intern(same), table.intern(program), table.intern(other)]
+
+    assert ids == [0, 0, 0, 1]
+    assert len(table) == 2
+    assert table.get(0) is program
+    assert table.length(0) == len(str(program))
+
+    # Programs are dropped with their last reference
+    table.release([0, 0, 1])
+    assert len(table) == 1
+    table.release([0])
+    assert len(table) == 0
+    assert table.intern(same) == 2
+    assert table.get(2) is same
+
+def test_program_table_hashes_outside_lock(monkeypatch):
+    table = ProgramTable()
+    encode_program = program_store.encode_program
+
+    def encode_unlocked(program):
+        assert not table._lock.locked()
+        return encode_program(program)
+
+    monkeypatch.setattr(program_store, "encode_program", encode_unlocked)
+    programs = [make_program(f"def f(x):\n    return {i % 10}\n") for i in range(200)]
+
+    with ThreadPoolExecutor(8) as executor:
+        ids = list(executor.map(table.intern, programs))
+
+    # Equal programs interned concurrently still share an ID
+    assert len(table) == 10
+    assert len(set(ids)) == 10
+    assert all(ids[i] == ids[i % 10] for i in range(200))
+    table.release(ids)
+    assert len(table) == 0
+
+def make_island(**kwargs):
+    kwargs = {
+        "functions_per_prompt": 2,
+        "cluster_sampling_temperature_init": 0.1,
+        "cluster_sampling_temperature_period": 30_000,
+    } | kwargs
+    island = Island(None, "", **kwargs)
+    island._generate_prompt = lambda implementations: [str(program) for program in implementations]
+    return island
+
+def code(i):
+    return f"def f(x):\n    return {i}\n"
+
+def test_island_samples_clusters_by_score():
+    np.random.seed(0)
+    island = make_island(functions_per_prompt=1, cluster_sampling_temperature_init=1.0)
+    island.register_program(make_program(code(0)), {0: 0.0})
+    island.register_program(make_program(code(1)), {0: 1.0})
+    island.register_program(make_program(code(2)), {0: 1.0})
+
+    samples = [island.get_prompt()[0][0] for _ in range(2000)]
+    # softmax([0, 1]) puts about 73% of the mass on the best cluster
+    assert 0.68 < (len(samples) - samples.count(code(0))) / len(samples) < 0.78
+    assert list(island._scores[: len(island._signatures)]) == [0.0, 1.0]
+
+def test_island_grows_past_initial_capacity():
+    island = make_island(cluster_sampling_temperature_init=1000.0)
+
+    for i in range(100):
+        island.register_program(make_program(code(i)), {0: float(i)})
+
+    prompt, version_generated, parents = island.get_prompt()
+    assert version_generated == 3
+    assert set(prompt) <= {code(i) for i in range(100)}
+    assert [str(program) for program in parents] == prompt
+    assert len(island._signatures) == 100
+
+def test_island_recomputes_probabilities_lazily():
+    island = make_island()
+    island.register_program(make_program(code(0)), {0: 0.0})
+    island.get_prompt()
+    cumulative = island._cumulative_probabilities
+
+    island.get_prompt()
+    assert island._cumulative_probabilities is cumulative
+
+    # Registering a program in an existing cluster keeps the temperature within its step
+    island.register_program(make_program(code(1)), {0: 0.0})
+    island.get_prompt()
+    assert island._cumulative_probabilities is cumulative
+
+    # A new cluster changes the probabilities
+    island.register_program(make_program(code(2)), {0: 1.0})
+    island.get_prompt()
+    assert island._cumulative_probabilities is not cumulative
+
+def test_island_steps_temperature_down():
+    island = make_island(cluster_sampling_temperature_init=1.0, cluster_sampling_temperature_period=1000)
+    island.register_program(make_program(code(0)), {0: 0.0})
+    temperatures = []
+
+    # Up to the end of the period, after which the temperature starts over
+    for i in range(1, 999):
+        island.register_program(make_program(code(i % 2)), {0: 0.0})
+        island.get_prompt()
+        temperatures.append(island._probabilities_temperature)
+
+    # The temperature decays in TEMPERATURE_STEPS steps over a period
+    assert len(set(temperatures)) == TEMPERATURE_STEPS
+    assert temperatures == sorted(temperatures, reverse=True)
+    assert temperatures[0] == 1.0
+    assert temperatures[-1] == pytest.approx(1.0 / TEMPERATURE_STEPS)
+
+def test_island_loads_legacy_pickles():
+    island = make_island()
+    island.register_program(make_program(code(0)), {0: 0.0})
+    island.register_program(make_program(code(1)), {0: 1.0})
+
+    # Islands from before clusters were indexed, and held their programs
+    state = {
+        key: value for key, value in island.__dict__.items()
+        if key not in {"_signatures", "_scores", "_cumulative_probabilities", "_probabilities_temperature", "_program_table", "_generate_prompt"}
+    }
+    for cluster in state["_clusters"].values():
+        cluster._programs = [island._program_table.get(program_id) for program_id, _ in cluster]
+        cluster._lengths = cluster._lengths[: len(cluster)].tolist()
+        del cluster._program_ids, cluster._size, cluster._cumulative_probabilities
+
+    restored = Island.__new__(Island)
+    restored.__setstate__(pickle.loads(pickle.dumps(state)))
+    restored._generate_prompt = island._generate_prompt
+
+    assert restored._signatures == [(0.0,), (1.0,)]
+    assert len(restored._program_table) == 2
+    assert set(restored.get_prompt()[0]) <= {code(0), code(1)}
+
+def test_island_evicts_least_novel_cluster():
+    island = make_island(max_clusters=3, cluster_eviction_policy=EvictionPolicy.LOWEST_NOVELTY)
+    island.register_program(make_program(code(0)), {0: 0.0, 1: 0.0})
+    island.register_program(make_program(code(1)), {0: 5.0, 1: 5.0})
+    island.register_program(make_program(code(2)), {0: 0.0, 1: 9.0})
+    # Closest to the first cluster, and worse than it
+    island.register_program(make_program(code(3)), {0: 0.0, 1: -1.0})
+
+    assert island._signatures == [(0.0, 0.0), (5.0, 5.0), (0.0, 9.0)]
+    assert list(island._scores[:3]) == [0.0, 5.0, 9.0]
+    assert island.evictions == {"clusters": 1, "programs": 1}
+    # The programs of evicted clusters leave the program table
+    assert len(island._program_table) == 3
+    assert set(island.get_prompt()[0]) <= {code(0), code(1), code(2)}
+
+def test_island_evicts_by_novelty_with_ragged_signatures():
+    island = make_island(max_clusters=2, cluster_eviction_policy=EvictionPolicy.LOWEST_NOVELTY)
+    island.register_program(make_program(code(0)), {0: 0.0, 1: 0.0})
+    # Failed test 1, so it is further from the others than any difference of scores
+    island.register_program(make_program(code(1)), {0: 0.0})
+    island.register_program(make_program(code(2)), {0: 1.0, 1: 9.0})
+
+    assert island._signatures == [(0.0,), (1.0, 9.0)]
+    assert island._clusters[(0.0,)].tests == (0,)
+    assert island.evictions == {"clusters": 1, "programs": 1}
+
+def brute_force_novelty(signatures):
+    def distance(a, b):
+        shared = a.keys() & b.keys()
+        return len(a.keys() ^ b.keys()), sum(abs(a[test] - b[test]) for test in shared)
+
+    return [
+        min(distance(a, b) for j, b in enumerate(signatures) if j != i)
+        for i, a in enumerate(signatures)
+    ]
+
+def test_novelty_index_updates_nearest_neighbours_incrementally():
+    rng = np.random.default_rng(0)
+    index = NoveltyIndex()
+    signatures = []
+
+    for step in range(200):
+        if len(signatures) > 2 and rng.random() < 0.4:
+            removed = int(rng.integers(len(signatures)))
+            index.remove(removed)
+            del signatures[removed]
+        else:
+            tests = [test for test in range(5) if rng.random() < 0.8]
+            signature = {test: float(rng.integers(4)) for test in tests}
+            index.add(signature)
+            signatures.append(signature)
+
+        if len(signatures) > 1:
+            novelty = list(zip(index._mismatches[: len(index)].tolist(), index._distances[: len(index)].tolist()))
+            assert novelty == brute_force_novelty(signatures)
+
+def test_island_never_evicts_best_cluster():
+    for policy in (EvictionPolicy.OLDEST, EvictionPolicy.LOWEST_NOVELTY, EvictionPolicy.RESERVOIR):
+        island = make_island(max_clusters=2, cluster_eviction_policy=policy)
+        island.register_program(make_program(code(0)), {0: 10.0})
+        for i in range(1, 20):
+            island.register_program(make_program(code(i)), {0: float(i % 5)})
+
+        assert len(island._clusters) == 2
+        assert (10.0,) in island._clusters
+        assert island.evictions["clusters"] >= 4
+
+def test_prompt_joins_cached_renderings():
+    program = Program.from_code("def f(x):\n    return x + 1\n\nclass A:\n    def g(self):\n        return 2\n")
+    island = Island(None, "tree", 2, 0.1, 30_000)
+
+    prompt = island._generate_prompt([program, program])
+
+    assert prompt == (
+        "# File Hierarchy \ntree\n\n"
+        "# Start of Program  Version 0 (*_v0)\n"
+        "#None: f (Decorator.NONE\n)\ndef f_v0(x):\n    return x + 1\n\n"
+        "#None: A.g (Decorator.NONE\n)\ndef g_v0(self):\n    return 2\n\n"
+        "# End of Program Version 0\n\n"
+        "# Start of Program  Version 1 (*_v1)\n"
+        "# This is an improved version of the previous program (*_v0)\n\n"
+        "#None: f (Decorator.NONE\n)\ndef f_v1(x):\n    return x + 1\n\n"
+        "#None: A.g (Decorator.NONE\n)\ndef g_v1(self):\n    return 2\n\n"
+        "# End of Program Version 1\n\n"
+    )
+    assert program.to_prompt(1) is program.to_prompt(1)
+    # Programs are not copied, and the cached renderings are not persisted
+    assert str(program.functions[0]) == "def f(x):\n    return x + 1\n"
+    assert pickle.loads(pickle.dumps(program))._renderings == {}
+
+def make_database(tmp_path, **kwargs):
+    database_config = config.ProgramsDatabaseConfig(backup_folder=str(tmp_path), **kwargs)
+    return ProgramsDatabase(database_config, make_program("def f(x):\n    return x\n"))
+
+def test_database_registers_and_prompts_concurrently(tmp_path):
+    database = make_database(tmp_path, num_islands=4)
+    programs = [make_program(f"def f(x):\n    return x + {i}\n") for i in range(400)]
+    database.register_program(programs[0], None, {0: 0.0})
+
+    def work(i):
+        database.get_prompt()
+        database.register_program(programs[i], i % 4, {0: float(i % 7), 1: float(i)})
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(work, range(1, 400)))
+
+    assert sum(island._num_programs for island in database._islands) == 4 + 399
+    for island_id, island in enumerate(database._islands):
+        best = max(i for i in range(1, 400) if i % 4 == island_id)
+        assert database._best_score_per_island[island_id] == best
+        assert len(island._signatures) == len(island._clusters)
+
+def test_database_resets_islands_while_registering(tmp_path):
+    database = make_database(tmp_path, num_islands=4)
+    programs = [make_program(f"def f(x):\n    return x + {i}\n") for i in range(4)]
+    for island_id, program in enumerate(programs):
+        database.register_program(program, island_id, {0: float(island_id)})
+
+    threads = [threading.Thread(target=database.reset_islands) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for island_id in range(4):
+        database.get_prompt()
+        database.register_program(programs[island_id], island_id, {0: float(island_id)})
+    for thread in threads:
+        thread.join()
+
+    # The weaker islands were seeded with the best program of a stronger one
+    assert min(database._best_score_per_island) >= 2.0
+    assert max(database._best_score_per_island) == 3.0
+    for island in database._islands:
+        assert len(island._signatures) == len(island._clusters)
+
+def test_database_saves_and_loads(tmp_path):
+    database = make_database(tmp_path, num_islands=2)
+    database.register_program(make_program("def f(x):\n    return 1\n"), 1, {0: 1.0})
+
+    database.save(tmp_path / "store")
+
+    restored = make_database(tmp_path, num_islands=2)
+    restored.load(tmp_path / "store")
+
+    assert restored._best_score_per_island == [-float("inf"), 1.0]
+    assert restored._best_scores_per_test_per_island == [None, {0: 1.0}]
+    assert restored._islands[1]._num_programs == 1
+    assert str(restored._best_program_per_island[1]) == "def f(x):\n    return 1\n"
+    assert restored._islands[1]._clusters[(1.0,)].tests == (0,)
+
+def test_database_loads_legacy_pickles(tmp_path):
+    database = make_database(tmp_path, num_islands=2)
+    database.register_program(make_program("def f(x):\n    return 1\n"), 1, {0: 1.0})
+    keys = ["_islands", "_best_score_per_island", "_best_program_per_island", "_best_scores_per_test_per_island"]
+    with open(tmp_path / "db.pickle", "wb") as file:
+        pickle.dump({key: getattr(database, key) for key in keys}, file)
+
+    restored = make_database(tmp_path, num_islands=2)
+    restored.load(tmp_path / "db.pickle")
+
+    assert restored._best_score_per_island == [-float("inf"), 1.0]
+    assert restored._island_versions == [0, 0]
+
+def test_store_reads_columns_and_code_lazily(tmp_path):
+    database = make_database(tmp_path, num_islands=2)
+    programs = [make_program(f"def f(x):\n    return {i}\n") for i in range(3)]
+    database.register_program(programs[0], None, {0: 0.0, 1: 5.0})
+    database.register_program(programs[1], 1, {0: 1.0, 1: 6.0})
+    database.register_program(programs[2], 1, {0: 0.0, 1: 6.0})
+    database.reset_islands()
+    database.save(tmp_path / "store")
+
+    store = ProgramStore(tmp_path / "store")
+    assert isinstance(store.score, np.memmap)
+    assert len(store) == len(store.island)
+    # Island 0 was reset with the best program of island 1, which is stored once for both
+    assert store.island.tolist() == [0, 1, 1, 1]
+    assert store.num_programs == 3
+    for row in range(len(store)):
+        assert store.signature(row) in {(0.0, 5.0), (1.0, 6.0), (0.0, 6.0)}
+        assert store.length[row] == len(str(store.program(store.program_id[row])))
+    store.close()
+
+def test_store_rejects_other_formats(tmp_path):
+    database = make_database(tmp_path)
+    database.register_program(make_program("def f(x):\n    return 0\n"), None, {0: 0.0})
+    database.save(tmp_path / "store")
+
+    meta_path = tmp_path / "store" / "meta.json"
+    meta = json.loads(meta_path.read_text())
+    meta_path.write_text(json.dumps(meta | {"format_version": 2}))
+
+    with pytest.raises(ValueError, match="Unsupported program store format 2"):
+        ProgramStore(tmp_path / "store")
+
+def test_database_interns_programs_across_islands(tmp_path):
+    database = make_database(tmp_path, num_islands=4)
+    program = make_program("def f(x):\n    return 1\n")
+    database.register_program(program, None, {0: 0.0})
+    database.register_program(make_program("def f(x):\n    return 1\n"), 1, {0: 1.0})
+
+    # The initial program is registered in every island, and the equal program shares its entry
+    assert len(database._program_table) == 1
+
+    database.register_program(make_program("def f(x):\n    return 2\n"), 2, {0: 2.0})
+    database.register_program(make_program("def f(x):\n    return 3\n"), 3, {0: 3.0})
+    assert len(database._program_table) == 3
+
+    # Resetting islands 0 and 1 releases their programs, but not the ones shared with the others
+    database.reset_islands()
+    database.close()
+    assert len(database._program_table) == 3
+    assert min(database._best_score_per_island) >= 2.0
+
+def test_database_bounds_islands_and_counts_evictions(tmp_path):
+    database = make_database(
+        tmp_path, num_islands=2, max_programs_per_cluster=2, max_clusters_per_island=3
+    )
+    database.register_program(make_program("def f(x):\n    return 0\n"), None, {0: 0.0})
+    for i in range(1, 11):
+        database.register_program(make_program(f"def f(x):\n    return {i}\n"), 0, {0: float(i % 5)})
+    database.close()
+
+    island = database._islands[0]
+    assert len(island._clusters) == 3
+    assert all(len(cluster) <= 2 for cluster in island._clusters.values())
+    assert database._best_score_per_island[0] == 4.0
+    assert database.get_eviction_counts() == island.evictions
+    assert island.evictions["programs"] == 11 - sum(len(cluster) for cluster in island._clusters.values())
+    # Only the programs still held by a cluster of either island are kept
+    held = {program_id for island in database._islands for cluster in island._clusters.values() for program_id, _ in cluster}
+    assert len(database._program_table) == len(held)
+
+def test_database_rejects_unsupported_eviction_policies(tmp_path):
+    with pytest.raises(ValueError, match="cluster_eviction_policy"):
+        make_database(tmp_path, cluster_eviction_policy="longest")
+    with pytest.raises(ValueError, match="max_programs_per_cluster"):
+        make_database(tmp_path, max_programs_per_cluster=0)
+
+def test_database_restores_snapshot_and_log(tmp_path):
+    database = make_database(tmp_path, num_islands=2, backup_period=3)
+    programs = [make_program(f"def f(x):\n    return x + {i}\n") for i in range(5)]
+
+    database.register_program(programs[0], None, {0: 0.0})
+    for i in range(1, 5):
+        database.register_program(programs[i], i % 2, {0: float(i)})
+    database.reset_islands()
+    database.close()
+
+    checkpoint_dir = tmp_path / "program_db_"
+    # One snapshot after three registrations, and the events since in the last segment
+    assert len(list(checkpoint_dir.glob("snapshot_*"))) == 1
+    assert len(list(checkpoint_dir.glob("events_*.log"))) == 1
+
+    restored = make_database(tmp_path / "restored", num_islands=2)
+    restored.load(checkpoint_dir)
+    restored.close()
+
+    assert restored._best_score_per_island == database._best_score_per_island
+    assert restored._island_versions == database._island_versions
+    for island, restored_island in zip(database._islands, restored._islands):
+        assert restored_island._num_programs == island._num_programs
+        assert restored_island._signatures == island._signatures
+
+def test_database_skips_truncated_events(tmp_path):
+    database = make_database(tmp_path, num_islands=1)
+    database.register_program(make_program("def f(x):\n    return 1\n"), 0, {0: 1.0})
+    database.register_program(make_program("def f(x):\n    return 2\n"), 0, {0: 2.0})
+    database.close()
+
+    segment, = (tmp_path / "program_db_").glob("events_*.log")
+    segment.write_bytes(segment.read_bytes()[:-5])
+
+    restored = make_database(tmp_path / "restored", num_islands=1)
+    restored.load(tmp_path / "program_db_")
+    restored.close()
+
+    assert restored._best_score_per_island == [1.0]
+    assert restored._island_versions == [1]
@@ -1,9 +1,28 @@
-from openevolve.sandbox import ContainerSandbox, ContainerEngine, DummySandbox
+from openevolve.sandbox import (
+    ContainerSandbox,
+    ContainerEngine,
+    ContainerPool,
+    ContainerWorker,
+    DummySandbox,
+    KILLED_EXITCODE,
+    ProcessSandbox,
+    ResourceLimits,
+    Retention,
+    SandboxTimeoutError,
+    TIMEOUT_EXITCODE,
+    _killed_status,
+)
+from openevolve.eval_result import EvalResult, EvalStatus
+from openevolve.evaluator import ImplementationsManager
+from openevolve.code_manipulation import Program
+from openevolve.test_case import TestCase
 from openevolve.constants import SANDBOX_IMAGE_NAME, SANDBOX_CONTAINER_NAME
 from openevolve.custom_types import HostAbsPath, HostRelPath
 
 from pathlib import Path
 
+import cloudpickle as pickle
+import threading
 import tempfile
 import pathlib
 import pytest
@@ -12,12 +31,18 @@ import os
 
 os.environ["PATH"] = "/opt/homebrew/bin/:" + os.environ["PATH"]
 
+requires_engine = pytest.mark.skipif(
+    not any(ContainerSandbox.has_engine(engine) for engine in ContainerEngine),
+    reason="requires Podman or Docker",
+)
+
 @pytest.fixture(autouse=True)
 def reset_sandbox_id():
     DummySandbox.sandboxes = 0
     yield
     DummySandbox.sandboxes = 0
 
+@requires_engine
 def test_builds_image():
     # Get the path to the project root
     project_root: HostAbsPath = Path("/Users/ryanrudes/GitHub/OpenEvolve/astropy")
@@ -34,11 +59,335 @@ def test_builds_image():
         setup_relpath=setup_path,
     )
 
+@requires_engine
 def test_creates_sandbox():
     # Create temporary directory to store implementations
     imps_root: HostAbsPath = Path("/Users/ryanrudes/GitHub/OpenEvolve/openevolve/imps")
 
     ContainerSandbox.create_container(imps_root)
 
+@requires_engine
 def test_starts_sandbox():
-    ContainerSandbox.start_container()
\ No newline at end of file
+    ContainerSandbox.start_container()
+
+class FakeContainerSandbox:
+    """Records the container operations issued by a ContainerPool."""
+
+    def __init__(self, unhealthy: set[str] | None = None):
+        self.calls = []
+        self.unhealthy = unhealthy or set()
+
+    def container_exists(self, container_name):
+        return False
+
+    def container_healthy(self, container_name):
+        self.calls.append(("health", container_name))
+        return container_name not in self.unhealthy
+
+    def remove_container(self, container_name):
+        self.calls.append(("remove", container_name))
+
+    def create_container(self, imps_root, container_name, outputs_root=None, logs_root=None, resource_limits=None):
+        self.calls.append(("create", container_name))
+
+    def start_container(self, container_name):
+        self.calls.append(("start", container_name))
+
+    def copy_test_cases(self, test_cases, container_name):
+        self.calls.append(("upload", container_name))
+
+    def stop_worker(self, container_name):
+        self.calls.append(("stop", container_name))
+
+def test_pool_leases_distinct_containers():
+    fake = FakeContainerSandbox()
+    pool = ContainerPool(fake, ["a", "b"], Path("/tmp/imps"))
+    pool.start()
+    pool.set_test_cases([])
+
+    assert ("create", "a") in fake.calls and ("create", "b") in fake.calls
+    assert ("upload", "a") in fake.calls and ("upload", "b") in fake.calls
+
+    with pool.lease() as first, pool.lease() as second:
+        assert {first, second} == {"a", "b"}
+
+def test_pool_recycles_unhealthy_and_worn_out_containers():
+    fake = FakeContainerSandbox(unhealthy={"a"})
+    pool = ContainerPool(fake, ["a"], Path("/tmp/imps"), max_runs_per_container=2)
+    pool.start()
+    pool.set_test_cases([])
+    fake.calls.clear()
+
+    with pytest.raises(RuntimeError):
+        with pool.lease():
+            raise RuntimeError("run failed")
+
+    assert fake.calls == [
+        ("health", "a"),
+        ("stop", "a"),
+        ("remove", "a"),
+        ("create", "a"),
+        ("start", "a"),
+        ("upload", "a"),
+    ]
+
+    fake.calls.clear()
+    with pool.lease():
+        pass
+    assert fake.calls == []
+
+    with pool.lease():
+        pass
+    assert ("create", "a") in fake.calls
+
+class FakeWorker:
+    """Writes results directly to the bind-mounted outputs directory."""
+
+    alive = True
+
+    def __init__(self, outputs_root, logs_root, outputs, hangs_on=None):
+        self.outputs_root = outputs_root
+        self.logs_root = logs_root
+        self.outputs = outputs
+        self.hangs_on = hangs_on
+
+    def request_batch(self, implementation_id, test_ids, timeout, response_timeout=None):
+        for test_id in test_ids:
+            if test_id == self.hangs_on:
+                raise SandboxTimeoutError(f"Worker did not respond within {response_timeout} seconds.")
+
+            output = self.outputs[test_id]
+            output_path = self.outputs_root / implementation_id / f"output_{test_id}.pickle"
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            (self.logs_root / implementation_id / f"test_{test_id}").mkdir(parents=True)
+
+            with open(output_path, "wb") as file:
+                pickle.dump(EvalResult(success=output is not None, output=output), file)
+
+def make_mounted_sandbox(tmp_path, outputs, **kwargs):
+    # Bypass __init__, which needs a container engine to build the image
+    sandbox = object.__new__(ContainerSandbox)
+    sandbox.outputs_root = tmp_path / "outputs"
+    sandbox.logs_root = tmp_path / "logs"
+    sandbox.mount_outputs = True
+    sandbox.use_worker = True
+    sandbox.use_mmap = kwargs.get("use_mmap", False)
+    sandbox.outputs_retention = kwargs.get("outputs_retention", Retention.DELETE)
+    sandbox.logs_retention = kwargs.get("logs_retention", Retention.FAILED)
+    sandbox.timeout_grace = 1.0
+    sandbox.pool = ContainerPool(kwargs.get("engine", FakeContainerSandbox()), ["a"], tmp_path / "imps")
+    sandbox.pool.start()
+    sandbox._workers_lock = threading.Lock()
+    sandbox._workers = {
+        "a": FakeWorker(sandbox.outputs_root, sandbox.logs_root, outputs, kwargs.get("hangs_on"))
+    }
+    return sandbox
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_reads_results_from_mounted_outputs(tmp_path, use_mmap):
+    sandbox = make_mounted_sandbox(tmp_path, {0: 1.5, 1: None}, use_mmap=use_mmap)
+
+    results = sandbox.run_batch("imp", [0, 1])
+
+    assert results == [EvalResult(True, 1.5), EvalResult(False, None)]
+
+def test_applies_retention_to_mounted_outputs(tmp_path):
+    sandbox = make_mounted_sandbox(tmp_path, {0: 1.5, 1: None})
+
+    sandbox.run_batch("imp", [0, 1])
+
+    # Outputs are deleted, and only the logs of the failed test are kept
+    assert not (tmp_path / "outputs" / "imp").exists()
+    assert not (tmp_path / "logs" / "imp" / "test_0").exists()
+    assert (tmp_path / "logs" / "imp" / "test_1").exists()
+
+def test_recycles_container_when_worker_times_out(tmp_path):
+    engine = FakeContainerSandbox()
+    sandbox = make_mounted_sandbox(
+        tmp_path, {0: 1.5, 1: 2.5}, engine=engine, hangs_on=1, outputs_retention=Retention.KEEP
+    )
+    engine.calls.clear()
+
+    results = sandbox.run_batch("imp", [0, 1])
+
+    # The finished test keeps its result, the hung one is reported as a timeout
+    assert results == [EvalResult(True, 1.5), EvalResult(False, None, EvalStatus.TIMEOUT)]
+    assert ("remove", "a") in engine.calls and ("create", "a") in engine.calls
+
+def test_reports_runs_killed_without_worker(tmp_path):
+    sandbox = make_mounted_sandbox(tmp_path, {0: 1.5})
+    sandbox.use_worker = False
+    worker = sandbox._workers["a"]
+
+    def execute(implementation_id, test_id, timeout, container_name):
+        # Test 1 is killed by the OOM killer, before the timeout, and leaves no output
+        if test_id == 1:
+            return None, KILLED_EXITCODE
+
+        worker.request_batch(implementation_id, [test_id], timeout)
+        return None, 0
+
+    sandbox.execute = execute
+
+    assert sandbox.run_batch("imp", [0, 1]) == [
+        EvalResult(True, 1.5), EvalResult(False, None, EvalStatus.OOM)
+    ]
+    # No output at all is not a failure of the container when the runs were killed
+    assert sandbox.run_batch("imp", [1]) == [EvalResult(False, None, EvalStatus.OOM)]
+
+@pytest.mark.parametrize("returncode, elapsed, status", [
+    (0, 1.0, None),
+    (1, 1.0, None),
+    (TIMEOUT_EXITCODE, 5.0, EvalStatus.TIMEOUT),
+    (KILLED_EXITCODE, 5.0, EvalStatus.TIMEOUT),
+    (KILLED_EXITCODE, 1.0, EvalStatus.OOM),
+])
+def test_maps_exit_codes_of_killed_runs(returncode, elapsed, status):
+    assert _killed_status(returncode, elapsed, kill_after=5.0) == status
+
+def test_resource_limits_engine_args():
+    limits = ResourceLimits(memory=2**30, cpus=1.5, pids=64)
+
+    assert limits.engine_args() == [
+        "--memory", str(2**30), "--memory-swap", str(2**30),
+        "--cpus", "1.5",
+        "--pids-limit", "64",
+    ]
+    assert ResourceLimits().engine_args() == []
+
+def test_eval_result_status_defaults_to_outcome():
+    assert EvalResult(True, 1.0).status == EvalStatus.OK
+    assert EvalResult(False, None).status == EvalStatus.ERROR
+    assert EvalResult(False, None, EvalStatus.OOM).status == EvalStatus.OOM
+
+MODULE = """
+import openevolve
+
+@openevolve.hotswap
+def f(x):
+    return x + 1
+"""
+
+EVAL = """
+import openevolve
+import time
+from module import f
+
+@openevolve.run
+def evaluate(x, sleep=0):
+    time.sleep(sleep)
+    return f(x)
+"""
+
+@pytest.fixture
+def process_sandbox(tmp_path):
+    workspace = tmp_path / "workspace"
+    imps = tmp_path / "imps"
+
+    for directory in (workspace, imps / "module.py"):
+        directory.mkdir(parents=True)
+
+    (workspace / "module.py").write_text(MODULE)
+    (workspace / "eval.py").write_text(EVAL)
+    (imps / "module.py" / "f 7").write_text("return 42")
+    (imps / "module.py" / "f 8").write_text(
+        "import os\nopen('scratch.txt', 'w').close()\nreturn len(os.listdir('.'))"
+    )
+
+    sandbox = ProcessSandbox(workspace, imps, Path("eval.py"), num_workers=2, timeout_grace=0.5)
+    sandbox.upload_test_cases([TestCase([1], {}), TestCase([1], {"sleep": 5})])
+    yield sandbox
+    sandbox.close()
+
+def test_process_sandbox_runs_original_and_hotswapped_implementations(process_sandbox):
+    assert process_sandbox.run("-1", 0) == EvalResult(True, 2)
+    assert process_sandbox.run("7", 0) == EvalResult(True, 42)
+
+def test_process_sandbox_runs_in_scratch_directory(process_sandbox):
+    assert process_sandbox.run("8", 0) == EvalResult(True, 1)
+    assert not (process_sandbox.project_root / "scratch.txt").exists()
+
+def test_process_sandbox_reports_timeouts(process_sandbox):
+    results = process_sandbox.run_batch("7", [0, 1], timeout=0.2)
+
+    assert results[0] == EvalResult(True, 42)
+    assert results[1].status == EvalStatus.TIMEOUT
+
+def test_process_sandbox_restarts_killed_workers(process_sandbox):
+    for worker in process_sandbox._workers:
+        worker.kill()
+
+    assert process_sandbox.run("7", 0) == EvalResult(True, 42)
+
+@pytest.fixture
+def container_project(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "module.py").write_text(MODULE)
+    (project / "eval.py").write_text(EVAL)
+    return project
+
+@requires_engine
+def test_container_worker_runs_in_built_image(container_project, tmp_path):
+    container_name = f"{SANDBOX_CONTAINER_NAME}_worker_test"
+    imps, outputs = tmp_path / "imps", tmp_path / "outputs"
+    imps.mkdir()
+    outputs.mkdir()
+
+    ContainerSandbox.build_image(container_project, Path("eval.py"))
+    assert ContainerSandbox.image_up_to_date()
+
+    ContainerSandbox.remove_container(container_name)
+    ContainerSandbox.create_container(imps, container_name, outputs_root=outputs)
+
+    try:
+        ContainerSandbox.start_container(container_name)
+        ContainerSandbox.copy_test_cases([TestCase([1], {})], container_name)
+
+        # The worker module is installed in the image from this checkout
+        worker = ContainerWorker(ContainerSandbox.client, container_name)
+        worker.request("-1", 0, timeout=30)
+        worker.close()
+
+        with open(outputs / "-1" / "output_0.pickle", "rb") as file:
+            assert pickle.load(file) == EvalResult(True, 2)
+    finally:
+        ContainerSandbox.remove_container(container_name)
+
+def save_program(imps_root, implementation_id, code):
+    program = Program.from_code(code)
+    for function in program.functions:
+        function.path = "module.py"
+
+    ImplementationsManager.set_implementations_root(imps_root)
+    ImplementationsManager.save_program(program, implementation_id)
+
+def test_process_sandbox_runs_implementations_from_store(container_project, tmp_path):
+    imps = tmp_path / "imps"
+    save_program(imps, "9", "def f(x):\n    return x * 10\n")
+
+    # Only the pack is written, and the sandbox reads from it
+    assert [path.name for path in imps.iterdir()] == ["implementations.pack"]
+
+    sandbox = ProcessSandbox(container_project, imps, Path("eval.py"), num_workers=1)
+    try:
+        sandbox.upload_test_cases([TestCase([1], {})])
+        assert sandbox.run("9", 0) == EvalResult(True, 10)
+    finally:
+        sandbox.close()
+
+@requires_engine
+def test_container_sandbox_runs_implementations_from_store(container_project, tmp_path):
+    imps = tmp_path / "imps"
+    save_program(imps, "9", "def f(x):\n    return x * 10\n")
+
+    sandbox = ContainerSandbox(container_project, imps, Path("eval.py"))
+    try:
+        sandbox.upload_test_cases([TestCase([1], {})])
+        # The image reads the implementations from the pack, instead of running the original
+        assert sandbox.run("9", 0) == EvalResult(True, 10)
+        assert sandbox.run("-1", 0) == EvalResult(True, 2)
+    finally:
+        for container_name in sandbox.pool.container_names:
+            sandbox.stop_worker(container_name)
+            ContainerSandbox.remove_container(container_name)
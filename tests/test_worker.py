@@ -0,0 +1,124 @@
+from openevolve.container.worker import Worker
+from openevolve.eval_result import EvalStatus
+
+import cloudpickle as pickle
+import linecache
+import pytest
+import json
+import io
+import sys
+
+# The package re-exports the decorator under the same name as the module
+hotswap = sys.modules["openevolve.hotswap"]
+
+MODULE = """
+import openevolve
+
+@openevolve.hotswap
+def f(x):
+    return x + 1
+"""
+
+EVAL = """
+import openevolve
+import time
+from module import f
+
+@openevolve.run
+def evaluate(x, sleep=0):
+    time.sleep(sleep)
+    return f(x)
+"""
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    workspace = tmp_path / "workspace"
+    imps = tmp_path / "imps"
+    inputs = tmp_path / "inputs"
+
+    for directory in (workspace, imps / "module.py", inputs):
+        directory.mkdir(parents=True)
+
+    (workspace / "module.py").write_text(MODULE)
+    (workspace / "eval.py").write_text(EVAL)
+    (imps / "module.py" / "f 7").write_text("return 42")
+
+    for test_id, kwargs in enumerate([{}, {"sleep": 5}]):
+        with open(inputs / f"{test_id}.pickle", "wb") as file:
+            pickle.dump({"args": [1], "kwargs": kwargs}, file)
+
+    monkeypatch.setattr(hotswap, "WORKSPACE_ROOT", workspace)
+    monkeypatch.setattr(hotswap, "CONTAINER_IMPS_PATH", imps)
+    monkeypatch.syspath_prepend(str(workspace))
+    monkeypatch.delitem(sys.modules, "module", raising=False)
+
+    return Worker(
+        workspace / "eval.py",
+        inputs,
+        tmp_path / "outputs",
+        tmp_path / "logs",
+    )
+
+def load_output(response):
+    with open(response["output_path"], "rb") as file:
+        return pickle.load(file)
+
+def test_worker_runs_original_and_hotswapped_implementations(worker):
+    original = worker.handle("-1", 0, timeout=10)
+    swapped = worker.handle("7", 0, timeout=10)
+
+    assert load_output(original).output == 2
+    assert load_output(swapped).output == 42
+    assert swapped["exitcode"] == 0
+
+def test_worker_kills_runs_that_time_out(worker):
+    response = worker.handle("7", 1, timeout=0.2)
+
+    assert response["exitcode"] is None
+    assert load_output(response).success is False
+
+def test_worker_runs_batches(worker):
+    response = worker.handle_batch("7", [0, 1], timeout=0.2)
+
+    assert [result["test_id"] for result in response["results"]] == [0, 1]
+    assert load_output(response["results"][0]).output == 42
+    assert load_output(response["results"][1]).success is False
+
+def test_worker_serves_json_lines(worker):
+    requests = io.StringIO('{"implementation_id": "7", "test_id": 0, "timeout": 10}\n')
+    responses = io.StringIO()
+
+    worker.serve(requests, responses)
+
+    assert '"test_id": 0' in responses.getvalue()
+
+def test_worker_reports_timeout_status(worker):
+    response = worker.handle("7", 1, timeout=0.2)
+
+    assert response["status"] == "timeout"
+    assert load_output(response).status == EvalStatus.TIMEOUT
+
+def test_worker_reports_out_of_memory(worker, tmp_path):
+    with open(worker.inputs_root / "2.pickle", "wb") as file:
+        pickle.dump({"args": [1], "kwargs": {}}, file)
+
+    (tmp_path / "imps" / "module.py" / "f 8").write_text("return len(bytearray(2 ** 36))")
+    worker.memory_limit = 2 ** 34
+
+    response = worker.handle("8", 2, timeout=10)
+
+    assert response["status"] == "oom"
+    assert load_output(response).status == EvalStatus.OOM
+
+def test_worker_drops_implementations_after_batches(worker, tmp_path):
+    hotswap.reload()
+    linecache_size = len(linecache.cache)
+
+    for i in range(50):
+        (tmp_path / "imps" / "module.py" / f"f {i}").write_text(f"return {i}")
+        response = worker.handle_batch(str(i), [0], timeout=10)
+        assert load_output(response["results"][0]).output == i
+
+    # The compiled implementations and their sources are not kept once a batch is answered
+    assert len(hotswap._code_cache) == 0
+    assert len(linecache.cache) == linecache_size